@@ -1,26 +1,36 @@
-import threading
-from flask import Flask, jsonify, request
+from flask import Blueprint, jsonify, request
 from flask_cors import CORS
 from devices import list_devices
-from secure_backup import encrypt_backup_and_wipe, decrypt_and_restore
-from secure_encrypt_wipe import encrypt_and_wipe, _pick_disk_by_name_or_size
+from secure_backup import encrypt_backup_and_wipe, decrypt_and_restore, verify_backup, resolve_backup_dir
+from secure_encrypt_wipe import (encrypt_and_wipe, crypto_erase_device, CRYPTO_ERASE_SAMPLES, _pick_disk_by_name_or_size,
+                                 _resolve_mounts_cross_platform)
+from jobs import job_scheduler
+from job_store import job_store, HISTORY_PAGE_SIZE
+from throttle import throttles
 from user_storage import init_db, insert_user, get_user_by_username
+import fast_erase
 
 # Devices API (port 9758)
-devices_app = Flask("devices_api")
-CORS(devices_app, resources={r"/api/*": {"origins": "*"}})
+devices_bp = Blueprint("devices_api", __name__)
+CORS(devices_bp, resources={r"/api/*": {"origins": "*"}})
 
-@devices_app.get("/api/devices")
+@devices_bp.get("/api/devices")
 def get_devices():
     devices = list_devices()
     return jsonify(devices), 200
 
 
 # Encrypt-and-Wipe API (port 6539)
-wipe_app = Flask("wipe_api")
-CORS(wipe_app, resources={r"/api/*": {"origins": "*"}})
+wipe_bp = Blueprint("wipe_api", __name__)
+CORS(wipe_bp, resources={r"/api/*": {"origins": "*"}})
 
-@wipe_app.post("/api/encrypt-and-wipe")
+
+def _volume_target(device_name):
+    """Path that locks the device of a file-level job: its first volume (device labels are not paths)."""
+    mounts = _resolve_mounts_cross_platform(device_name)
+    return mounts[0] if mounts else device_name
+
+@wipe_bp.post("/api/encrypt-and-wipe")
 def post_encrypt_and_wipe():
     try:
         body = request.get_json(silent=True) or {}
@@ -28,29 +38,133 @@ def post_encrypt_and_wipe():
         if not device_name:
             return jsonify({"status": "error", "message": "Missing 'device' in request body"}), 400
 
-        # New behavior: backup-encrypt files, save key to txt, delete originals
-        ok, msg = encrypt_backup_and_wipe(device_name)
-        if ok:
-            return jsonify({"status": "success", "message": msg}), 200
-        else:
-            return jsonify({"status": "error", "message": msg}), 400
+        # New behavior: backup-encrypt files, save key to txt, delete originals (runs as a job)
+        job_id = job_scheduler.submit("encrypt_and_wipe", device_name, encrypt_backup_and_wipe, device_name,
+                                      target=_volume_target(device_name))
+        return jsonify({"status": "success", "message": f"Encrypt-and-Wipe queued for {device_name}.", "job_id": job_id}), 202
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@wipe_bp.post("/api/fast-erase")
+def post_fast_erase():
+    try:
+        body = request.get_json(silent=True) or {}
+        device_name = (body.get("device") or "").strip()
+        if not device_name:
+            return jsonify({"status": "error", "message": "Missing 'device' in request body"}), 400
+        mode = body.get("mode") or "auto"
+        if mode not in fast_erase.MODES:
+            return jsonify({"status": "error", "message": f"'mode' must be one of: {', '.join(fast_erase.MODES)}"}), 400
+        device_path = fast_erase.resolve_device(device_name)
+        if not device_path:
+            return jsonify({"status": "error",
+                            "message": f"'{device_name}' is not a block device, sim:// device or image file "
+                                       "under SECUREWIPE_IMAGE_DIRS"}), 400
+
+        # Discard / zero-out ioctls where supported, one overwrite pass otherwise (runs as a job)
+        job_id = job_scheduler.submit("fast_erase", device_path, fast_erase.erase_device, device_path, mode)
+        return jsonify({"status": "success", "message": f"Fast erase queued for {device_name}.", "job_id": job_id}), 202
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-def _run_devices():
-    devices_app.run(host="0.0.0.0", port=9758, use_reloader=False)
+@wipe_bp.post("/api/crypto-erase")
+def post_crypto_erase():
+    try:
+        body = request.get_json(silent=True) or {}
+        device_name = (body.get("device") or "").strip()
+        if not device_name:
+            return jsonify({"status": "error", "message": "Missing 'device' in request body"}), 400
+        try:
+            samples = int(body.get("samples", CRYPTO_ERASE_SAMPLES))
+        except (TypeError, ValueError):
+            return jsonify({"status": "error", "message": "'samples' must be an integer"}), 400
+        device_path = fast_erase.resolve_device(device_name)
+        if not device_path:
+            return jsonify({"status": "error",
+                            "message": f"'{device_name}' is not a block device, sim:// device or image file "
+                                       "under SECUREWIPE_IMAGE_DIRS"}), 400
+
+        # One keystream-only write pass, sampled verification, then the key is destroyed (runs as a job)
+        job_id = job_scheduler.submit("crypto_erase", device_path, crypto_erase_device, device_path, samples)
+        return jsonify({"status": "success", "message": f"Crypto erase queued for {device_name}.", "job_id": job_id}), 202
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+# Job status API (mounted alongside the wipe and decrypt APIs)
+jobs_bp = Blueprint("jobs_api", __name__)
+CORS(jobs_bp, resources={r"/api/*": {"origins": "*"}})
+
+
+@jobs_bp.get("/api/jobs/<job_id>")
+def get_job(job_id):
+    job = job_scheduler.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job ID not found"}), 404
+    return jsonify({"status": "success", "job": job}), 200
+
 
+@jobs_bp.get("/api/jobs")
+def get_jobs():
+    return jsonify({"status": "success", "jobs": job_scheduler.list(), "max_concurrent": job_scheduler.max_workers}), 200
 
-def _run_wipe():
-    wipe_app.run(host="0.0.0.0", port=6539, use_reloader=False)
+
+@jobs_bp.get("/api/jobs/history")
+def get_job_history():
+    """Finished and running jobs of every engine, newest first.
+    Query: kind (e.g. pendrive, boom, encrypt_and_wipe), status, limit, cursor."""
+    try:
+        limit = int(request.args.get("limit", HISTORY_PAGE_SIZE))
+        jobs, next_cursor = job_store.history(request.args.get("kind"), request.args.get("status"),
+                                              limit, request.args.get("cursor"))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid 'limit' or 'cursor'"}), 400
+    return jsonify({"status": "success", "jobs": jobs, "next_cursor": next_cursor}), 200
+
+
+@jobs_bp.post("/api/jobs/<job_id>/<action>")
+def post_job_action(job_id, action):
+    actions = {"cancel": job_scheduler.cancel, "pause": job_scheduler.pause, "resume": job_scheduler.resume}
+    if action not in actions:
+        return jsonify({"status": "error", "message": f"Unknown job action '{action}'"}), 404
+    if job_scheduler.get(job_id) is None:
+        return jsonify({"status": "error", "message": "Job ID not found"}), 404
+    if not actions[action](job_id):
+        return jsonify({"status": "error", "message": "Job already finished"}), 409
+    return jsonify({"status": "success", "message": f"{action.capitalize()} requested"}), 200
+
+
+@jobs_bp.get("/api/throttle")
+def get_throttle():
+    return jsonify({"status": "success", "throttle": throttles.status()}), 200
+
+
+@jobs_bp.post("/api/throttle")
+def post_throttle():
+    """Change limits at runtime. Body: {"mb_per_s", "ops_per_s"} plus optional
+    "job_id" (a job or wipe ID) or "defaults": true (limits for new jobs); 0 = unlimited."""
+    body = request.get_json(silent=True) or {}
+    try:
+        mb_per_s = float(body["mb_per_s"]) if body.get("mb_per_s") is not None else None
+        ops_per_s = float(body["ops_per_s"]) if body.get("ops_per_s") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "'mb_per_s' and 'ops_per_s' must be numbers"}), 400
+    if mb_per_s is None and ops_per_s is None:
+        return jsonify({"status": "error", "message": "Missing 'mb_per_s' or 'ops_per_s'"}), 400
+    if (mb_per_s or 0) < 0 or (ops_per_s or 0) < 0:
+        return jsonify({"status": "error", "message": "Limits cannot be negative"}), 400
+    if not throttles.configure(body.get("job_id"), mb_per_s, ops_per_s, defaults=bool(body.get("defaults"))):
+        return jsonify({"status": "error", "message": "Job ID not found or already finished"}), 404
+    return jsonify({"status": "success", "throttle": throttles.status()}), 200
 
 
 # Decrypt-and-Restore API (port 9579)
-decrypt_app = Flask("decrypt_api")
-CORS(decrypt_app, resources={r"/api/*": {"origins": "*"}})
+decrypt_bp = Blueprint("decrypt_api", __name__)
+CORS(decrypt_bp, resources={r"/api/*": {"origins": "*"}})
 
-@decrypt_app.post("/api/decrypt-and-restore")
+@decrypt_bp.post("/api/decrypt-and-restore")
 def post_decrypt_and_restore():
     try:
         body = request.get_json(silent=True) or {}
@@ -58,24 +172,49 @@ def post_decrypt_and_restore():
         key_hex = body.get("decryptionKey")
         if not device_name or not key_hex:
             return jsonify({"status": "error", "message": "Missing 'device' or 'decryptionKey'"}), 400
-        ok, msg = decrypt_and_restore(device_name, key_hex)
-        if ok:
-            return jsonify({"status": "success", "message": msg}), 200
-        else:
-            return jsonify({"status": "error", "message": msg}), 400
+        job_id = job_scheduler.submit("decrypt_and_restore", device_name, decrypt_and_restore, device_name, key_hex,
+                                      target=_volume_target(device_name))
+        return jsonify({"status": "success", "message": f"Decrypt-and-Restore queued for {device_name}.", "job_id": job_id}), 202
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@decrypt_bp.post("/api/verify-backup")
+def post_verify_backup():
+    try:
+        body = request.get_json(silent=True) or {}
+        device_name = body.get("device")
+        backup_name = body.get("backup")
+        if not device_name and not backup_name:
+            return jsonify({"status": "error", "message": "Missing 'device' or 'backup'"}), 400
+        backup_dir = resolve_backup_dir(device_name, backup_name)
+        if not backup_dir:
+            return jsonify({"status": "error", "message": "No matching backup found."}), 404
+        key = None
+        key_hex = body.get("decryptionKey")
+        if key_hex:
+            try:
+                key = bytes.fromhex(key_hex.strip())
+            except ValueError:
+                return jsonify({"status": "error", "message": "Invalid decryption key format; expected hex string."}), 400
+
+        # Read-only: no device exclusion needed
+        job_id = job_scheduler.submit("verify_backup", None, verify_backup, backup_dir, key)
+        return jsonify({"status": "success", "verify_id": job_id, "job_id": job_id}), 202
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-def _run_decrypt():
-    decrypt_app.run(host="0.0.0.0", port=9579, use_reloader=False)
+@decrypt_bp.get("/api/verify-backup/<verify_id>")
+def get_verify_backup(verify_id):
+    return get_job(verify_id)
 
 
 # Wipe method selection API (port 8743)
-wipe_method_app = Flask("wipe_method_api")
-CORS(wipe_method_app)
+wipe_method_bp = Blueprint("wipe_method_api", __name__)
+CORS(wipe_method_bp)
 
-@wipe_method_app.post("/get_wipe_method")
+@wipe_method_bp.post("/get_wipe_method")
 def post_get_wipe_method():
     try:
         body = request.get_json(silent=True) or {}
@@ -100,20 +239,32 @@ def post_get_wipe_method():
             except Exception:
                 pass
 
-        return jsonify({"method": method}), 200
+        # Flash devices that support discard can be erased without rewriting every byte;
+        # clients opt in with "allow_fast_erase" since fast erase has its own endpoint
+        device_path = fast_erase.resolve_device(device_name)
+        fast = fast_erase.recommended(device_path)
+        if fast and body.get("allow_fast_erase"):
+            method = "fast-erase"
+        return jsonify({"method": method, "fast_erase": {
+            "recommended": fast,
+            "device_path": device_path,
+            "capabilities": fast_erase.capabilities(device_path) if device_path else None,
+        }}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-def _run_wipe_method():
-    # Bind to localhost as requested
-    wipe_method_app.run(host="127.0.0.1", port=8743, use_reloader=False)
+# Login storage API (port 9574)
+login_bp = Blueprint("login_storage_api", __name__)
 
 
-# Login storage API (port 9574)
-login_app = Flask("login_storage_api")
+@login_bp.record_once
+def _init_login_db(state):
+    # Ensure DB schema exists before serving
+    init_db()
 
-@login_app.post("/loginStorage")
+
+@login_bp.post("/loginStorage")
 def post_login_storage():
     try:
         if request.headers.get("Content-Type", "").lower() != "application/json":
@@ -132,7 +283,7 @@ def post_login_storage():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-@login_app.post("/getLoginDetails")
+@login_bp.post("/getLoginDetails")
 def post_get_login_details():
     try:
         if request.headers.get("Content-Type", "").lower() != "application/json":
@@ -151,21 +302,7 @@ def post_get_login_details():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-def _run_login():
-    # Ensure DB schema exists before serving
-    init_db()
-    login_app.run(host="127.0.0.1", port=9574, use_reloader=False)
-
-
 if __name__ == "__main__":
-    # Start all servers concurrently; run the wipe method selector in the main thread for visibility
-    t1 = threading.Thread(target=_run_devices, daemon=True)
-    t1.start()
-    t2 = threading.Thread(target=_run_wipe, daemon=True)
-    t2.start()
-    t3 = threading.Thread(target=_run_decrypt, daemon=True)
-    t3.start()
-    t4 = threading.Thread(target=_run_login, daemon=True)
-    t4.start()
-    _run_wipe_method()
-
+    # Serve everything from one process; keep the historical per-service ports for the frontend
+    from server import main
+    main(["--legacy-ports"])
@@ -0,0 +1,446 @@
+"""Benchmark harness for the wipe, backup and verification engines (Linux).
+
+Each engine runs against sparse image files or synthetic directory trees in a
+scratch directory. Results are written as JSON so runs can be compared across
+commits:
+
+    python benchmark.py --out before.json
+    python benchmark.py --out after.json --compare before.json
+
+With --sim the device engines run against simulated devices instead, whose
+latency/bandwidth model gives the same figures on any host:
+
+    python benchmark.py --engines pendrive,verify --sim memory --sim-write-mbps 30
+
+Pendrive wipes can compare region-major and pass-major overwrites:
+
+    python benchmark.py --engines pendrive --passes 3 --pass-order region,pass
+
+This destroys only files it creates under --workdir.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ENGINES = ["pendrive", "boom", "encrypt_file", "encrypt_device", "crypto_erase", "backup", "restore", "verify",
+           "sample_verify"]
+IMAGE_ENGINES = {"pendrive", "encrypt_device", "crypto_erase", "verify", "sample_verify"}
+WORKER_ENGINES = {"pendrive", "encrypt_file", "restore", "verify"}
+CHUNK_ENGINES = {"pendrive", "boom", "encrypt_file", "encrypt_device", "crypto_erase", "backup", "verify"}
+
+# File size distributions for synthetic trees: name -> sampler(rng, mean_bytes)
+DISTRIBUTIONS: Dict[str, Callable[[random.Random, int], int]] = {
+    "uniform": lambda rng, mean: mean,
+    "small": lambda rng, mean: rng.randint(1, 64) * 1024,
+    "lognormal": lambda rng, mean: max(1, int(rng.lognormvariate(0, 1.5) * mean / 3.08)),
+    "mixed": lambda rng, mean: mean * 8 if rng.random() < 0.1 else max(1, mean // 8),
+}
+
+MB = 1024 * 1024
+_FILL = os.urandom(MB)
+
+_engines: Dict[str, Any] = {}
+
+
+def _load_engines(workdir: str) -> None:
+    """Import engine modules only after their databases point into the scratch directory."""
+    os.environ.setdefault("SECUREWIPE_JOB_DB", os.path.join(workdir, "jobs.db"))
+    os.environ.setdefault("SECUREWIPE_REPORTS_DB", os.path.join(workdir, "reports.db"))
+    os.environ.setdefault("SECUREWIPE_SIM_DIR", os.path.join(workdir, "sim"))
+    # The pendrive engine only writes image files in directories opted in here
+    os.environ["SECUREWIPE_IMAGE_DIRS"] = os.pathsep.join(
+        filter(None, [os.environ.get("SECUREWIPE_IMAGE_DIRS"), workdir]))
+    import boom_wipe_app
+    import hexReading
+    import pendrive_wipe_app
+    import secure_backup
+    import secure_encrypt_wipe
+    import simdevice
+    secure_backup.BACKUP_ROOT = os.path.join(workdir, "backups")
+    _engines.update(boom=boom_wipe_app, hex=hexReading, pendrive=pendrive_wipe_app,
+                    backup=secure_backup, encrypt=secure_encrypt_wipe, sim=simdevice)
+
+
+# -- fixtures -----------------------------------------------------------------
+
+def make_image(path: str, size: int, dense: bool = False) -> None:
+    """Sparse image (or fully written zeros with dense=True)."""
+    with open(path, "wb") as f:
+        if dense:
+            zeros = bytes(MB)
+            for _ in range(size // MB):
+                f.write(zeros)
+            f.write(bytes(size % MB))
+        else:
+            f.truncate(size)
+
+
+def make_tree(root: str, files: int, total_bytes: int, dist: str, seed: int = 0) -> int:
+    """Directory tree of `files` files (100 per subdirectory); returns bytes written."""
+    rng = random.Random(seed)
+    mean = max(1, total_bytes // max(1, files))
+    written = 0
+    for i in range(files):
+        d = os.path.join(root, f"d{i // 100:04d}")
+        if i % 100 == 0:
+            os.makedirs(d, exist_ok=True)
+        size = DISTRIBUTIONS[dist](rng, mean)
+        with open(os.path.join(d, f"f{i:06d}.bin"), "wb") as f:
+            left = size
+            while left > 0:
+                n = min(left, MB)
+                f.write(_FILL[:n])
+                left -= n
+        written += size
+    return written
+
+
+def make_device(scratch: str, name: str, p: Dict[str, Any]) -> str:
+    """Image file in the scratch directory, or a simulated device when the scenario has one."""
+    size = p["size_mb"] * MB
+    if not p.get("sim"):
+        path = os.path.join(scratch, name + ".img")
+        make_image(path, size, p["dense"])
+        return path
+    model = {key: p[key] for key in ("latency_ms", "write_mb_s", "read_mb_s", "flush_ms")}
+    device = _engines["sim"].sim_devices.create(f"bench-{name}-{time.time_ns()}", size, p["sim"],
+                                                directory=scratch, jitter=0, **model)
+    if p["dense"]:
+        for offset in range(0, size, MB):
+            device.pwrite(bytes(min(MB, size - offset)), offset)
+    return device.path
+
+
+def _drop(path: str) -> None:
+    if _engines.get("sim") and _engines["sim"].is_sim_path(path):
+        _engines["sim"].sim_devices.remove(path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+# -- engine runners: each returns (bytes processed, ok, details) ----------------
+
+def run_pendrive(scratch: str, p: Dict[str, Any]) -> Tuple[int, bool, Dict[str, Any]]:
+    image = make_device(scratch, "pendrive", p)
+    wiper = _engines["pendrive"].PendriveWiper()
+    wiper.bomb_size = p["chunk_kb"] * 1024
+    wiper.bombs_in_flight = p["workers"]
+    plan = wiper.compile_plan("custom", ["random"] * p["passes"])
+    wipe_id = f"bench_{time.time_ns()}"
+    start = time.perf_counter()
+    wiper.execute_pendrive_wipe(image, wipe_id, plan=plan, pass_order=p.get("pass_order", "region"))
+    seconds = time.perf_counter() - start
+    entry = wiper.active_wipes[wipe_id]
+    _drop(image)
+    details = {"seconds": seconds}
+    if entry.get("pass_stats"):
+        details["pass_mb_per_s"] = [s["throughput_mb_s"] for s in entry["pass_stats"]]
+    return p["size_mb"] * MB * p["passes"], entry.get("status") == "completed", details
+
+
+def run_boom(scratch: str, p: Dict[str, Any]) -> Tuple[int, bool, Dict[str, Any]]:
+    tree = os.path.join(scratch, "boom")
+    total = make_tree(tree, p["files"], p["size_mb"] * MB, p["dist"])
+    boom = _engines["boom"]
+    boom.OVERWRITE_CHUNK = p["chunk_kb"] * 1024
+    wiper = boom.BoomWiper()
+    wiper.overwrite_passes = p["passes"]
+    wipe_id = f"bench_{time.time_ns()}"
+    start = time.perf_counter()
+    wiper.execute_boom_wipe(tree, wipe_id)
+    seconds = time.perf_counter() - start
+    entry = wiper.active_wipes[wipe_id]
+    _drop(tree)
+    return total * p["passes"], entry.get("status") == "completed", {"seconds": seconds, "tree_bytes": total}
+
+
+def run_encrypt_file(scratch: str, p: Dict[str, Any]) -> Tuple[int, bool, Dict[str, Any]]:
+    from concurrent.futures import ThreadPoolExecutor
+    tree = os.path.join(scratch, "encrypt")
+    total = make_tree(tree, p["files"], p["size_mb"] * MB, p["dist"])
+    enc = _engines["encrypt"]
+    enc.CHUNK_SIZE = p["chunk_kb"] * 1024
+    paths = [os.path.join(d, n) for d, _, names in os.walk(tree) for n in names]
+    key = os.urandom(32)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=p["workers"]) as pool:
+        results = list(pool.map(lambda path: enc._encrypt_overwrite_file(path, key)[0], paths))
+    seconds = time.perf_counter() - start
+    _drop(tree)
+    return total, all(results), {"seconds": seconds}
+
+
+def run_encrypt_device(scratch: str, p: Dict[str, Any]) -> Tuple[int, bool, Dict[str, Any]]:
+    image = make_device(scratch, "device", p)
+    size = p["size_mb"] * MB
+    enc = _engines["encrypt"]
+    enc.CHUNK_SIZE = p["chunk_kb"] * 1024
+    start = time.perf_counter()
+    ok, _ = enc._encrypt_overwrite_physical_device(image, size, os.urandom(32))
+    seconds = time.perf_counter() - start
+    _drop(image)
+    return size, ok, {"seconds": seconds}
+
+
+def run_crypto_erase(scratch: str, p: Dict[str, Any]) -> Tuple[int, bool, Dict[str, Any]]:
+    image = make_device(scratch, "crypto", p)
+    enc = _engines["encrypt"]
+    enc.CRYPTO_ERASE_CHUNK = p["chunk_kb"] * 1024
+    start = time.perf_counter()
+    result = enc.crypto_erase_device(image, samples=p["samples"])
+    seconds = time.perf_counter() - start
+    _drop(image)
+    return result["bytes"], result["verification"]["outcome"] == "passed", {"seconds": seconds}
+
+
+def _backup_fixture(scratch: str, p: Dict[str, Any]) -> Tuple[str, int]:
+    tree = os.path.join(scratch, "volume")
+    total = make_tree(tree, p["files"], p["size_mb"] * MB, p["dist"])
+    return tree, total
+
+
+def run_backup(scratch: str, p: Dict[str, Any]) -> Tuple[int, bool, Dict[str, Any]]:
+    backup = _engines["backup"]
+    backup.GCM2_SEGMENT_SIZE = p["chunk_kb"] * 1024
+    tree, total = _backup_fixture(scratch, p)
+    start = time.perf_counter()
+    ok, _ = backup.encrypt_backup_and_wipe(tree)
+    seconds = time.perf_counter() - start
+    _drop(tree)
+    _drop(backup.BACKUP_ROOT)
+    return total, ok, {"seconds": seconds}
+
+
+def run_restore(scratch: str, p: Dict[str, Any]) -> Tuple[int, bool, Dict[str, Any]]:
+    backup = _engines["backup"]
+    tree, total = _backup_fixture(scratch, p)
+    ok, _ = backup.encrypt_backup_and_wipe(tree)
+    backup_dir = backup._find_latest_backup_dir(tree)
+    key = backup._read_key_file(backup_dir) if backup_dir else None
+    if not ok or key is None:
+        return total, False, {"seconds": 0.0}
+    start = time.perf_counter()
+    ok, _ = backup.decrypt_and_restore(tree, key.hex(), workers=p["workers"])
+    seconds = time.perf_counter() - start
+    _drop(tree)
+    _drop(backup.BACKUP_ROOT)
+    return total, ok, {"seconds": seconds}
+
+
+def run_verify(scratch: str, p: Dict[str, Any]) -> Tuple[int, bool, Dict[str, Any]]:
+    image = make_device(scratch, "verify", p)
+    start = time.perf_counter()
+    result = _engines["hex"].verify_device(image, allowed_bytes=(0x00,), block_size=p["chunk_kb"] * 1024,
+                                           queue_depth=p["workers"])
+    seconds = time.perf_counter() - start
+    _drop(image)
+    return result["bytes_scanned"], result["passed"], {"seconds": seconds}
+
+
+def run_sample_verify(scratch: str, p: Dict[str, Any]) -> Tuple[int, bool, Dict[str, Any]]:
+    image = make_device(scratch, "sample", p)
+    start = time.perf_counter()
+    result = _engines["hex"].sample_verify(image, samples=p["samples"], seed=1)
+    seconds = time.perf_counter() - start
+    _drop(image)
+    return result["bytes_read"], result["passed"], {"seconds": seconds}
+
+
+RUNNERS = {
+    "pendrive": run_pendrive,
+    "boom": run_boom,
+    "encrypt_file": run_encrypt_file,
+    "encrypt_device": run_encrypt_device,
+    "crypto_erase": run_crypto_erase,
+    "backup": run_backup,
+    "restore": run_restore,
+    "verify": run_verify,
+    "sample_verify": run_sample_verify,
+}
+
+
+# -- grid / reporting -----------------------------------------------------------
+
+def scenarios(engine: str, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Parameter grid for one engine; axes that do not apply to it are left out."""
+    axes: Dict[str, List[Any]] = {"size_mb": args.size_mb}
+    if engine not in IMAGE_ENGINES:
+        axes.update(files=args.files, dist=args.dist)
+    if engine in CHUNK_ENGINES:
+        axes["chunk_kb"] = args.chunk_kb
+    if engine in WORKER_ENGINES:
+        axes["workers"] = args.workers
+    if engine in ("pendrive", "boom"):
+        axes["passes"] = [args.passes]
+    if engine == "pendrive" and args.pass_order != ["region"]:
+        # Only an explicit --pass-order adds the axis, so older baselines still match
+        axes["pass_order"] = args.pass_order
+    if engine in ("sample_verify", "crypto_erase"):
+        axes["samples"] = [args.samples]
+    keys = list(axes)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*(axes[k] for k in keys))]
+    if engine in IMAGE_ENGINES:
+        for params in grid:
+            params["dense"] = args.dense
+            if args.sim:
+                params.update(sim=args.sim, latency_ms=args.sim_latency_ms, write_mb_s=args.sim_write_mbps,
+                              read_mb_s=args.sim_read_mbps, flush_ms=args.sim_flush_ms)
+    return grid
+
+
+def _git_revision() -> Dict[str, Any]:
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=here, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=here,
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": commit or None, "dirty": dirty}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def _scenario_key(result: Dict[str, Any]) -> str:
+    return result["engine"] + " " + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Throughput change against a previous run, matched by engine + parameters."""
+    base = {_scenario_key(r): r for r in baseline.get("results", [])}
+    rows = []
+    for r in results:
+        old = base.get(_scenario_key(r))
+        if not old or not old.get("mb_per_s") or r.get("mb_per_s") is None:
+            continue
+        rows.append({
+            "engine": r["engine"],
+            "params": r["params"],
+            "baseline_mb_per_s": old["mb_per_s"],
+            "mb_per_s": r["mb_per_s"],
+            "change_pct": round((r["mb_per_s"] / old["mb_per_s"] - 1) * 100, 1),
+        })
+    return rows
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = args.workdir or tempfile.mkdtemp(prefix="securewipe-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    _load_engines(workdir)
+    results = []
+    for engine in args.engines:
+        for params in scenarios(engine, args):
+            runs, ok, nbytes, error, pass_rates = [], True, 0, None, []
+            for _ in range(args.repeat):
+                scratch = tempfile.mkdtemp(dir=workdir)
+                try:
+                    nbytes, run_ok, details = RUNNERS[engine](scratch, params)
+                    runs.append(details["seconds"])
+                    if "pass_mb_per_s" in details:
+                        pass_rates.append(details["pass_mb_per_s"])
+                    ok = ok and run_ok
+                except Exception as e:
+                    ok, error = False, f"{type(e).__name__}: {e}"
+                    break
+                finally:
+                    shutil.rmtree(scratch, ignore_errors=True)
+            seconds = statistics.median(runs) if runs else None
+            result = {
+                "engine": engine,
+                "params": params,
+                "ok": ok,
+                "bytes": nbytes,
+                "seconds": round(seconds, 4) if seconds is not None else None,
+                "runs": [round(s, 4) for s in runs],
+                "mb_per_s": round(nbytes / seconds / MB, 2) if seconds else None,
+            }
+            if pass_rates:
+                # Per-pass throughput of pass-major runs, median over repeats
+                result["pass_mb_per_s"] = [statistics.median(rates) for rates in zip(*pass_rates)]
+            if error:
+                result["error"] = error
+            results.append(result)
+            print(f"{engine:<14} {json.dumps(params, sort_keys=True):<90} "
+                  f"{result['mb_per_s'] if result['mb_per_s'] is not None else '-':>10} MB/s"
+                  f"{'' if ok else '  FAILED ' + (error or '')}", file=sys.stderr)
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": dict(_git_revision(), timestamp=time.time(), python=platform.python_version(),
+                     platform=platform.platform(), cpus=os.cpu_count(), args=vars(args)),
+        "results": results,
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark SecureWiping engines on scratch images and trees (Linux)")
+    parser.add_argument("--engines", type=lambda v: v.split(","), default=ENGINES,
+                        help=f"Comma-separated subset of: {','.join(ENGINES)}")
+    parser.add_argument("--size-mb", type=_int_list, default=[64], help="Image / tree sizes in MiB, e.g. 64,256")
+    parser.add_argument("--files", type=_int_list, default=[200], help="File counts for tree engines")
+    parser.add_argument("--dist", type=lambda v: v.split(","), default=["uniform"],
+                        help=f"File size distributions: {','.join(DISTRIBUTIONS)}")
+    parser.add_argument("--chunk-kb", type=_int_list, default=[512], help="Chunk / bomb / segment sizes in KiB")
+    parser.add_argument("--workers", type=_int_list, default=[1, 8], help="Worker counts / queue depths")
+    parser.add_argument("--passes", type=int, default=1, help="Overwrite passes for pendrive and boom")
+    parser.add_argument("--pass-order", type=lambda v: v.split(","), default=["region"],
+                        help="Pendrive pass orders to compare: region (all passes per bomb), pass (pass-major)")
+    parser.add_argument("--samples", type=int, default=2048, help="Blocks read by sample_verify and crypto_erase")
+    parser.add_argument("--dense", action="store_true", help="Write images out instead of keeping them sparse")
+    parser.add_argument("--sim", choices=["sparse", "mmap", "memory"],
+                        help="Run device engines against a simulated device with this backend")
+    parser.add_argument("--sim-latency-ms", type=float, default=0.5, help="Simulated per-request latency")
+    parser.add_argument("--sim-write-mbps", type=float, default=25.0, help="Simulated write bandwidth (0 = unlimited)")
+    parser.add_argument("--sim-read-mbps", type=float, default=80.0, help="Simulated read bandwidth (0 = unlimited)")
+    parser.add_argument("--sim-flush-ms", type=float, default=5.0, help="Simulated cost of each fsync")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario (median is reported)")
+    parser.add_argument("--workdir", help="Scratch directory (default: a temporary directory, removed afterwards)")
+    parser.add_argument("--out", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run to compare throughput against")
+    args = parser.parse_args(argv)
+
+    if not sys.platform.startswith("linux"):
+        print("The benchmark harness needs Linux (sparse images and POSIX device paths).", file=sys.stderr)
+        return 2
+    unknown = [e for e in args.engines if e not in RUNNERS]
+    unknown += [d for d in args.dist if d not in DISTRIBUTIONS]
+    if unknown:
+        parser.error(f"unknown engine or distribution: {', '.join(unknown)}")
+
+    # Engines log every job at INFO; keep the benchmark output readable
+    logging.disable(logging.WARNING)
+    report = run_benchmarks(args)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report["results"], json.load(f))
+        for row in report["comparison"]:
+            print(f"{row['engine']:<14} {json.dumps(row['params'], sort_keys=True):<90} "
+                  f"{row['baseline_mb_per_s']:>10} -> {row['mb_per_s']:>10} MB/s ({row['change_pct']:+.1f}%)",
+                  file=sys.stderr)
+
+    text = json.dumps(report, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0 if all(r["ok"] for r in report["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
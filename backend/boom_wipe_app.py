@@ -1,29 +1,44 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, request, jsonify
 from flask_cors import CORS
-import threading
 import time
 import os
+import uuid
 import psutil
-from concurrent.futures import ThreadPoolExecutor
 import logging
+from jobs import JobControl, JobCancelled
+from job_store import JobTable, job_store
+from reports import record_job
+import metrics
+from throttle import throttles
+from io_scheduler import io_scheduler
+import simdevice
+import free_space
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}})
+boom_bp = Blueprint("boom_wipe", __name__)
+CORS(boom_bp, resources={r"/*": {"origins": "*"}})
+
+OVERWRITE_CHUNK = 1024 * 1024  # pause/cancel checkpoints happen between chunks
 
 
 class BoomWiper:
     def __init__(self):
-        self.active_wipes = {}
         self.overwrite_passes = 3  # Number of times to overwrite file
-        self.demo_mode = False  # Real deletion mode
-        self.device_files = {}
+        self.scrub_names = True  # Rename each file to a random name right before overwriting it
+        self.demo_mode = False  # Real deletion mode; demo mode wipes a simulated device's volume
+        self.device_files = {}  # wipe_id -> scanned files, only while the wipe runs
+        self.controls = {}  # wipe_id -> JobControl (cancel / pause / resume)
+        # Persisted wipe state; finished wipes are evicted from memory after the retention period
+        self.active_wipes = JobTable("boom", on_evict=lambda wipe_id: self.controls.pop(wipe_id, None))
 
     def resolve_mountpoint(self, device_label):
         """Hardcoded mapping"""
+        if simdevice.is_sim_path(device_label) or self.demo_mode:
+            # File-level engines use the simulated device's volume directory
+            return simdevice.volume_dir(device_label)
         if device_label.lower().startswith("hp v220w"):
             return "F:\\"  # Change this to your pendrive drive letter
         logger.warning(f"Could not map device label '{device_label}', using it as-is")
@@ -62,7 +77,33 @@ class BoomWiper:
             logger.error(f"Error scanning device files: {e}")
             return []
 
-    def real_delete_files(self, wipe_id, bomb_id):
+    def scrub_file_name(self, wipe_id, file_info):
+        """Rename a file to a random name before it is overwritten; returns the original path, or None
+
+        On FAT/exFAT the old directory entries are only marked deleted (0xE5), so most of the
+        old name stays readable until that space is reused.
+        """
+        original = file_info["path"]
+        scrubbed = os.path.join(os.path.dirname(original), uuid.uuid4().hex[:12])
+        try:
+            with metrics.timed("boom", "rename"):
+                os.rename(original, scrubbed)
+        except OSError as e:
+            logger.debug(f"Could not rename {file_info['relative_path']}: {e}")
+            return None
+        file_info["path"] = scrubbed
+        self.active_wipes[wipe_id]["names_scrubbed"] = self.active_wipes[wipe_id].get("names_scrubbed", 0) + 1
+        return original
+
+    def restore_file_name(self, file_info, original):
+        """Give a file that was not deleted its name back after a cancel or failure"""
+        try:
+            os.rename(file_info["path"], original)
+            file_info["path"] = original
+        except OSError as e:
+            logger.warning(f"Could not restore the name of {file_info['relative_path']} from {file_info['path']}: {e}")
+
+    def real_delete_files(self, wipe_id, bomb_id, control=None):
         """Overwrite and delete files, updating progress per file"""
         if wipe_id not in self.device_files:
             return
@@ -74,17 +115,43 @@ class BoomWiper:
             if file_info.get("deleted", False):
                 continue
 
+            if control:
+                control.checkpoint()
+
             file_path = file_info["path"]
+            original = None
             try:
                 if os.path.exists(file_path) and os.path.isfile(file_path):
+                    if self.scrub_names:
+                        original = self.scrub_file_name(wipe_id, file_info)
+                        file_path = file_info["path"]
                     size = os.path.getsize(file_path)
-                    # Overwrite file multiple times
+                    # Overwrite file multiple times, in chunks so pause/cancel take effect quickly
                     with open(file_path, "r+b") as f:
-                        for _ in range(self.overwrite_passes):
+                        for pass_num in range(self.overwrite_passes):
                             f.seek(0)
-                            f.write(os.urandom(size))
-                            f.flush()
-                            os.fsync(f.fileno())
+                            written = 0
+                            while written < size:
+                                if control and (written or pass_num):
+                                    try:
+                                        control.checkpoint()
+                                    except JobCancelled:
+                                        self.active_wipes[wipe_id]["interrupted_file"] = {
+                                            "path": file_info["relative_path"],
+                                            "pass": pass_num + 1,
+                                            "bytes_overwritten": written,
+                                        }
+                                        raise
+                                n = min(OVERWRITE_CHUNK, size - written)
+                                if control:
+                                    control.throttle(n)
+                                with io_scheduler.inflight(self.active_wipes[wipe_id]["mountpoint"], n):
+                                    with metrics.timed("boom", "write", n):
+                                        f.write(os.urandom(n))
+                                written += n
+                            with metrics.timed("boom", "fsync"):
+                                f.flush()
+                                os.fsync(f.fileno())
                         f.truncate()
                     # Delete file
                     os.remove(file_path)
@@ -93,76 +160,248 @@ class BoomWiper:
                     file_info["deleted_by_bomb"] = bomb_id
                     # Update progress
                     self.active_wipes[wipe_id]["deleted_count"] += 1
+                    self.active_wipes[wipe_id]["processed_bytes"] = self.active_wipes[wipe_id].get("processed_bytes", 0) + size
                     self.active_wipes[wipe_id]["files_remaining"] = total_files - self.active_wipes[wipe_id]["deleted_count"]
                     self.active_wipes[wipe_id]["progress"] = (self.active_wipes[wipe_id]["deleted_count"] / total_files) * 100
 
-                    logger.info(f"💥 FILE DELETED: {file_info['relative_path']} ({size/1024:.1f} KB)")
+                    if metrics.sample_debug(logger):
+                        logger.debug(f"💥 FILE DELETED: {file_info['relative_path']} ({size/1024:.1f} KB)")
 
+            except JobCancelled:
+                if original and not file_info["deleted"]:
+                    self.restore_file_name(file_info, original)
+                raise
             except Exception as e:
-                logger.error(f"⚠️ Failed to delete {file_path}: {e}")
+                if original and not file_info["deleted"]:
+                    self.restore_file_name(file_info, original)
+                metrics.errors_total.inc(engine="boom")
+                logger.error(f"⚠️ Failed to delete {file_info['relative_path']}: {e}")
                 continue
 
-    def place_bomb(self, bomb_id, wipe_id):
+    def place_bomb(self, bomb_id, wipe_id, control=None):
         """Single-threaded deletion; files are updated per file"""
         logger.info(f"🧨 Bomb {bomb_id} running...")
-        self.real_delete_files(wipe_id, bomb_id)
+        self.real_delete_files(wipe_id, bomb_id, control)
 
     def execute_boom_wipe(self, device_name, wipe_id):
         """Main wipe function"""
         logger.info(f"🚀 Starting Boom Wipe on {device_name}")
         mountpoint = self.resolve_mountpoint(device_name)
 
-        self.active_wipes[wipe_id] = {
+        entry = self.active_wipes.setdefault(wipe_id, {})
+        entry.update({
             "status": "initializing",
             "device": device_name,
+            "mountpoint": mountpoint,
             "progress": 0,
             "deleted_count": 0,
             "files_remaining": 0
-        }
-
-        files = self.scan_device_files(mountpoint)
-        self.device_files[wipe_id] = files
-        total_files = len(files)
-        self.active_wipes[wipe_id]["files_remaining"] = total_files
+        })
+        control = self.controls.get(wipe_id)
+        if control is None:
+            control = self.controls[wipe_id] = JobControl(entry, job_id=wipe_id)
 
-        if total_files == 0:
-            self.active_wipes[wipe_id].update({"status": "completed", "progress": 100})
-            logger.info("No files found. Wipe completed.")
+        files = []
+        try:
+            # The scan treats an unreachable drive as empty; that must not end as a completed wipe
+            if not os.path.isdir(mountpoint) or not os.access(mountpoint, os.R_OK | os.X_OK):
+                raise OSError(f"Mountpoint {mountpoint} is not accessible")
+            files = self.scan_device_files(mountpoint)
+            # Largest files first: the most data becomes unrecoverable soonest if the wipe is cut short
+            files.sort(key=lambda f: -f["size"])
+            self.device_files[wipe_id] = files
+            total_files = len(files)
+            entry["files_remaining"] = total_files
+
+            if total_files == 0:
+                entry.update({"status": "completed", "progress": 100})
+                logger.info("No files found. Wipe completed.")
+                return
+
+            entry["status"] = "wiping"
+            # Only one thread needed now; updates happen per file
+            self.place_bomb(1, wipe_id, control)
+        except JobCancelled:
+            entry.update({
+                "status": "cancelled",
+                "processed_files": [f["relative_path"] for f in files if f.get("deleted")],
+            })
+            logger.warning(f"Boom Wipe cancelled on {device_name}")
+            return
+        except Exception as e:
+            metrics.errors_total.inc(engine="boom")
+            entry.update({
+                "status": "failed",
+                "error": str(e),
+                "processed_files": [f["relative_path"] for f in files if f.get("deleted")],
+            })
+            logger.error(f"Boom Wipe failed on {device_name}: {e}")
             return
 
-        self.active_wipes[wipe_id]["status"] = "wiping"
-        # Only one thread needed now; updates happen per file
-        self.place_bomb(1, wipe_id)
-
-        self.active_wipes[wipe_id].update({"status": "completed", "progress": 100})
+        entry.update({
+            "status": "completed",
+            "progress": 100,
+            "processed_files": [f["relative_path"] for f in files if f.get("deleted")],
+        })
         logger.info(f"✅ Boom Wipe completed on {device_name}")
 
+    def execute_free_space_wipe(self, device_name, wipe_id, workers=free_space.DEFAULT_WORKERS, pattern="random"):
+        """Overwrite the free space of the device's filesystem; existing files are kept"""
+        logger.info(f"🧹 Starting free-space wipe on {device_name}")
+        mountpoint = self.resolve_mountpoint(device_name)
+        entry = self.active_wipes.setdefault(wipe_id, {})
+        entry.update({"status": "wiping", "device": device_name, "mountpoint": mountpoint, "progress": 0})
+        control = self.controls.get(wipe_id)
+        if control is None:
+            control = self.controls[wipe_id] = JobControl(entry, job_id=wipe_id)
+
+        limit = None
+        if simdevice.is_sim_path(device_name) or self.demo_mode:
+            # A simulated volume is a directory on the host disk: fill only the device's capacity
+            used = sum(f["size"] for f in self.scan_device_files(mountpoint))
+            limit = max(0, simdevice.sim_devices.ensure(device_name).size - used)
+        try:
+            result = free_space.wipe_free_space(mountpoint, workers=workers, pattern=pattern,
+                                                limit_bytes=limit, control=control)
+        except JobCancelled:
+            entry["status"] = "cancelled"
+            logger.warning(f"Free-space wipe cancelled on {device_name}")
+            return
+        except Exception as e:
+            metrics.errors_total.inc(engine="free_space")
+            entry.update({"status": "failed", "error": str(e)})
+            logger.error(f"Free-space wipe failed on {device_name}: {e}")
+            return
+
+        entry.update({"status": "completed", "progress": 100, "processed_bytes": result["bytes"],
+                      "free_space": result})
+        logger.info(f"✅ Free-space wipe completed on {device_name}: "
+                    f"{result['bytes'] / 1024 ** 2:.0f} MB at {result['throughput_mb_s']} MB/s")
+
 
 boom_wiper = BoomWiper()
 
 
-@app.route("/boom-wipe", methods=["POST"])
+@boom_bp.route("/boom-wipe", methods=["POST"])
 def boom_wipe():
     data = request.get_json()
     if not data or "device" not in data:
         return jsonify({"status": "error", "message": "Missing device parameter"}), 400
 
     device_name = data["device"]
-    wipe_id = f"wipe_{int(time.time())}_{os.getpid()}"
+    wipe_id = f"wipe_{int(time.time())}_{os.getpid()}_{uuid.uuid4().hex[:6]}"
+    mountpoint = boom_wiper.resolve_mountpoint(device_name)
 
-    threading.Thread(target=boom_wiper.execute_boom_wipe, args=(device_name, wipe_id), daemon=True).start()
+    boom_wiper.active_wipes[wipe_id] = {"status": "queued", "device": device_name, "progress": 0,
+                                        "method": "boom_wipe", "passes": boom_wiper.overwrite_passes}
+    boom_wiper.controls[wipe_id] = JobControl(boom_wiper.active_wipes[wipe_id], job_id=wipe_id)
 
-    return jsonify({"status": "success", "wipe_id": wipe_id, "demo_mode": boom_wiper.demo_mode})
+    def run():
+        entry = boom_wiper.active_wipes[wipe_id]
+        entry["started_at"] = time.time()
+        try:
+            boom_wiper.execute_boom_wipe(device_name, wipe_id)
+        finally:
+            entry["finished_at"] = time.time()
+            record_job(wipe_id, "boom", entry)
+            boom_wiper.device_files.pop(wipe_id, None)
+            throttles.release(wipe_id)
+            io_scheduler.release_device(mountpoint, wipe_id)
+
+    # One wipe per device; later requests wait in the I/O scheduler's device queue
+    queue_position = io_scheduler.run_exclusive(mountpoint, wipe_id, lambda: io_scheduler.submit_job(run))
+    return jsonify({"status": "success", "wipe_id": wipe_id, "queue_position": queue_position,
+                    "demo_mode": boom_wiper.demo_mode})
+
+
+@boom_bp.route("/free-space-wipe", methods=["POST"])
+def free_space_wipe():
+    data = request.get_json(silent=True) or {}
+    device_name = data.get("device")
+    if not device_name:
+        return jsonify({"status": "error", "message": "Missing device parameter"}), 400
+    pattern = data.get("pattern", "random")
+    if pattern not in free_space.PATTERNS:
+        return jsonify({"status": "error",
+                        "message": f"'pattern' must be one of: {', '.join(free_space.PATTERNS)}"}), 400
+    try:
+        workers = int(data.get("workers", free_space.DEFAULT_WORKERS))
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "'workers' must be an integer"}), 400
+
+    wipe_id = f"wipe_{int(time.time())}_{os.getpid()}_{uuid.uuid4().hex[:6]}"
+    mountpoint = boom_wiper.resolve_mountpoint(device_name)
+
+    boom_wiper.active_wipes[wipe_id] = {"status": "queued", "device": device_name, "progress": 0,
+                                        "method": "free_space_wipe", "passes": 1, "pattern": pattern}
+    boom_wiper.controls[wipe_id] = JobControl(boom_wiper.active_wipes[wipe_id], job_id=wipe_id)
+
+    def run():
+        entry = boom_wiper.active_wipes[wipe_id]
+        entry["started_at"] = time.time()
+        try:
+            boom_wiper.execute_free_space_wipe(device_name, wipe_id, workers, pattern)
+        finally:
+            entry["finished_at"] = time.time()
+            record_job(wipe_id, "boom", entry)
+            throttles.release(wipe_id)
+            io_scheduler.release_device(mountpoint, wipe_id)
 
+    # Shares the device queue with boom wipes: both write to the same filesystem
+    queue_position = io_scheduler.run_exclusive(mountpoint, wipe_id, lambda: io_scheduler.submit_job(run))
+    return jsonify({"status": "success", "wipe_id": wipe_id, "queue_position": queue_position,
+                    "demo_mode": boom_wiper.demo_mode})
 
-@app.route("/wipe-status/<wipe_id>", methods=["GET"])
+
+@boom_bp.route("/wipe-status/<wipe_id>", methods=["GET"])
 def get_wipe_status(wipe_id):
     if wipe_id in boom_wiper.active_wipes:
-        return jsonify({"status": "success", "wipe_status": boom_wiper.active_wipes[wipe_id]})
+        wipe_status = boom_wiper.active_wipes[wipe_id]
+        if wipe_status.get("status") == "queued":
+            wipe_status["queue_position"] = io_scheduler.queue_position(wipe_id)
+        control = boom_wiper.controls.get(wipe_id)
+        if control and wipe_status.get("status") not in ("completed", "failed", "cancelled"):
+            wipe_status["throttle"] = control.throttle.status()
+        return jsonify({"status": "success", "wipe_status": wipe_status})
     return jsonify({"status": "error", "message": "Wipe ID not found"}), 404
 
 
-@app.route("/devices", methods=["GET"])
+def _control_wipe(action):
+    data = request.get_json(silent=True) or {}
+    wipe_id = data.get("wipe_id")
+    if not wipe_id:
+        return jsonify({"status": "error", "message": "Missing wipe_id parameter"}), 400
+    control = boom_wiper.controls.get(wipe_id)
+    if control is None:
+        return jsonify({"status": "error", "message": "Wipe ID not found"}), 404
+    if boom_wiper.active_wipes.get(wipe_id, {}).get("status") in ("completed", "failed", "cancelled"):
+        return jsonify({"status": "error", "message": "Wipe already finished"}), 409
+    getattr(control, action)()
+    if action == "cancel" and io_scheduler.cancel_queued(wipe_id):
+        entry = boom_wiper.active_wipes[wipe_id]
+        entry.update({"status": "cancelled", "processed_files": [], "finished_at": time.time()})
+        record_job(wipe_id, "boom", entry)
+        boom_wiper.device_files.pop(wipe_id, None)
+        throttles.release(wipe_id)
+    return jsonify({"status": "success", "message": f"{action.capitalize()} requested for {wipe_id}"})
+
+
+@boom_bp.route("/wipe-cancel", methods=["POST"])
+def wipe_cancel():
+    return _control_wipe("cancel")
+
+
+@boom_bp.route("/wipe-pause", methods=["POST"])
+def wipe_pause():
+    return _control_wipe("pause")
+
+
+@boom_bp.route("/wipe-resume", methods=["POST"])
+def wipe_resume():
+    return _control_wipe("resume")
+
+
+@boom_bp.route("/devices", methods=["GET"])
 def list_devices():
     devices = []
     for p in psutil.disk_partitions():
@@ -178,6 +417,11 @@ def list_devices():
     return jsonify({"status": "success", "devices": devices})
 
 
+# Standalone service; the gateway in server.py mounts boom_bp instead
+app = Flask(__name__)
+app.register_blueprint(boom_bp)
+
 if __name__ == "__main__":
     logger.info("🚀 Starting Boom Wipe on port 5695 (REAL DELETE MODE)")
+    job_store.open()
     app.run(host="0.0.0.0", port=5695)
@@ -1,68 +1,136 @@
-from flask import Flask, jsonify
+from flask import Blueprint, Flask, Response, jsonify, request
 from flask_cors import CORS
+import os
 import sqlite3
 import logging
+import zlib
+
+from db import BACKEND_DIR, Database
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}})
+cart_bp = Blueprint("cart", __name__)
+CORS(cart_bp, resources={r"/*": {"origins": "*"}})
 
-DB_FILE = "cart.db"  # SQLite database file
+# SQLite database file, next to this module regardless of the working directory
+DB_FILE = os.environ.get("SECUREWIPE_CART_DB", os.path.join(BACKEND_DIR, "cart.db"))
 
-# --- Database setup (run once to create table and insert sample data) ---
-def init_db():
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cartItems (
-                id TEXT PRIMARY KEY,
-                productName TEXT NOT NULL,
-                customer TEXT NOT NULL,
-                quantity INTEGER NOT NULL,
-                price REAL NOT NULL,
-                status TEXT NOT NULL
-            )
+# Items are paged in id order; the cursor is the last id of the previous page
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+_SELECT_VERSION = "SELECT version FROM table_versions WHERE name = 'cartItems'"
+# One constant statement per filter combination so each stays in the statement cache
+_SELECT_PAGE = {
+    (False, False): "SELECT * FROM cartItems WHERE id > ? ORDER BY id LIMIT ?",
+    (True, False): "SELECT * FROM cartItems WHERE status = ? AND id > ? ORDER BY id LIMIT ?",
+    (False, True): "SELECT * FROM cartItems WHERE customer = ? AND id > ? ORDER BY id LIMIT ?",
+    (True, True): "SELECT * FROM cartItems WHERE status = ? AND customer = ? AND id > ? ORDER BY id LIMIT ?",
+}
+
+
+# --- Database setup (creates the table and inserts sample data on first use) ---
+def _create_schema(conn: sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cartItems (
+            id TEXT PRIMARY KEY,
+            productName TEXT NOT NULL,
+            customer TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            status TEXT NOT NULL
+        )
+    ''')
+
+    # Insert sample data if table is empty
+    count = conn.execute("SELECT COUNT(*) FROM cartItems").fetchone()[0]
+    if count == 0:
+        sample_data = [
+            ("ITEM-001", "SecureWipe Pro License", "Wayne Enterprises", 5, 499.99, "Processing"),
+            ("ITEM-002", "Hardware Destruction Voucher", "Cyberdyne Systems", 1, 2500.00, "Completed")
+        ]
+        conn.executemany("INSERT INTO cartItems VALUES (?, ?, ?, ?, ?, ?)", sample_data)
+        logger.info("Sample data inserted into cartItems table")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cart_status ON cartItems(status, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cart_customer ON cartItems(customer, id)")
+    # Every change to cartItems bumps its version, whoever writes it; the version is the ETag
+    conn.execute("CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES ('cartItems', 1)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS cart_items_version_{event.lower()} AFTER {event} ON cartItems
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = 'cartItems';
+            END
         ''')
 
-        # Insert sample data if table is empty
-        cursor.execute("SELECT COUNT(*) FROM cartItems")
-        count = cursor.fetchone()[0]
-        if count == 0:
-            sample_data = [
-                ("ITEM-001", "SecureWipe Pro License", "Wayne Enterprises", 5, 499.99, "Processing"),
-                ("ITEM-002", "Hardware Destruction Voucher", "Cyberdyne Systems", 1, 2500.00, "Completed")
-            ]
-            cursor.executemany("INSERT INTO cartItems VALUES (?, ?, ?, ?, ?, ?)", sample_data)
-            conn.commit()
-            logger.info("Sample data inserted into cartItems table")
-        conn.close()
+
+db = Database(DB_FILE, _create_schema)
+
+
+def init_db():
+    try:
+        db.connection()
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
 
-# Initialize DB
-init_db()
+
+@cart_bp.record_once
+def _init_cart_db(state):
+    # Create the schema (and sample items) when the API is registered, not on import
+    init_db()
+
+
+def cart_version() -> int:
+    row = db.query_one(_SELECT_VERSION)
+    return row[0] if row else 0
+
+
+def get_page(limit: int = PAGE_SIZE, cursor: str = "", status: str = "", customer: str = ""):
+    """(items, next_cursor) for one page in id order, optionally filtered by status and customer."""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    params = [v for v in (status, customer) if v] + [cursor or "", limit + 1]
+    rows = db.query_all(_SELECT_PAGE[(bool(status), bool(customer))], params)
+    items = [dict(row) for row in rows[:limit]]
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+    return items, next_cursor
+
 
 # --- Endpoint ---
-@app.route("/getCartItems", methods=["GET"])
+@cart_bp.route("/getCartItems", methods=["GET"])
 def get_cart_items():
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row  # Return dict-like rows
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM cartItems")
-        rows = cursor.fetchall()
-        conn.close()
-
-        cart_items = [dict(row) for row in rows]
-        return jsonify({"cartItems": cart_items}), 200
+        args = request.args
+        try:
+            limit = int(args.get("limit", PAGE_SIZE))
+        except ValueError:
+            return jsonify({"error": "Invalid 'limit'"}), 400
+        cursor, status, customer = args.get("cursor", ""), args.get("status", ""), args.get("customer", "")
+
+        # Weak validator: table version + the query; unchanged carts cost one primary-key lookup
+        query = f"{limit}|{cursor}|{status}|{customer}".encode("utf-8")
+        etag = f"cart-{cart_version()}-{zlib.crc32(query):08x}"
+        if request.if_none_match.contains_weak(etag):
+            resp = Response(status=304)
+        else:
+            cart_items, next_cursor = get_page(limit, cursor, status, customer)
+            resp = jsonify({"cartItems": cart_items, "next_cursor": next_cursor})
+            if next_cursor:
+                resp.headers["X-Next-Cursor"] = next_cursor
+        resp.set_etag(etag, weak=True)
+        # Clients may keep the response but must revalidate it on every use
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
     except Exception as e:
         logger.error(f"Error fetching cart items: {e}")
         return jsonify({"error": str(e)}), 500
 
+# Standalone service; the gateway in server.py mounts cart_bp instead
 if __name__ == "__main__":
+    app = Flask(__name__)
+    app.register_blueprint(cart_bp)
     logger.info("🚀 Starting server on port 9684")
     app.run(host="0.0.0.0", port=9684)
@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+# Databases live next to the code, not in whatever directory the service was started from
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BACKEND_DIR, "data")
+
+# Per-connection settings. WAL lets readers run alongside the single writer; NORMAL
+# sync is durable across application crashes (a power loss may drop the last commits)
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8192",        # 8 MiB page cache per connection
+    "PRAGMA mmap_size=67108864",      # read pages through a 64 MiB mapping
+    "PRAGMA foreign_keys=ON",
+)
+# Prepared statements kept per connection; callers use constant SQL strings so repeats hit the cache
+STATEMENT_CACHE = 128
+
+
+def data_path(name: str) -> str:
+    return os.path.join(DATA_DIR, name)
+
+
+class Database:
+    """Shared access to one SQLite file: one long-lived connection per thread.
+
+    Connections are opened lazily per worker thread (the gateway's thread pool
+    bounds how many exist), configured once with PRAGMAS, and keep their prepared
+    statements between requests. Reads run in autocommit mode; writes go through
+    transaction(), which takes the write lock up front (BEGIN IMMEDIATE).
+    """
+
+    def __init__(self, path: str, schema: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.path = os.path.abspath(path)
+        self._schema = schema
+        self._schema_ready = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+
+    def _open(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            if not self._schema_ready and self._schema is not None:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._schema(conn)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            self._schema_ready = True
+            self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def query_one(self, sql: str, params: Sequence[Any] = ()) -> Optional[sqlite3.Row]:
+        return self.connection().execute(sql, params).fetchone()
+
+    def query_all(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        return self.connection().execute(sql, params).fetchall()
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> sqlite3.Cursor:
+        """Single statement in its own write transaction."""
+        with self.transaction() as conn:
+            return conn.execute(sql, params)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"path": self.path, "connections": len(self._connections)}
+
+    def close_all(self) -> None:
+        """Close every thread's connection (shutdown and tests); threads reopen on next use."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
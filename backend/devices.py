@@ -1,8 +1,15 @@
 import json
 import subprocess
 import sys
+import threading
+import time
 from typing import List, Dict, Any
 
+# Device enumeration shells out to PowerShell; share one snapshot between callers
+DEVICE_CACHE_TTL = 3.0
+_inventory_lock = threading.Lock()
+_inventory: Dict[str, Any] = {"devices": [], "at": float("-inf")}
+
 
 def human_readable_size(num_bytes: Any) -> str:
     if num_bytes is None:
@@ -81,9 +88,18 @@ $disks | ConvertTo-Json -Depth 3
         return []
 
 
-def list_devices() -> List[Dict[str, Any]]:
+def _list_devices_uncached() -> List[Dict[str, Any]]:
     if sys.platform.startswith("win"):
         return _windows_list_devices()
     # Non-Windows fallback: return an empty list (or add Linux/macOS implementations later)
     return []
 
+
+def list_devices(max_age: float = DEVICE_CACHE_TTL) -> List[Dict[str, Any]]:
+    """Return the device inventory, re-enumerating at most every `max_age` seconds."""
+    with _inventory_lock:
+        if time.monotonic() - _inventory["at"] > max_age:
+            _inventory["devices"] = _list_devices_uncached()
+            _inventory["at"] = time.monotonic()
+        return list(_inventory["devices"])
+
@@ -0,0 +1,436 @@
+import errno
+import os
+import stat
+import struct
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import simdevice
+
+# (offset, length) byte ranges, absolute on the device
+Extent = Tuple[int, int]
+Reader = Callable[[int, int], bytes]
+
+SECTOR = 512
+# FAT tables and exFAT bitmaps are read in pieces of this size
+TABLE_READ = 4 * 1024 * 1024
+_FAT_EOC = {"fat12": 0xFF8, "fat16": 0xFFF8, "fat32": 0x0FFFFFF8}
+
+
+def merge(extents: List[Extent]) -> List[Extent]:
+    """Sorted, non-overlapping, non-empty copy of `extents`."""
+    merged: List[List[int]] = []
+    for offset, length in sorted(e for e in extents if e[1] > 0):
+        if merged and offset <= merged[-1][0] + merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], offset + length - merged[-1][0])
+        else:
+            merged.append([offset, length])
+    return [(o, n) for o, n in merged]
+
+
+def subtract(extents: List[Extent], remove: List[Extent]) -> List[Extent]:
+    """Parts of `extents` not covered by `remove`."""
+    result: List[Extent] = []
+    remove = merge(remove)
+    i = 0
+    for offset, length in merge(extents):
+        end = offset + length
+        while i < len(remove) and remove[i][0] + remove[i][1] <= offset:
+            i += 1
+        j = i
+        while offset < end:
+            if j >= len(remove) or remove[j][0] >= end:
+                result.append((offset, end - offset))
+                break
+            if remove[j][0] > offset:
+                result.append((offset, remove[j][0] - offset))
+            offset = max(offset, remove[j][0] + remove[j][1])
+            j += 1
+    return result
+
+
+def total(extents: List[Extent]) -> int:
+    return sum(length for _, length in merge(extents))
+
+
+def clip(extents: List[Extent], size: int) -> List[Extent]:
+    return [(o, min(n, size - o)) for o, n in extents if o < size]
+
+
+# -- FAT12 / FAT16 / FAT32 --------------------------------------------------------
+
+def _fat_layout(boot: bytes) -> Optional[Dict[str, Any]]:
+    if len(boot) < 512 or boot[510:512] != b"\x55\xaa" or boot[0] not in (0xEB, 0xE9):
+        return None
+    bps, spc, reserved, nfats, root_entries, total16, _, fatsz16 = struct.unpack_from("<HBHBHHBH", boot, 11)
+    total32, fatsz32 = struct.unpack_from("<II", boot, 32)
+    if bps not in (512, 1024, 2048, 4096) or spc == 0 or spc & (spc - 1) or not reserved or nfats not in (1, 2):
+        return None
+    fat_sectors = fatsz16 or fatsz32
+    total_sectors = total16 or total32
+    root_sectors = (root_entries * 32 + bps - 1) // bps
+    data_sector = reserved + nfats * fat_sectors + root_sectors
+    if not fat_sectors or data_sector >= total_sectors:
+        return None
+    clusters = (total_sectors - data_sector) // spc
+    kind = "fat12" if clusters < 4085 else "fat16" if clusters < 65525 else "fat32"
+    return {
+        "kind": kind,
+        "bytes_per_sector": bps,
+        "cluster_size": bps * spc,
+        "clusters": clusters,
+        "fat_offset": reserved * bps,
+        "fat_bytes": fat_sectors * bps,
+        "root_offset": (reserved + nfats * fat_sectors) * bps,
+        "root_bytes": root_sectors * bps,
+        "data_offset": data_sector * bps,
+        "size": total_sectors * bps,
+        "root_cluster": struct.unpack_from("<I", boot, 44)[0] if kind == "fat32" else None,
+    }
+
+
+def _read_fat(read: Reader, base: int, layout: Dict[str, Any]) -> List[int]:
+    """The first FAT as a list of cluster entries (index = cluster number)."""
+    count = layout["clusters"] + 2
+    kind = layout["kind"]
+    width = {"fat12": 1.5, "fat16": 2, "fat32": 4}[kind]
+    raw = bytearray()
+    needed = min(layout["fat_bytes"], int(count * width) + 2)
+    offset = base + layout["fat_offset"]
+    while len(raw) < needed:
+        chunk = read(offset + len(raw), min(TABLE_READ, needed - len(raw)))
+        if not chunk:
+            break
+        raw += chunk
+    if kind == "fat32":
+        raw = raw[:len(raw) // 4 * 4]
+        return [v & 0x0FFFFFFF for v in memoryview(raw).cast("I")][:count]
+    if kind == "fat16":
+        raw = raw[:len(raw) // 2 * 2]
+        return list(memoryview(raw).cast("H"))[:count]
+    # FAT12: two 12-bit entries packed into every three bytes
+    entries = []
+    for n in range(min(count, (len(raw) - 1) * 2 // 3)):
+        pair = raw[n * 3 // 2] | raw[n * 3 // 2 + 1] << 8
+        entries.append(pair >> 4 if n & 1 else pair & 0xFFF)
+    return entries
+
+
+def _runs(clusters: List[int]) -> List[Tuple[int, int]]:
+    """(first cluster, count) runs of consecutive cluster numbers."""
+    runs: List[List[int]] = []
+    for c in sorted(set(clusters)):
+        if runs and c == runs[-1][0] + runs[-1][1]:
+            runs[-1][1] += 1
+        else:
+            runs.append([c, 1])
+    return [(c, n) for c, n in runs]
+
+
+def _cluster_extents(clusters: List[int], base: int, data_offset: int, cluster_size: int) -> List[Extent]:
+    return [(base + data_offset + (c - 2) * cluster_size, n * cluster_size) for c, n in _runs(clusters)]
+
+
+def _chain(fat: List[int], first: int, eoc: int, seen: Set[int]) -> List[int]:
+    clusters = []
+    c = first
+    while 2 <= c < len(fat) and c < eoc and c not in seen:
+        seen.add(c)
+        clusters.append(c)
+        c = fat[c]
+    return clusters
+
+
+def _fat_walk(read: Reader, base: int, layout: Dict[str, Any],
+              fat: List[int]) -> Tuple[List[int], List[Tuple[int, List[int]]]]:
+    """Walk the directory tree read-only: (directory clusters incl. the FAT32 root, [(file size, clusters)])."""
+    fat32 = layout["kind"] == "fat32"
+    eoc = _FAT_EOC[layout["kind"]]
+    cs = layout["cluster_size"]
+    seen: Set[int] = set()
+    pending: List[List[int]] = []
+    files: List[Tuple[int, List[int]]] = []
+
+    def scan(data: bytes) -> None:
+        for pos in range(0, len(data) - 31, 32):
+            entry = data[pos:pos + 32]
+            if entry[0] == 0x00:  # end of directory
+                return
+            attr = entry[11]
+            if entry[0] == 0xE5 or attr == 0x0F or attr & 0x08 or entry[0] == 0x2E:
+                continue  # deleted, long name, volume label, or "." / ".."
+            hi = struct.unpack_from("<H", entry, 20)[0] if fat32 else 0
+            lo = struct.unpack_from("<H", entry, 26)[0]
+            chain = _chain(fat, (hi << 16) | lo, eoc, seen)
+            if not chain:
+                continue
+            if attr & 0x10:
+                pending.append(chain)
+            else:
+                files.append((struct.unpack_from("<I", entry, 28)[0], chain))
+
+    if fat32:
+        pending.append(_chain(fat, layout["root_cluster"], eoc, seen))
+    else:
+        scan(read(base + layout["root_offset"], layout["root_bytes"]))
+    directory_clusters: List[int] = []
+    while pending:
+        clusters = pending.pop()
+        directory_clusters.extend(clusters)
+        scan(b"".join(read(base + layout["data_offset"] + (c - 2) * cs, cs) for c in clusters))
+    return directory_clusters, files
+
+
+def _fat_map(read: Reader, base: int, size: int) -> Optional[Dict[str, Any]]:
+    layout = _fat_layout(read(base, SECTOR))
+    if layout is None or layout["size"] > size:
+        return None
+    fat = _read_fat(read, base, layout)
+    cs = layout["cluster_size"]
+    used = [c for c in range(2, len(fat)) if fat[c]]
+    directories, files = _fat_walk(read, base, layout, fat)
+    # Boot sector, reserved sectors, every FAT copy and (FAT12/16) the fixed root directory
+    metadata = [(base, layout["data_offset"])] + _cluster_extents(directories, base, layout["data_offset"], cs)
+    data = subtract(_cluster_extents(used, base, layout["data_offset"], cs), metadata)
+    return {"source": layout["kind"], "cluster_size": cs, "metadata": metadata, "data": data,
+            "files": [(size, _cluster_extents(chain, base, layout["data_offset"], cs)) for size, chain in files]}
+
+
+# -- exFAT ----------------------------------------------------------------------
+
+def _exfat_map(read: Reader, base: int, size: int) -> Optional[Dict[str, Any]]:
+    boot = read(base, SECTOR)
+    if len(boot) < 512 or boot[3:11] != b"EXFAT   " or boot[510:512] != b"\x55\xaa":
+        return None
+    fat_offset, _, heap_offset, cluster_count, root_cluster = struct.unpack_from("<IIIII", boot, 80)
+    bps = 1 << boot[108]
+    cs = bps << boot[109]
+    heap = heap_offset * bps
+    if heap >= size:
+        return None
+
+    seen: Set[int] = set()
+
+    def fat_entry(cluster: int) -> int:
+        return struct.unpack("<I", read(base + fat_offset * bps + cluster * 4, 4))[0]
+
+    def chain(first: int, length: int = 0) -> List[int]:
+        clusters: List[int] = []
+        c = first
+        while 2 <= c < cluster_count + 2 and c not in seen:
+            seen.add(c)
+            clusters.append(c)
+            c = fat_entry(c)
+        if len(clusters) * cs < length:
+            # Contiguous (NoFatChain) allocation: the FAT does not describe it
+            clusters = list(range(first, first + (length + cs - 1) // cs))
+        return clusters
+
+    root = chain(root_cluster)
+    bitmap_first, bitmap_length = None, 0
+    for c in root:
+        data = read(base + heap + (c - 2) * cs, cs)
+        for pos in range(0, len(data) - 31, 32):
+            if data[pos] == 0x81:  # allocation bitmap directory entry
+                bitmap_first, bitmap_length = struct.unpack_from("<IQ", data, pos + 20)
+                break
+        if bitmap_first is not None:
+            break
+    if bitmap_first is None:
+        return None
+    bitmap_clusters = chain(bitmap_first, bitmap_length)
+    bitmap = b"".join(read(base + heap + (c - 2) * cs, cs) for c in bitmap_clusters)[:(cluster_count + 7) // 8]
+    used = [i + 2 for i in range(min(cluster_count, len(bitmap) * 8)) if bitmap[i >> 3] >> (i & 7) & 1]
+    # Main and backup boot regions, the FAT, the root directory and the bitmap itself
+    metadata = [(base, heap)] + _cluster_extents(root + bitmap_clusters, base, heap, cs)
+    data = subtract(_cluster_extents(used, base, heap, cs), metadata)
+    return {"source": "exfat", "cluster_size": cs, "metadata": metadata, "data": data}
+
+
+def _volume_map(read: Reader, base: int, size: int) -> Optional[Dict[str, Any]]:
+    for parse in (_fat_map, _exfat_map):
+        try:
+            result = parse(read, base, size)
+        except (struct.error, IndexError, ValueError):
+            result = None
+        if result:
+            return result
+    return None
+
+
+# -- partition tables ---------------------------------------------------------------
+
+def _partition_table(read: Reader, size: int) -> Optional[Dict[str, Any]]:
+    """GPT or MBR partitions as (offset, length) plus the table's own regions."""
+    header = read(SECTOR, SECTOR)
+    if header[:8] == b"EFI PART":
+        first_usable, last_usable = struct.unpack_from("<QQ", header, 40)
+        entries_lba, count, entry_size = struct.unpack_from("<QII", header, 72)
+        table = read(entries_lba * SECTOR, count * entry_size)
+        partitions = []
+        for pos in range(0, len(table) - entry_size + 1, entry_size):
+            if table[pos:pos + 16] == bytes(16):
+                continue
+            first, last = struct.unpack_from("<QQ", table, pos + 32)
+            partitions.append((first * SECTOR, (last - first + 1) * SECTOR))
+        # Protective MBR, primary header and entries; backup entries and header at the end
+        metadata = [(0, first_usable * SECTOR), ((last_usable + 1) * SECTOR, size - (last_usable + 1) * SECTOR)]
+        return {"source": "gpt", "metadata": metadata, "partitions": partitions}
+
+    mbr = read(0, SECTOR)
+    if len(mbr) < 512 or mbr[510:512] != b"\x55\xaa":
+        return None
+    partitions = []
+    for i in range(4):
+        ptype = mbr[446 + i * 16 + 4]
+        start, count = struct.unpack_from("<II", mbr, 446 + i * 16 + 8)
+        if ptype and count and start * SECTOR < size:
+            # Logical partitions inside an extended one are not parsed: the whole area counts as data
+            partitions.append((start * SECTOR, count * SECTOR))
+    if not partitions:
+        return None
+    first = min(offset for offset, _ in partitions)
+    # MBR sector plus the gap before the first partition (boot loader)
+    return {"source": "mbr", "metadata": [(0, first)], "partitions": partitions}
+
+
+# -- sparse image files -------------------------------------------------------------
+
+def _seek_data_map(path: str, size: int) -> Optional[List[Extent]]:
+    """Data regions of a regular file via SEEK_DATA / SEEK_HOLE; None where unsupported."""
+    if not hasattr(os, "SEEK_DATA"):
+        return None
+    extents: List[Extent] = []
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        offset = 0
+        while offset < size:
+            try:
+                start = os.lseek(fd, offset, os.SEEK_DATA)
+            except OSError as e:
+                if e.errno == errno.ENXIO:  # only a hole is left
+                    break
+                return None
+            end = os.lseek(fd, start, os.SEEK_HOLE)
+            extents.append((start, min(end, size) - start))
+            offset = end
+    finally:
+        os.close(fd)
+    return extents
+
+
+def _is_regular_file(path: str) -> bool:
+    try:
+        return stat.S_ISREG(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+def allocation_map(path: str) -> Dict[str, Any]:
+    """Map of the regions of a device or image that hold data, read-only.
+
+    Tries, in order: a FAT12/16/32 or exFAT volume, a GPT / MBR partition table
+    (each partition parsed as a volume, whole partition when unknown), then the
+    data regions of a sparse image file. Anything else counts as fully allocated.
+    Returns {"source", "size", "metadata", "data", "allocated_bytes", ...} with
+    sorted, merged extents; "metadata" holds partition tables ("tables") and
+    filesystem structures, "data" the allocated clusters. FAT volumes also list
+    "files" as (size, extents), which need not be sorted.
+    """
+    size = simdevice.device_size(path)
+    with simdevice.open_device(path) as dev:
+        def read(offset: int, length: int) -> bytes:
+            return dev.pread(max(0, min(length, size - offset)), offset) if offset < size else b""
+
+        volume = _volume_map(read, 0, size)
+        partitions: List[Dict[str, Any]] = []
+        tables: List[Extent] = []
+        files: List[Tuple[int, List[Extent]]] = []
+        if volume is not None:
+            source, metadata, data = volume["source"], volume["metadata"], volume["data"]
+            files = volume.get("files", [])
+        else:
+            table = _partition_table(read, size)
+            if table is not None:
+                tables = table["metadata"]
+                source, metadata, data = table["source"], list(tables), []
+                for offset, length in table["partitions"]:
+                    length = min(length, size - offset)
+                    part = _volume_map(read, offset, length)
+                    partitions.append({"offset": offset, "length": length,
+                                       "source": part["source"] if part else "unknown"})
+                    if part is None:
+                        data.append((offset, length))
+                    else:
+                        metadata += part["metadata"]
+                        data += part["data"]
+                        files += part.get("files", [])
+            else:
+                extents = _seek_data_map(path, size) if _is_regular_file(path) else None
+                source = "seek_data" if extents is not None else "none"
+                metadata, data = [], extents if extents is not None else [(0, size)]
+    metadata = merge(clip(metadata, size))
+    data = subtract(clip(data, size), metadata)
+    allocated = total(metadata) + total(data)
+    return {
+        "source": source,
+        "size": size,
+        "tables": merge(clip(tables, size)),
+        "metadata": metadata,
+        "data": data,
+        "files": files,
+        "partitions": partitions,
+        "allocated_bytes": allocated,
+        "allocated_ratio": round(allocated / size, 4) if size else 0.0,
+    }
+
+
+def _claim(extents: List[Tuple[int, int, int]], taken: List[Extent]) -> List[Tuple[int, int, int]]:
+    """(tag, offset, length) pieces of (offset, length, tag) `extents` outside `taken` and each other.
+
+    A single sweep in offset order; where extents overlap, the one starting first keeps the bytes.
+    """
+    taken = merge(taken)
+    pieces: List[Tuple[int, int, int]] = []
+    i = end = 0
+    for offset, length, tag in sorted(extents):
+        stop = offset + length
+        offset = max(offset, end)
+        end = max(end, stop)
+        while offset < stop:
+            while i < len(taken) and taken[i][0] + taken[i][1] <= offset:
+                i += 1
+            if i < len(taken) and taken[i][0] <= offset:
+                offset = taken[i][0] + taken[i][1]
+                continue
+            piece_end = min(stop, taken[i][0]) if i < len(taken) else stop
+            if pieces and pieces[-1][0] == tag and pieces[-1][1] + pieces[-1][2] == offset:
+                pieces[-1] = (tag, pieces[-1][1], piece_end - pieces[-1][1])
+            else:
+                pieces.append((tag, offset, piece_end - offset))
+            offset = piece_end
+    return pieces
+
+
+def priority_plan(allocation: Dict[str, Any], sweep: bool = True) -> List[Tuple[str, Extent]]:
+    """Order in which to overwrite a mapped device, for the fastest loss of recoverability.
+
+    Partition tables first, then the rest of the filesystem metadata (FATs,
+    directories, exFAT bitmap), then user data by descending file size (or
+    extent length where files are unknown), then, with `sweep`, the free space.
+    Returns (phase, extent) pairs with phase "metadata", "data" or "free";
+    together they cover every mapped byte exactly once.
+    """
+    metadata = allocation["metadata"]
+    tables = allocation.get("tables", [])
+    plan: List[Tuple[str, Extent]] = [("metadata", e) for e in tables + subtract(metadata, tables)]
+    # Chains never share clusters within a volume, so this only trims metadata in practice
+    files = sorted(allocation.get("files", []), key=lambda f: -f[0])
+    pieces = sorted(_claim([(o, n, rank) for rank, (_, extents) in enumerate(files) for o, n in extents], metadata))
+    claimed = [(o, n) for _, o, n in pieces]
+    plan += [("data", e) for e in claimed]
+    rest = subtract(allocation["data"], metadata + claimed)
+    plan += [("data", e) for e in sorted(rest, key=lambda e: (-e[1], e[0]))]
+    if sweep:
+        allocated = merge(metadata + claimed + rest)
+        plan += [("free", e) for e in subtract([(0, allocation["size"])], allocated)]
+    return plan
@@ -0,0 +1,258 @@
+import errno
+import os
+import re
+import stat
+import struct
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the overwrite fallback is available
+    fcntl = None
+
+from jobs import JobControl
+import metrics
+import simdevice
+
+# Linux block-layer ioctls (linux/fs.h); each takes a uint64 [start, length] range
+BLKDISCARD = 0x1277
+BLKSECDISCARD = 0x127D
+BLKZEROOUT = 0x127F
+
+# Ranges are issued in chunks so pause/cancel and progress work on large devices
+CHUNK_SIZE = 1024 ** 3
+OVERWRITE_BLOCK = 4 * 1024 * 1024
+
+# Erase paths in order of preference for mode "auto":
+#   secdiscard  BLKSECDISCARD: the device erases the blocks, including remapped copies
+#   discard     BLKDISCARD, then BLKZEROOUT so the range reads back as zeros (discard alone
+#               does not guarantee that), which the device can do by unmapping
+#   zeroout     BLKZEROOUT: zeroes written (or unmapped) by the device itself
+#               Without write-zeroes support (write_zeroes_max_bytes == 0, e.g. most USB
+#               sticks) the kernel writes the zeros instead: as slow as an overwrite
+#   overwrite   one pass of zeros with regular writes; used when nothing else is supported
+MODES = ("auto", "secdiscard", "discard", "zeroout", "overwrite")
+_PLANS = {
+    "secdiscard": [("blksecdiscard", BLKSECDISCARD)],
+    "discard": [("blkdiscard", BLKDISCARD), ("blkzeroout", BLKZEROOUT)],
+    "zeroout": [("blkzeroout", BLKZEROOUT)],
+}
+# errnos meaning "this device/kernel does not do that", as opposed to an I/O failure
+_UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS}
+# Regular image files are only erased from these directories (os.pathsep-separated; unset: none)
+IMAGE_DIRS = [os.path.realpath(d) for d in os.environ.get("SECUREWIPE_IMAGE_DIRS", "").split(os.pathsep) if d]
+_WINDOWS_DRIVE_RE = re.compile(r"^\\\\\.\\PhysicalDrive\d+$", re.IGNORECASE)
+
+
+class EraseUnsupported(Exception):
+    """The requested ioctl path is not supported by this device."""
+
+
+def _sysfs_queue(path: str) -> Optional[str]:
+    """/sys/.../queue directory of the disk holding `path` (partitions use their parent)."""
+    try:
+        rdev = os.stat(path).st_rdev
+    except OSError:
+        return None
+    base = os.path.realpath(f"/sys/dev/block/{os.major(rdev)}:{os.minor(rdev)}")
+    if os.path.exists(os.path.join(base, "partition")):
+        base = os.path.dirname(base)
+    queue = os.path.join(base, "queue")
+    return queue if os.path.isdir(queue) else None
+
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def is_block_device(path: str) -> bool:
+    try:
+        return stat.S_ISBLK(os.stat(path).st_mode)
+    except (OSError, TypeError):
+        return False
+
+
+def capabilities(path: str) -> Dict[str, Any]:
+    """What the kernel reports for `path`: discard / write-zeroes limits and rotational flag."""
+    caps: Dict[str, Any] = {"path": path, "block_device": False, "discard": False, "zeroout": False,
+                            "zeroout_offload": None, "rotational": None, "discard_max_bytes": None,
+                            "write_zeroes_max_bytes": None}
+    if simdevice.is_sim_path(path):
+        caps.update(simulated=True, discard=True, zeroout=True, zeroout_offload=True, rotational=False)
+        return caps
+    if not sys.platform.startswith("linux") or not is_block_device(path):
+        return caps
+    caps["block_device"] = True
+    queue = _sysfs_queue(path)
+    if queue:
+        discard_max = _read_int(os.path.join(queue, "discard_max_bytes"))
+        zeroes_max = _read_int(os.path.join(queue, "write_zeroes_max_bytes"))
+        rotational = _read_int(os.path.join(queue, "rotational"))
+        caps.update(discard_max_bytes=discard_max, write_zeroes_max_bytes=zeroes_max,
+                    discard=bool(discard_max), rotational=bool(rotational) if rotational is not None else None,
+                    # False: BLKZEROOUT is served by the kernel writing zeros over the whole range
+                    zeroout_offload=bool(zeroes_max) if zeroes_max is not None else None)
+    # BLKZEROOUT always works on a block device: the kernel falls back to writing zeros
+    caps["zeroout"] = True
+    return caps
+
+
+def is_allowed_image(path: str) -> bool:
+    """A regular file inside one of IMAGE_DIRS."""
+    if not IMAGE_DIRS or not os.path.isfile(path):
+        return False
+    real = os.path.realpath(path)
+    return any(os.path.commonpath([real, d]) == d for d in IMAGE_DIRS)
+
+
+def resolve_device(device_name: str) -> Optional[str]:
+    """Device path for fast / crypto erase, or None.
+
+    Accepts a sim:// device, a block device (path or /dev/<name>), a Windows
+    \\\\.\\PhysicalDriveN path, or an image file under SECUREWIPE_IMAGE_DIRS;
+    never any other file or directory.
+    """
+    if simdevice.is_sim_path(device_name):
+        return device_name
+    if sys.platform.startswith("win"):
+        return device_name if _WINDOWS_DRIVE_RE.match(device_name) or is_allowed_image(device_name) else None
+    if is_block_device(device_name) or is_allowed_image(device_name):
+        return device_name
+    dev = "/dev/" + device_name
+    return dev if sys.platform.startswith("linux") and is_block_device(dev) else None
+
+
+def recommended(path: Optional[str]) -> bool:
+    """Fast erase pays off on flash: a non-rotational device with discard and offloaded zero-out."""
+    if not path:
+        return False
+    caps = capabilities(path)
+    return bool(caps["discard"]) and caps["rotational"] is not True and caps["zeroout_offload"] is not False
+
+
+def _ioctl_range(fd: int, request: int, start: int, length: int) -> None:
+    try:
+        fcntl.ioctl(fd, request, struct.pack("QQ", start, length))
+    except OSError as e:
+        if e.errno in _UNSUPPORTED:
+            raise EraseUnsupported(os.strerror(e.errno)) from e
+        raise
+
+
+def _run_ranges(step, size: int, chunk: int, control: Optional[JobControl], done_before: float,
+                share: float) -> None:
+    """Call step(start, length) over [0, size) in chunks, reporting progress as a share of the job."""
+    offset = 0
+    while offset < size:
+        if control:
+            control.checkpoint()
+        length = min(chunk, size - offset)
+        step(offset, length)
+        offset += length
+        if control:
+            control.report(done_before + share * offset * 100.0 / size,
+                           processed_ranges=[{"offset": 0, "length": offset}])
+
+
+def _ioctl_plan(path: str, size: int, plan, chunk: int, control: Optional[JobControl]) -> None:
+    fd = os.open(path, os.O_WRONLY | os.O_EXCL)  # O_EXCL: refuses a mounted block device
+    try:
+        for index, (name, request) in enumerate(plan):
+            def step(start, length, name=name, request=request):
+                with metrics.timed("fast_erase", name, length):
+                    _ioctl_range(fd, request, start, length)
+            _run_ranges(step, size, chunk, control, 100.0 * index / len(plan), 1.0 / len(plan))
+        with metrics.timed("fast_erase", "fsync"):
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _sim_plan(path: str, size: int, plan, chunk: int, control: Optional[JobControl]) -> None:
+    device = simdevice.sim_devices.ensure(path)
+    for index, (name, _) in enumerate(plan):
+        def step(start, length, name=name):
+            with metrics.timed("fast_erase", name, length):
+                device.discard(start, length)
+        _run_ranges(step, size, chunk, control, 100.0 * index / len(plan), 1.0 / len(plan))
+    device.fsync()
+
+
+def _overwrite(path: str, size: int, control: Optional[JobControl]) -> None:
+    zeros = bytes(OVERWRITE_BLOCK)
+    with simdevice.open_device(path, writable=True, exclusive=is_block_device(path)) as dev:
+        def step(start, length):
+            if control:
+                control.throttle(length)
+            with metrics.timed("fast_erase", "write", length):
+                dev.pwrite(zeros[:length], start)
+        _run_ranges(step, size, OVERWRITE_BLOCK, control, 0.0, 1.0)
+        with metrics.timed("fast_erase", "fsync"):
+            dev.fsync()
+
+
+def erase_device(path: str, mode: str = "auto", chunk_size: int = CHUNK_SIZE,
+                 control: Optional[JobControl] = None) -> Dict[str, Any]:
+    """Erase a whole device with discard / zero-out ioctls, falling back to overwriting.
+
+    Returns a result dict with the path actually used ("blksecdiscard",
+    "blkdiscard+blkzeroout", "blkzeroout" or "overwrite") and the paths that were
+    tried and rejected by the device. `fast` is False when every byte was written:
+    an overwrite, or BLKZEROOUT on a device without write-zeroes support
+    (`kernel_zero_fill`).
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of: {', '.join(MODES)}")
+    sim = simdevice.is_sim_path(path)
+    size = simdevice.device_size(path)
+    caps = capabilities(path)
+    if mode == "auto":
+        candidates = ["secdiscard", "discard", "zeroout"] if caps["discard"] else ["zeroout"]
+    elif mode == "overwrite":
+        candidates = []
+    else:
+        candidates = [mode]
+
+    attempts: List[Dict[str, str]] = []
+    used = None
+    started = time.monotonic()
+    ioctl_ok = sim or (fcntl is not None and caps["block_device"])
+    for candidate in candidates:
+        plan = _PLANS[candidate]
+        label = "+".join(name for name, _ in plan)
+        if not ioctl_ok:
+            attempts.append({"path": label, "error": "not a Linux block device"})
+            continue
+        try:
+            if sim:
+                if candidate == "secdiscard":
+                    raise EraseUnsupported("simulated devices have no secure discard")
+                _sim_plan(path, size, plan, chunk_size, control)
+            else:
+                _ioctl_plan(path, size, plan, chunk_size, control)
+            used = label
+            break
+        except EraseUnsupported as e:
+            attempts.append({"path": label, "error": str(e)})
+    if used is None:
+        _overwrite(path, size, control)
+        used = "overwrite"
+    elapsed = time.monotonic() - started
+    kernel_zero_fill = "blkzeroout" in used and caps["zeroout_offload"] is False
+    return {
+        "path": used,
+        "mode": mode,
+        "fast": used != "overwrite" and not kernel_zero_fill,
+        "kernel_zero_fill": kernel_zero_fill,
+        "attempts": attempts,
+        "bytes": size,
+        "seconds": round(elapsed, 3),
+        "throughput_mb_s": round(size / (1024 ** 2) / elapsed, 2) if elapsed > 0 else None,
+        "capabilities": caps,
+    }
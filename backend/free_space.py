@@ -0,0 +1,206 @@
+import errno
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import wait
+from typing import Any, Dict, List, Optional
+
+from jobs import JobControl
+from io_scheduler import io_scheduler
+import metrics
+
+# Each worker fills one file at a time; files are preallocated in FILE_SIZE steps
+FILE_SIZE = int(os.environ.get("SECUREWIPE_FREE_SPACE_FILE_MB", "1024")) * 1024 * 1024
+WRITE_BLOCK = 4 * 1024 * 1024
+# Once the big writes hit ENOSPC, one worker fills what is left in small writes
+TAIL_BLOCK = 64 * 1024
+DEFAULT_WORKERS = int(os.environ.get("SECUREWIPE_FREE_SPACE_WORKERS", "4"))
+MAX_WORKERS = 16
+PATTERNS = ("zero", "random", "ones")
+# Progress (and statvfs) is refreshed this often
+PROGRESS_INTERVAL = 0.5
+FILL_DIR_PREFIX = ".securewipe-free-"
+
+
+def free_bytes(path: str) -> int:
+    """Free bytes on the filesystem holding `path` that this process can write.
+
+    root may use the blocks reserved for it, so it counts them too.
+    """
+    try:
+        st = os.statvfs(path)
+    except AttributeError:  # Windows
+        return shutil.disk_usage(path).free
+    blocks = st.f_bfree if hasattr(os, "geteuid") and os.geteuid() == 0 else st.f_bavail
+    return blocks * st.f_frsize
+
+
+def _pattern_block(pattern: str) -> bytes:
+    if pattern == "zero":
+        return bytes(WRITE_BLOCK)
+    if pattern == "ones":
+        return b"\xff" * WRITE_BLOCK
+    return os.urandom(WRITE_BLOCK)
+
+
+class _Fill:
+    """Shared state of one free-space wipe: its budget, totals and stop flag."""
+
+    def __init__(self, directory: str, pattern: str, limit: Optional[int], control: Optional[JobControl]):
+        self.directory = directory
+        self.pattern = pattern
+        self.limit = limit
+        self.control = control
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.written = 0
+        self.files: List[str] = []
+
+    def claim(self, nbytes: int) -> int:
+        """Bytes this write may use; 0 once the byte limit (if any) is used up."""
+        with self.lock:
+            if self.limit is None:
+                return nbytes
+            n = max(0, min(nbytes, self.limit - self.written))
+            self.written += n
+            return n
+
+    def preallocation(self) -> int:
+        with self.lock:
+            return FILE_SIZE if self.limit is None else max(0, min(FILE_SIZE, self.limit - self.written))
+
+    def done(self, claimed: int, written: int) -> None:
+        with self.lock:
+            if self.limit is None:
+                self.written += written
+            else:
+                self.written -= claimed - written
+
+    def new_file(self, worker: int) -> str:
+        with self.lock:
+            path = os.path.join(self.directory, f"fill-{worker:02d}-{len(self.files):05d}.bin")
+            self.files.append(path)
+            return path
+
+
+def _preallocate(fd: int, size: int) -> None:
+    """Reserve `size` bytes up front so the fill files stay contiguous; best effort."""
+    if not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError as e:
+        if e.errno not in (errno.ENOSPC, errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS):
+            raise
+
+
+def _fill_worker(fill: _Fill, worker: int, mountpoint: str, block_size: int = WRITE_BLOCK) -> None:
+    """Write fill files until the filesystem (or the byte limit) is full."""
+    control = fill.control
+    while not fill.stop.is_set():
+        path = fill.new_file(worker)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o600)
+        try:
+            _preallocate(fd, fill.preallocation())
+            # Random fills get a fresh block per file; repeating it within a file is enough here
+            block = memoryview(_pattern_block(fill.pattern))
+            offset = 0
+            full = False
+            while offset < FILE_SIZE and not fill.stop.is_set():
+                if control:
+                    control.checkpoint()
+                claimed = fill.claim(min(block_size, FILE_SIZE - offset))
+                if not claimed:
+                    full = True
+                    break
+                if control:
+                    control.throttle(claimed)
+                written = 0
+                try:
+                    with io_scheduler.inflight(mountpoint, claimed):
+                        with metrics.timed("free_space", "write", claimed):
+                            while written < claimed:
+                                written += os.write(fd, block[written:claimed])
+                except OSError as e:
+                    if e.errno not in (errno.ENOSPC, errno.EFBIG, errno.EDQUOT):
+                        raise
+                    full = e.errno != errno.EFBIG
+                finally:
+                    fill.done(claimed, written)
+                offset += written
+                if written < claimed:
+                    break
+            # Data must reach the device before the file is deleted, or the blocks never get written
+            with metrics.timed("free_space", "fsync"):
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        if full:
+            return
+
+
+def wipe_free_space(mountpoint: str, workers: int = DEFAULT_WORKERS, pattern: str = "random",
+                    limit_bytes: Optional[int] = None, control: Optional[JobControl] = None) -> Dict[str, Any]:
+    """Overwrite the free space of a mounted filesystem without touching its files.
+
+    Parallel workers fill the filesystem with preallocated files of `pattern` until
+    ENOSPC (or `limit_bytes`), then one worker writes the remainder in small
+    blocks. Files are fsynced, then deleted. Progress is bytes
+    written against the free space statvfs reported at the start.
+    """
+    if pattern not in PATTERNS:
+        raise ValueError(f"pattern must be one of: {', '.join(PATTERNS)}")
+    if not os.path.isdir(mountpoint):
+        raise ValueError(f"{mountpoint} is not a mounted directory")
+    workers = max(1, min(int(workers), MAX_WORKERS))
+    free_before = free_bytes(mountpoint)
+    target = free_before if limit_bytes is None else min(free_before, max(0, limit_bytes))
+    directory = os.path.join(mountpoint, f"{FILL_DIR_PREFIX}{uuid.uuid4().hex[:8]}")
+    os.makedirs(directory)
+    fill = _Fill(directory, pattern, limit_bytes, control)
+    started = time.perf_counter()
+    error: Optional[BaseException] = None
+    futures = [io_scheduler.submit_io(_fill_worker, fill, worker, mountpoint) for worker in range(workers)]
+    try:
+        pending = set(futures)
+        tail_started = False
+        while pending:
+            done, pending = wait(pending, timeout=PROGRESS_INTERVAL)
+            for future in done:
+                if future.exception() is not None and error is None:
+                    # First failure (or cancellation) stops the other workers
+                    error = future.exception()
+                    fill.stop.set()
+            if not pending and error is None and not tail_started:
+                futures.append(io_scheduler.submit_io(_fill_worker, fill, workers, mountpoint, TAIL_BLOCK))
+                pending = {futures[-1]}
+                tail_started = True
+            if control:
+                control.report(min(99.0, fill.written * 100.0 / target) if target else 99.0,
+                               bytes_written=fill.written, free_bytes=free_bytes(mountpoint),
+                               fill_files=len(fill.files))
+        free_at_full = free_bytes(mountpoint)
+    finally:
+        # Never leave the filesystem full, whatever happened
+        fill.stop.set()
+        wait(futures)
+        with metrics.timed("free_space", "remove"):
+            shutil.rmtree(directory, ignore_errors=True)
+    if error is not None:
+        raise error
+    seconds = time.perf_counter() - started
+    if control:
+        control.report(100.0, bytes_written=fill.written, fill_files=len(fill.files))
+    return {
+        "bytes": fill.written,
+        "files": len(fill.files),
+        "workers": workers,
+        "pattern": pattern,
+        "free_bytes_before": free_before,
+        "free_bytes_at_full": free_at_full,
+        "limit_bytes": limit_bytes,
+        "seconds": round(seconds, 3),
+        "throughput_mb_s": round(fill.written / (1024 ** 2) / seconds, 2) if seconds > 0 else None,
+    }
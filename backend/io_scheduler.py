@@ -0,0 +1,339 @@
+import os
+import re
+import stat
+import struct
+import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+try:
+    import win32file
+except ImportError:  # pywin32 is only available on Windows
+    win32file = None
+
+import metrics
+import simdevice
+
+# Station-wide limits (override with environment variables)
+MAX_INFLIGHT_BYTES = int(os.environ.get("SECUREWIPE_MAX_INFLIGHT_MB", "256")) * 1024 * 1024
+CONTROLLER_INFLIGHT_BYTES = int(os.environ.get("SECUREWIPE_CONTROLLER_INFLIGHT_MB", "64")) * 1024 * 1024
+IO_WORKERS = int(os.environ.get("SECUREWIPE_IO_WORKERS", "64"))
+MAX_ACTIVE_WIPES = int(os.environ.get("SECUREWIPE_MAX_WIPES", "32"))
+
+
+_IOCTL_STORAGE_GET_DEVICE_NUMBER = 0x2D1080
+_WINDOWS_DRIVE_RE = re.compile(r"^(?:\\\\[.?]\\)?physicaldrive(\d+)$", re.IGNORECASE)
+_WINDOWS_VOLUME_RE = re.compile(r"^(?:\\\\[.?]\\)?([A-Za-z]):")
+# sysfs path components of the disk itself below its hub or host: USB interface, USB port, ATA link
+_SYSFS_INTERFACE_RE = re.compile(r"^\d+-[\d.]+:\d+\.\d+$")
+_SYSFS_PORT_RE = re.compile(r"^(?:\d+-[\d.]+|ata\d+)$")
+
+
+def _sysfs_whole_disk(major: int, minor: int) -> Optional[str]:
+    """/dev node of the disk holding block device major:minor (partitions map to their disk)."""
+    node = os.path.realpath(f"/sys/dev/block/{major}:{minor}")
+    if not os.path.isdir(node):
+        return None
+    if os.path.exists(os.path.join(node, "partition")):
+        node = os.path.dirname(node)
+    try:
+        # Device-mapper / md on a single disk (e.g. dm-crypt on /dev/sdb1): the disk underneath
+        slaves = os.listdir(os.path.join(node, "slaves"))
+    except OSError:
+        slaves = []
+    if len(slaves) == 1:
+        with open(os.path.join(node, "slaves", slaves[0], "dev")) as f:
+            major, minor = (int(n) for n in f.read().split(":"))
+        return _sysfs_whole_disk(major, minor)
+    return "/dev/" + os.path.basename(node)
+
+
+def _posix_device_key(device: str) -> str:
+    path = device if os.path.isabs(device) or os.path.exists(device) else "/dev/" + device
+    try:
+        st = os.stat(path)
+    except OSError:
+        return device.lower()
+    if stat.S_ISBLK(st.st_mode):
+        number = st.st_rdev
+    elif stat.S_ISDIR(st.st_mode):
+        number = st.st_dev  # a mountpoint or any directory on the mounted filesystem
+    else:
+        return os.path.realpath(path)  # an image file is its own device
+    try:
+        disk = _sysfs_whole_disk(os.major(number), os.minor(number))
+    except (OSError, ValueError):
+        disk = None
+    return disk or os.path.realpath(path)
+
+
+def _windows_device_key(device: str) -> str:
+    match = _WINDOWS_DRIVE_RE.match(device)
+    if match:
+        return f"\\\\.\\physicaldrive{match.group(1)}"
+    match = _WINDOWS_VOLUME_RE.match(device)
+    if match and win32file is not None:
+        try:
+            handle = win32file.CreateFile(f"\\\\.\\{match.group(1)}:", 0, 3, None, 3, 0, None)
+            try:
+                info = win32file.DeviceIoControl(handle, _IOCTL_STORAGE_GET_DEVICE_NUMBER, None, 12)
+            finally:
+                win32file.CloseHandle(handle)
+            return f"\\\\.\\physicaldrive{struct.unpack('<III', bytes(info))[1]}"
+        except Exception:
+            pass
+    return device.lower()
+
+
+def device_key(device: str) -> str:
+    """One key per physical device, however an engine names its target.
+
+    sim:// devices and their volume directories map to sim://<name>. On Linux a
+    block device, partition, mountpoint or directory maps to the /dev node of its
+    whole disk, and an image file to its real path; on Windows drive letters and
+    physical drive paths map to \\\\.\\physicaldriveN. Anything else (a device
+    label) is used as given, lowercased.
+    """
+    device = (device or "").strip()
+    if simdevice.is_sim_path(device):
+        return simdevice.sim_path(device)
+    if not device:
+        return device
+    sim = simdevice.volume_device(device)
+    if sim:
+        return sim
+    if sys.platform.startswith("win"):
+        return _windows_device_key(device)
+    return _posix_device_key(device)
+
+
+def device_controller(key: str) -> str:
+    """USB hub or storage host a disk hangs off (Linux sysfs); the disk itself elsewhere."""
+    if not key.startswith("/dev/"):
+        return key
+    parts = os.path.realpath(os.path.join("/sys/class/block", os.path.basename(key))).split(os.sep)
+    host = next((i for i, part in enumerate(parts) if re.match(r"^host\d+$", part)), None)
+    if host is None:
+        return key
+    upstream = parts[:host]
+    if upstream and _SYSFS_INTERFACE_RE.match(upstream[-1]):
+        upstream.pop()
+    if upstream and _SYSFS_PORT_RE.match(upstream[-1]):
+        upstream.pop()
+    return "/".join(upstream[-2:]) or key
+
+
+class IOScheduler:
+    """Central I/O scheduler shared by every wipe engine.
+
+    - Device exclusion: one job per physical device; further jobs wait in a per-device
+      FIFO and are started (via their callback) when the device frees up.
+    - In-flight budget: a global cap on bytes being written at once, plus a per-controller
+      cap so one USB hub cannot take the whole budget. Controllers are looked up in sysfs
+      when a job claims its device; without sysfs each device is its own controller.
+    - Fairness: waiting writes are granted round-robin across devices, so devices on the
+      same hub or controller progress at the same rate.
+    - One shared I/O thread pool instead of a private pool per job.
+    """
+
+    def __init__(self, max_inflight_bytes: int = MAX_INFLIGHT_BYTES,
+                 controller_inflight_bytes: int = CONTROLLER_INFLIGHT_BYTES,
+                 io_workers: int = IO_WORKERS, max_active_jobs: int = MAX_ACTIVE_WIPES):
+        self.max_inflight_bytes = max_inflight_bytes
+        self.controller_inflight_bytes = controller_inflight_bytes
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io")
+        self.job_executor = ThreadPoolExecutor(max_workers=max_active_jobs, thread_name_prefix="wipe")
+        metrics.workers_total.set(io_workers, pool="io")
+        metrics.workers_total.set(max_active_jobs, pool="wipe")
+        self._cond = threading.Condition()
+        # Device exclusion; job_id -> (target as the engine named it, device key)
+        self._device_owner: Dict[str, str] = {}
+        self._device_queue: Dict[str, Deque[Tuple[str, Callable[[], Any]]]] = {}
+        self._job_devices: Dict[str, Tuple[str, str]] = {}
+        # Byte budget
+        self._inflight = 0
+        self._controller_inflight: Dict[str, int] = {}
+        self._controllers: Dict[str, str] = {}
+        self._waiters: "OrderedDict[str, Deque[list]]" = OrderedDict()
+
+    def submit_io(self, fn: Callable[..., Any], *args: Any):
+        """Run one I/O task on the shared pool (counted for worker utilization)."""
+        return self.io_executor.submit(metrics.busy, "io", fn, *args)
+
+    def submit_job(self, fn: Callable[..., Any], *args: Any):
+        return self.job_executor.submit(metrics.busy, "wipe", fn, *args)
+
+    # -- device exclusion -------------------------------------------------
+
+    def _key(self, device: str) -> str:
+        # Targets of running or queued jobs keep the key they were claimed under
+        with self._cond:
+            for target, key in self._job_devices.values():
+                if target == device:
+                    return key
+        return device_key(device)
+
+    def run_exclusive(self, device: str, job_id: str, start: Callable[[], Any]) -> int:
+        """Run `start` once `job_id` owns `device`; returns the queue position (0 = started now)."""
+        key = device_key(device)
+        controller = device_controller(key)
+        with self._cond:
+            self._job_devices[job_id] = (device, key)
+            if key != controller:
+                self._controllers[key] = controller
+            if key not in self._device_owner:
+                self._device_owner[key] = job_id
+                position = 0
+            else:
+                queue = self._device_queue.setdefault(key, deque())
+                queue.append((job_id, start))
+                return len(queue)
+        start()
+        return position
+
+    def release_device(self, device: str, job_id: str) -> None:
+        """Called when a job finishes; hands the device to the next queued job."""
+        nxt = None
+        with self._cond:
+            key = self._job_devices.pop(job_id, (device, None))[1]
+            if key is None or self._device_owner.get(key) != job_id:
+                return
+            queue = self._device_queue.get(key)
+            if queue:
+                next_id, nxt = queue.popleft()
+                self._device_owner[key] = next_id
+            else:
+                self._device_owner.pop(key, None)
+                self._device_queue.pop(key, None)
+                self._controllers.pop(key, None)
+        if nxt:
+            nxt()
+
+    def cancel_queued(self, job_id: str) -> bool:
+        """Drop a job that is still waiting for its device."""
+        with self._cond:
+            for queue in self._device_queue.values():
+                for item in queue:
+                    if item[0] == job_id:
+                        queue.remove(item)
+                        self._job_devices.pop(job_id, None)
+                        return True
+        return False
+
+    def owner(self, device: str) -> Optional[str]:
+        """Job that currently owns the physical device behind `device`, if any."""
+        key = self._key(device)
+        with self._cond:
+            return self._device_owner.get(key)
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """0 if the job owns its device, 1.. if waiting, None if unknown."""
+        with self._cond:
+            if job_id in self._device_owner.values():
+                return 0
+            for queue in self._device_queue.values():
+                for i, (queued_id, _) in enumerate(queue):
+                    if queued_id == job_id:
+                        return i + 1
+        return None
+
+    # -- in-flight byte budget --------------------------------------------
+
+    def _controller_of(self, key: str) -> str:
+        return self._controllers.get(key, key)
+
+    def _fits(self, key: str, nbytes: int) -> bool:
+        if self._inflight == 0:
+            return True
+        if self._inflight + nbytes > self.max_inflight_bytes:
+            return False
+        used = self._controller_inflight.get(self._controller_of(key), 0)
+        return used == 0 or used + nbytes <= self.controller_inflight_bytes
+
+    def _dispatch(self) -> None:
+        # Round-robin across devices: grant one head-of-line request per device per
+        # round and move served devices to the back of the ring
+        granted = True
+        while granted:
+            granted = False
+            for key in list(self._waiters.keys()):
+                queue = self._waiters[key]
+                ticket = queue[0]
+                if not self._fits(key, ticket[0]):
+                    continue
+                queue.popleft()
+                ticket[1] = True
+                self._inflight += ticket[0]
+                ctrl = self._controller_of(key)
+                self._controller_inflight[ctrl] = self._controller_inflight.get(ctrl, 0) + ticket[0]
+                self._waiters.move_to_end(key)
+                if not queue:
+                    del self._waiters[key]
+                granted = True
+        self._cond.notify_all()
+
+    def acquire_bytes(self, device: str, nbytes: int) -> int:
+        return self._acquire(self._key(device), nbytes)
+
+    def _acquire(self, key: str, nbytes: int) -> int:
+        nbytes = max(1, min(nbytes, self.max_inflight_bytes))
+        ticket = [nbytes, False]
+        with self._cond:
+            self._waiters.setdefault(key, deque()).append(ticket)
+            self._dispatch()
+            while not ticket[1]:
+                self._cond.wait()
+        return nbytes
+
+    def release_bytes(self, device: str, nbytes: int) -> None:
+        self._release(self._key(device), nbytes)
+
+    def _release(self, key: str, nbytes: int) -> None:
+        with self._cond:
+            self._inflight -= nbytes
+            ctrl = self._controller_of(key)
+            self._controller_inflight[ctrl] = self._controller_inflight.get(ctrl, 0) - nbytes
+            if self._controller_inflight[ctrl] <= 0:
+                del self._controller_inflight[ctrl]
+            self._dispatch()
+
+    @contextmanager
+    def inflight(self, device: str, nbytes: int):
+        key = self._key(device)
+        granted = self._acquire(key, nbytes)
+        try:
+            yield
+        finally:
+            self._release(key, granted)
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "inflight_bytes": self._inflight,
+                "max_inflight_bytes": self.max_inflight_bytes,
+                "controller_inflight_bytes": dict(self._controller_inflight),
+                "waiting_writes": sum(len(q) for q in self._waiters.values()),
+                "busy_devices": len(self._device_owner),
+                "queued_jobs": sum(len(q) for q in self._device_queue.values()),
+            }
+
+
+# Shared by all services in the process
+io_scheduler = IOScheduler()
+# A simulated device cannot be deleted while a job owns it
+simdevice.register_busy_check(io_scheduler.owner)
+
+
+def _queue_depths():
+    status = io_scheduler.status()
+    yield ("waiting_writes",), status["waiting_writes"]
+    yield ("queued_jobs",), status["queued_jobs"]
+    yield ("busy_devices",), status["busy_devices"]
+
+
+metrics.register_collector("securewipe_queue_depth", "I/O scheduler queue depths", ("queue",), _queue_depths)
+metrics.register_collector("securewipe_inflight_bytes", "Bytes currently granted to writers", (),
+                           lambda: [((), io_scheduler.status()["inflight_bytes"])])
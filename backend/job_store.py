@@ -0,0 +1,330 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import psutil
+
+DB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DB_PATH = os.environ.get("SECUREWIPE_JOB_DB", os.path.join(DB_DIR, "jobs.db"))
+
+# Progress is persisted by a background flusher, so updating a job dict costs nothing
+FLUSH_INTERVAL = float(os.environ.get("SECUREWIPE_JOB_FLUSH_S", "1.0"))
+# Finished jobs stay in memory this long (and at most this many per engine), then
+# are served from the database only
+RETENTION_SECONDS = float(os.environ.get("SECUREWIPE_JOB_RETENTION_S", "900"))
+MAX_FINISHED_IN_MEMORY = int(os.environ.get("SECUREWIPE_JOB_MAX_FINISHED", "100"))
+
+FINISHED_STATES = {"completed", "failed", "cancelled"}
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 500
+
+
+def _process_owner(pid: int) -> Optional[str]:
+    """"pid:start time" of a running process; the start time tells a reused pid apart."""
+    try:
+        return f"{pid}:{psutil.Process(pid).create_time():.2f}"
+    except (psutil.Error, OSError):
+        return None
+
+
+# Every row this process writes is owned by it; other processes sharing the
+# database leave those rows alone while it is alive
+OWNER = _process_owner(os.getpid()) or f"{os.getpid()}:0"
+
+
+def owner_alive(owner: Optional[str]) -> bool:
+    if not owner:
+        return False
+    if owner == OWNER:
+        return True
+    pid, _, _ = owner.partition(":")
+    return pid.isdigit() and _process_owner(int(pid)) == owner
+
+
+class JobStore:
+    """SQLite (WAL) store for job metadata, progress checkpoints and results.
+
+    Writes are queued and coalesced per job, then written by one background
+    thread in a single transaction per flush interval.
+    """
+
+    def __init__(self, path: str = DB_PATH, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._pending: Dict[str, Tuple[Any, ...]] = {}
+        self._tables: List["JobTable"] = []
+        self._conn: Optional[sqlite3.Connection] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # -- connection / schema ----------------------------------------------
+
+    def open(self) -> None:
+        """Open the database now, failing jobs left unfinished by a previous run.
+
+        Services call this at startup so interrupted jobs show up as failed
+        straight away, not only once something first reads or writes a job.
+        """
+        with self._lock:
+            self._db()
+
+    def _db(self) -> sqlite3.Connection:
+        # Caller holds self._lock
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        job_id TEXT PRIMARY KEY,
+                        kind TEXT NOT NULL,
+                        device TEXT,
+                        status TEXT,
+                        progress REAL,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL,
+                        finished_at REAL,
+                        data TEXT NOT NULL,
+                        owner TEXT
+                    )
+                    """
+                )
+                if "owner" not in {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at, job_id)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind_created ON jobs(kind, created_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+            self._conn = conn
+            self._mark_interrupted(conn)
+        return self._conn
+
+    def _mark_interrupted(self, conn: sqlite3.Connection) -> None:
+        """Unfinished jobs whose owning process is gone can never finish.
+
+        Jobs of a live process (the gateway, while a benchmark or a standalone
+        service opens the same database) are left running.
+        """
+        placeholders = ",".join("?" * len(FINISHED_STATES))
+        rows = conn.execute(
+            f"SELECT job_id, data, owner FROM jobs WHERE status NOT IN ({placeholders})", tuple(FINISHED_STATES)
+        ).fetchall()
+        now = time.time()
+        updates = []
+        for job_id, data, owner in rows:
+            if owner_alive(owner):
+                continue
+            entry = json.loads(data)
+            entry.update({"status": "failed", "message": "Interrupted by service restart"})
+            updates.append((json.dumps(entry, default=str), now, now, job_id))
+        if updates:
+            with conn:
+                conn.executemany(
+                    "UPDATE jobs SET status = 'failed', data = ?, updated_at = ?, finished_at = ? WHERE job_id = ?",
+                    updates,
+                )
+
+    # -- writes ---------------------------------------------------------------
+
+    def register(self, table: "JobTable") -> None:
+        with self._cond:
+            self._tables.append(table)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="job-store", daemon=True)
+                self._thread.start()
+
+    def put(self, row: Tuple[Any, ...]) -> None:
+        """Queue a row (job_id, kind, device, status, progress, created, updated, finished, data)."""
+        with self._cond:
+            self._pending[row[0]] = row
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait(self.flush_interval)
+                tables = list(self._tables)
+            for table in tables:
+                table.collect()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Keep serving from memory; rows are retried on the next flush
+                pass
+
+    def flush(self) -> None:
+        with self._cond:
+            rows = list(self._pending.values())
+            self._pending.clear()
+        if not rows:
+            return
+        with self._lock:
+            conn = self._db()
+            try:
+                with conn:
+                    conn.executemany(
+                        """
+                        INSERT INTO jobs (job_id, kind, device, status, progress, created_at, updated_at, finished_at, data,
+                                          owner)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(job_id) DO UPDATE SET
+                            device = excluded.device, status = excluded.status, progress = excluded.progress,
+                            updated_at = excluded.updated_at, finished_at = excluded.finished_at, data = excluded.data,
+                            owner = excluded.owner
+                        """,
+                        [row + (OWNER,) for row in rows],
+                    )
+            except sqlite3.Error:
+                with self._cond:
+                    for row in rows:
+                        self._pending.setdefault(row[0], row)
+                raise
+
+    # -- reads ----------------------------------------------------------------
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            row = self._pending.get(job_id)
+        if row is not None:
+            return json.loads(row[-1])
+        with self._lock:
+            found = self._db().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def history(self, kind: Optional[str] = None, status: Optional[str] = None,
+                limit: int = HISTORY_PAGE_SIZE, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Newest-first page of jobs; pass the returned cursor to get the next page."""
+        self.flush()
+        limit = max(1, min(int(limit), MAX_HISTORY_PAGE_SIZE))
+        where, params = [], []
+        if kind:
+            where.append("kind = ?")
+            params.append(kind)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if cursor:
+            created, _, job_id = cursor.partition("|")
+            where.append("(created_at < ? OR (created_at = ? AND job_id < ?))")
+            params.extend([float(created), float(created), job_id])
+        sql = "SELECT job_id, created_at, data FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, job_id DESC LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._db().execute(sql, params).fetchall()
+        items = [dict(json.loads(data), job_id=job_id, created_at=created) for job_id, created, data in rows[:limit]]
+        next_cursor = f"{rows[limit - 1][1]!r}|{rows[limit - 1][0]}" if len(rows) > limit else None
+        return items, next_cursor
+
+
+class JobTable(MutableMapping):
+    """Dict of one engine's job entries (wipe_id -> status dict) backed by the job store.
+
+    Engines keep mutating the entry dicts in place; the store's flusher picks up
+    changed entries, and finished entries are evicted from memory after the
+    retention period. Lookups of evicted jobs fall back to the database.
+    """
+
+    def __init__(self, kind: str, store: Optional[JobStore] = None,
+                 retention_seconds: float = RETENTION_SECONDS, max_finished: int = MAX_FINISHED_IN_MEMORY,
+                 on_evict: Optional[Callable[[str], Any]] = None):
+        self.kind = kind
+        self.store = store or job_store
+        self.retention_seconds = retention_seconds
+        self.max_finished = max_finished
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._created: Dict[str, float] = {}
+        self._finished: Dict[str, float] = {}
+        self._persisted: Dict[str, str] = {}
+        self.store.register(self)
+
+    def __getitem__(self, job_id: str) -> Dict[str, Any]:
+        entry = self._entries.get(job_id)
+        if entry is not None:
+            return entry
+        stored = self.store.get(job_id)
+        if stored is None:
+            raise KeyError(job_id)
+        return stored
+
+    def __setitem__(self, job_id: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[job_id] = entry
+            self._created.setdefault(job_id, entry.get("created_at") or time.time())
+            self._finished.pop(job_id, None)
+            self._persisted.pop(job_id, None)
+
+    def __delitem__(self, job_id: str) -> None:
+        with self._lock:
+            del self._entries[job_id]
+            self._forget(job_id)
+
+    def __contains__(self, job_id: object) -> bool:
+        return job_id in self._entries or (isinstance(job_id, str) and self.store.get(job_id) is not None)
+
+    def __iter__(self) -> Iterator[str]:
+        # Only jobs still held in memory; use JobStore.history() for older ones
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _forget(self, job_id: str) -> None:
+        self._created.pop(job_id, None)
+        self._finished.pop(job_id, None)
+        self._persisted.pop(job_id, None)
+
+    def collect(self, now: Optional[float] = None) -> None:
+        """Queue changed entries for the store and evict expired finished ones."""
+        now = now or time.time()
+        with self._lock:
+            items = list(self._entries.items())
+        expired = []
+        for job_id, entry in items:
+            try:
+                data = json.dumps(entry, sort_keys=True, default=str)
+            except (RuntimeError, ValueError):
+                # Entry is being updated right now; pick it up on the next pass
+                continue
+            status = entry.get("status")
+            finished = status in FINISHED_STATES
+            if finished:
+                self._finished.setdefault(job_id, now)
+            if data != self._persisted.get(job_id):
+                self._persisted[job_id] = data
+                self.store.put((job_id, entry.get("kind") or self.kind, entry.get("device"), status,
+                                entry.get("progress"), self._created.get(job_id, now), now,
+                                self._finished.get(job_id), data))
+            elif finished and now - self._finished[job_id] >= self.retention_seconds:
+                expired.append(job_id)
+        # Also cap how many finished jobs stay in memory, oldest first
+        overflow = len(self._finished) - len(expired) - self.max_finished
+        if overflow > 0:
+            candidates = sorted((t, j) for j, t in self._finished.items()
+                                if j not in expired and self._persisted.get(j) is not None)
+            expired.extend(j for _, j in candidates[:overflow])
+        if not expired:
+            return
+        # Evicted rows must be on disk before they leave memory
+        self.store.flush()
+        with self._lock:
+            for job_id in expired:
+                self._entries.pop(job_id, None)
+                self._forget(job_id)
+        if self.on_evict:
+            for job_id in expired:
+                self.on_evict(job_id)
+
+
+# Shared by all services in the process
+job_store = JobStore()
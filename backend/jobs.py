@@ -0,0 +1,229 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from io_scheduler import io_scheduler
+from job_store import FINISHED_STATES, JobTable
+from reports import record_job
+from throttle import throttles
+
+# Global cap on concurrently running jobs (override with SECUREWIPE_MAX_JOBS)
+MAX_CONCURRENT_JOBS = int(os.environ.get("SECUREWIPE_MAX_JOBS", "2"))
+
+class JobCancelled(Exception):
+    """Raised from JobControl.checkpoint() once cancellation has been requested."""
+
+
+class JobControl:
+    """Handle passed to job functions for progress reporting and cooperative
+    cancellation / pause. Engines call checkpoint() at chunk boundaries."""
+
+    def __init__(self, job: Optional[Dict[str, Any]] = None, lock: Optional[threading.Lock] = None,
+                 job_id: Optional[str] = None):
+        self.job_id = job_id
+        # Per-job + global bandwidth/IOPS limits; engines call control.throttle(nbytes) per I/O
+        self.throttle = throttles.for_job(job_id)
+        self._job = job
+        self._lock = lock or threading.Lock()
+        self._cancel = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self._resume_status = "running"
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        # Wake a paused job so it can observe the cancellation
+        self._running.set()
+
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def pause(self) -> None:
+        self._running.clear()
+
+    def resume(self) -> None:
+        self._running.set()
+
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    def checkpoint(self) -> None:
+        """Block while paused; raise JobCancelled once cancellation was requested."""
+        if not self._running.is_set():
+            self._mark_paused(True)
+            self._running.wait()
+            self._mark_paused(False)
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def _mark_paused(self, paused: bool) -> None:
+        # Several workers may block in checkpoint(); remember the status to restore once
+        if self._job is None:
+            return
+        with self._lock:
+            status = self._job.get("status")
+            if paused and status not in FINISHED_STATES and status != "paused":
+                self._resume_status = status
+                self._job["status"] = "paused"
+            elif not paused and status == "paused":
+                self._job["status"] = self._resume_status
+
+    def report(self, progress: Optional[float] = None, **details: Any) -> None:
+        if self._job is None:
+            return
+        with self._lock:
+            if progress is not None:
+                self._job["progress"] = round(min(100.0, max(0.0, progress)), 2)
+            if details:
+                self._job.setdefault("details", {}).update(details)
+
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Dict[str, int]]:
+    """Collapse [start, end) byte ranges into sorted, non-overlapping offset/length entries."""
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [{"offset": s, "length": e - s} for s, e in merged]
+
+
+class JobScheduler:
+    """Runs long operations on a bounded executor and tracks them by job ID.
+
+    Job functions are called as fn(*args, control=JobControl) and may return
+    either an (ok, message) tuple or a result dict.
+    """
+
+    def __init__(self, max_workers: int = MAX_CONCURRENT_JOBS):
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        metrics.workers_total.set(self.max_workers, pool="job")
+        self._lock = threading.Lock()
+        self._controls: Dict[str, JobControl] = {}
+        # Persisted to the job store; finished jobs are evicted from memory after retention
+        self._jobs = JobTable("job", on_evict=lambda job_id: self._controls.pop(job_id, None))
+
+    def submit(self, kind: str, device: Optional[str], fn: Callable[..., Any], *args: Any,
+               target: Optional[str] = None) -> str:
+        """Queue fn(*args) as a job; `target` (default `device`) is the path that locks the physical device."""
+        job_id = f"{kind}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        job = {
+            "job_id": job_id,
+            "kind": kind,
+            "device": device,
+            "status": "queued",
+            "progress": 0.0,
+            "message": "",
+            "details": {},
+            "result": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._controls[job_id] = JobControl(job, self._lock, job_id)
+        start = lambda: self._executor.submit(metrics.busy, "job", self._run, job_id, fn, args)
+        if device:
+            # One job per device: later jobs wait in the device queue of the I/O scheduler
+            job["queue_position"] = io_scheduler.run_exclusive(target or device, job_id, start)
+        else:
+            start()
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable[..., Any], args: tuple) -> None:
+        job = self._jobs[job_id]
+        control = self._controls[job_id]
+        try:
+            if control.cancelled():
+                raise JobCancelled()
+            with self._lock:
+                job.update({"status": "running", "started_at": time.time()})
+            result = fn(*args, control=control)
+            with self._lock:
+                if isinstance(result, tuple):
+                    ok, msg = result
+                    job.update({"status": "completed" if ok else "failed", "message": msg})
+                else:
+                    job.update({"status": "completed", "result": result})
+                if job["status"] == "completed":
+                    job["progress"] = 100.0
+        except JobCancelled:
+            with self._lock:
+                job.update({"status": "cancelled", "message": "Cancelled by request."})
+        except Exception as e:
+            with self._lock:
+                job.update({"status": "failed", "message": str(e)})
+        finally:
+            with self._lock:
+                job["finished_at"] = time.time()
+                snapshot = self._snapshot(job)
+            record_job(job_id, job["kind"], snapshot)
+            throttles.release(job_id)
+            if job["device"]:
+                io_scheduler.release_device(job["device"], job_id)
+
+    def _snapshot(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        snap = dict(job, details=dict(job["details"]))
+        control = self._controls.get(job["job_id"])
+        if control and job["status"] not in FINISHED_STATES:
+            snap["throttle"] = control.throttle.status()
+        if job["device"] and job["status"] == "queued":
+            snap["queue_position"] = io_scheduler.queue_position(job["job_id"])
+        return snap
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._snapshot(j) for j in self._jobs.values()]
+
+    def _control(self, job_id: str) -> Optional[JobControl]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job["status"] in FINISHED_STATES:
+                return None
+            return self._controls.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation; queued jobs never start, running jobs stop at their next checkpoint."""
+        control = self._control(job_id)
+        if control is None:
+            return False
+        control.cancel()
+        if io_scheduler.cancel_queued(job_id):
+            # Never reached the executor: finish it here
+            with self._lock:
+                job = self._jobs[job_id]
+                job.update({"status": "cancelled", "message": "Cancelled by request.", "finished_at": time.time()})
+                snapshot = self._snapshot(job)
+            record_job(job_id, job["kind"], snapshot)
+            throttles.release(job_id)
+        return True
+
+    def pause(self, job_id: str) -> bool:
+        control = self._control(job_id)
+        if control is None:
+            return False
+        control.pause()
+        return True
+
+    def resume(self, job_id: str) -> bool:
+        control = self._control(job_id)
+        if control is None:
+            return False
+        control.resume()
+        return True
+
+
+# Shared scheduler for the API processes
+job_scheduler = JobScheduler()
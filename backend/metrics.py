@@ -0,0 +1,226 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask import Blueprint, Response
+
+# Per-bomb / per-file log lines are emitted at DEBUG, and only one in N
+LOG_SAMPLE_EVERY = max(1, int(os.environ.get("SECUREWIPE_LOG_SAMPLE", "100")))
+
+# Seconds; covers a 4 KiB page-cache hit up to a multi-second USB flush
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Seconds; job milestones from a small image to a large disk
+MILESTONE_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+_sample_counter = itertools.count()
+
+
+def sample_debug(logger: logging.Logger, every: int = LOG_SAMPLE_EVERY) -> bool:
+    """True for one call in `every` when DEBUG is enabled; guard per-item log lines with it."""
+    return logger.isEnabledFor(logging.DEBUG) and next(_sample_counter) % every == 0
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in values]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Iterable[Tuple[Sequence[str], float]]]] = None):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        # Optional callback evaluated at scrape time: yields (label values, value)
+        self._collect = collect
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        if self._collect is not None:
+            values = [(tuple(k), v) for k, v in self._collect()]
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in values]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[index] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(k, list(v)) for k, v in self._values.items()]
+        lines = self.header()
+        for key, row in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {row[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # A failing collector must not break the whole scrape
+                continue
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Engines label everything with engine = pendrive | boom | encrypt_wipe | backup | restore
+bytes_total = registry.register(Counter(
+    "securewipe_bytes_total", "Bytes processed by wipe/backup engines", ("engine", "op")))
+ops_total = registry.register(Counter(
+    "securewipe_ops_total", "I/O operations issued by wipe/backup engines", ("engine", "op")))
+io_latency = registry.register(Histogram(
+    "securewipe_io_latency_seconds", "Latency of read/encrypt/write/fsync steps", ("engine", "op")))
+errors_total = registry.register(Counter(
+    "securewipe_errors_total", "Failed bombs, files or segments", ("engine",)))
+time_to_unrecoverable = registry.register(Histogram(
+    "securewipe_time_to_unrecoverable_seconds",
+    "Seconds from job start until partition tables and filesystem metadata were overwritten",
+    ("engine",), buckets=MILESTONE_BUCKETS))
+workers_busy = registry.register(Gauge(
+    "securewipe_workers_busy", "Worker threads currently running a task", ("pool",)))
+workers_total = registry.register(Gauge(
+    "securewipe_workers", "Worker threads available", ("pool",)))
+
+
+def record(engine: str, op: str, start: float, nbytes: int = 0) -> None:
+    """Count one I/O step that began at perf_counter() `start` (for reads, where the size is known after)."""
+    io_latency.observe(time.perf_counter() - start, engine=engine, op=op)
+    ops_total.inc(1, engine=engine, op=op)
+    if nbytes:
+        bytes_total.inc(nbytes, engine=engine, op=op)
+
+
+@contextmanager
+def timed(engine: str, op: str, nbytes: int = 0):
+    """Time one I/O step and count it; the only call engines need on their hot path."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(engine, op, start, nbytes)
+
+
+def busy(pool: str, fn: Callable, *args, **kwargs):
+    """Run fn while counted as a busy worker of `pool` (for utilization)."""
+    workers_busy.inc(1, pool=pool)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        workers_busy.dec(1, pool=pool)
+
+
+def register_collector(name: str, help_text: str, labelnames: Sequence[str],
+                       collect: Callable[[], Iterable[Tuple[Sequence[str], float]]]) -> None:
+    """Gauge whose values are read at scrape time (queue depths, in-flight bytes...)."""
+    registry.register(Gauge(name, help_text, labelnames, collect=collect))
+
+
+metrics_bp = Blueprint("metrics_api", __name__)
+
+
+@metrics_bp.get("/metrics")
+def get_metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,111 @@
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+# Fixed patterns are prebuilt once, at the largest write size, and shared by all jobs (they are immutable
+# bytes); shorter writes get views. Named schemes use 7 patterns; at 8 MiB this pins at most 128 MiB
+PATTERN_CACHE = 16
+MAX_CUSTOM_PASSES = 35
+
+# Named schemes: each pass is "zero", "ones", "random" or a hex byte pattern repeated over the block
+SCHEMES: Dict[str, Tuple[str, ...]] = {
+    # DoD 5220.22-M: a character, its complement, then random
+    "dod_3pass": ("zero", "ones", "random"),
+    "zero": ("zero",),
+    "random": ("random",),
+    # Gutmann's random bookends and the MFM/RLL patterns that still matter, without the 35 passes
+    "gutmann_lite": ("random", "random", "55", "aa", "924924", "492492", "249249", "random", "random"),
+}
+DEFAULT_SCHEME = "dod_3pass"
+_NAMED = {"zero": b"\x00", "ones": b"\xff"}
+_HEX_RE = re.compile(r"^(?:0x)?((?:[0-9a-fA-F]{2}){1,16})$")
+
+
+class Pass(NamedTuple):
+    name: str
+    pattern: Optional[bytes]  # None: fresh random data for every write
+
+
+@lru_cache(maxsize=PATTERN_CACHE)
+def _pattern_buffer(pattern: bytes, size: int) -> bytes:
+    return (pattern * (size // len(pattern) + 1))[:size]
+
+
+def parse_pass(spec: str) -> Pass:
+    """One pass from "zero", "ones", "random" or a hex pattern such as "55" or "0x924924"."""
+    spec = str(spec).strip().replace(" ", "")
+    if spec.lower() == "random":
+        return Pass("random", None)
+    if spec.lower() in _NAMED:
+        return Pass(spec.lower(), _NAMED[spec.lower()])
+    match = _HEX_RE.match(spec)
+    if not match:
+        raise ValueError(f"invalid pass '{spec}': use zero, ones, random or a hex byte pattern")
+    return Pass("0x" + match.group(1).lower(), bytes.fromhex(match.group(1)))
+
+
+class PassPlan(NamedTuple):
+    """Compiled sequence of overwrite passes for one job; immutable like any tuple.
+
+    Jobs each hold their own plan, so a quick wipe and a DoD wipe can run side
+    by side. Fixed patterns are views of one prebuilt buffer per pattern,
+    `block_size` long (the largest write); random passes draw fresh data per
+    write.
+    """
+
+    scheme: str
+    passes: Tuple[Pass, ...]
+    block_size: int
+
+    @property
+    def pass_count(self) -> int:
+        return len(self.passes)
+
+    def buffer(self, index: int, length: int) -> Union[bytes, memoryview]:
+        """Data for pass `index` over `length` bytes."""
+        pattern = self.passes[index].pattern
+        if pattern is None:
+            return os.urandom(length)
+        if length > self.block_size:
+            # Longer than the plan was compiled for: built for this write only, never cached
+            return (pattern * (length // len(pattern) + 1))[:length]
+        data = _pattern_buffer(pattern, self.block_size)
+        return data if length == self.block_size else memoryview(data)[:length]
+
+    def planned_bytes(self, nbytes: int) -> int:
+        """Bytes written to cover `nbytes` of the device with every pass."""
+        return nbytes * len(self.passes)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"scheme": self.scheme, "passes": [p.name for p in self.passes]}
+
+
+def compile_plan(scheme: Optional[str] = None, custom: Optional[Sequence[str]] = None,
+                 block_size: int = 512 * 1024) -> PassPlan:
+    """Build the plan for `scheme` (a SCHEMES name, or "custom" with `custom` pass specs).
+
+    `block_size` is the largest single write the job makes.
+    """
+    scheme = scheme or DEFAULT_SCHEME
+    if scheme == "custom":
+        if not custom or isinstance(custom, str):
+            raise ValueError("scheme 'custom' needs a list of passes")
+        if len(custom) > MAX_CUSTOM_PASSES:
+            raise ValueError(f"at most {MAX_CUSTOM_PASSES} passes")
+        specs: Sequence[str] = custom
+    elif scheme in SCHEMES:
+        specs = SCHEMES[scheme]
+    else:
+        raise ValueError(f"scheme must be one of: {', '.join(list(SCHEMES) + ['custom'])}")
+    passes = tuple(parse_pass(spec) for spec in specs)
+    if not passes:
+        raise ValueError("a pass plan needs at least one pass")
+    for p in passes:
+        if p.pattern is not None:
+            _pattern_buffer(p.pattern, block_size)
+    return PassPlan(scheme, passes, block_size)
+
+
+def list_schemes() -> List[Dict[str, Any]]:
+    return [{"scheme": name, "passes": list(specs)} for name, specs in SCHEMES.items()]
@@ -1,30 +1,49 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, request, jsonify
 from flask_cors import CORS
-import threading
 import time
 import os
 import random
 import psutil
 import ctypes
 from ctypes import wintypes
-import win32file
-import win32con
-from concurrent.futures import ThreadPoolExecutor, as_completed
+try:
+    import win32file
+    import win32con
+except ImportError:  # pywin32 is only available on Windows
+    win32file = None
+    win32con = None
+from concurrent.futures import wait, FIRST_COMPLETED
 import logging
+from jobs import JobControl, JobCancelled, merge_ranges
+from job_store import JobTable, job_store
+from reports import record_job
+import metrics
+from throttle import throttles
+from io_scheduler import io_scheduler
+import simdevice
+import fast_erase
+import extent_map
+import pass_plan
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}})
+pendrive_bp = Blueprint("pendrive_wipe", __name__)
+CORS(pendrive_bp, resources={r"/*": {"origins": "*"}})
 
 class PendriveWiper:
     def __init__(self):
-        self.active_wipes = {}
+        self.controls = {}  # wipe_id -> JobControl (cancel / pause / resume)
+        # Persisted wipe state; finished wipes are evicted from memory after the retention period
+        self.active_wipes = JobTable('pendrive', on_evict=lambda wipe_id: self.controls.pop(wipe_id, None))
         self.bomb_size = 512 * 1024  # 512KB per bomb for pendrives (smaller bombs)
-        self.overwrite_passes = 3
-        self.demo_mode = False  # WARNING: Real mode will actually destroy data!
+        self.default_scheme = pass_plan.DEFAULT_SCHEME  # Overwrite scheme for jobs that do not name one
+        self.demo_mode = False  # WARNING: Real mode will actually destroy data! Demo mode wipes a simulated device
+        self.bombs_in_flight = 8  # Per-job window on the shared I/O pool
+        self.order = 'priority'  # 'priority': metadata, then data by size, then free space; 'sequential': by offset
+        self.pass_order = 'region'  # 'region': all passes on one bomb before the next; 'pass': each pass over the whole plan
+        self.pass_block = 8 * 1024 * 1024  # Pass-major writes merge adjacent bombs into runs of up to this size
         
     def get_removable_devices(self):
         """Get list of removable devices (pendrives, USB drives)"""
@@ -63,13 +82,30 @@ class PendriveWiper:
     def get_device_path(self, device_name):
         """Convert device name to Windows device path"""
         try:
+            if simdevice.is_sim_path(device_name):
+                return device_name
+            if self.demo_mode:
+                # Demo runs do real I/O against a simulated device named after the requested one
+                return simdevice.SIM_PREFIX + simdevice.sim_name(device_name)
+            if fast_erase.is_allowed_image(device_name):
+                # Image files only from the directories opted in with SECUREWIPE_IMAGE_DIRS (benchmarks, tests)
+                return device_name
+            
             removable_devices = self.get_removable_devices()
             
             for device in removable_devices:
                 if (device_name.lower() in device['name'].lower() or 
                     device_name.lower() in device['device'].lower()):
+                    if win32file is None:
+                        # POSIX: only the block device of a listed removable drive, never another path
+                        if fast_erase.is_block_device(device['device']):
+                            return device['device']
+                        continue
                     return f"\\\\.\\{device['device'].replace(':', '')}"
                     
+            if win32file is None:
+                return None
+            
             # Try direct device paths for drive letters
             for i in range(26):
                 drive_letter = chr(ord('A') + i)
@@ -81,22 +117,18 @@ class PendriveWiper:
             logger.error(f"Error getting device path: {e}")
             return None
     
+    def get_erase_target(self, device_name):
+        """Device path for a fast erase, or None: the same targets as /api/fast-erase (fast_erase.resolve_device)"""
+        if self.demo_mode and not simdevice.is_sim_path(device_name):
+            return self.get_device_path(device_name)
+        return fast_erase.resolve_device(device_name)
+    
     def get_device_size(self, device_path, device_name=None):
         """Get the size of the device in bytes"""
         try:
-            if device_path == "DEMO_PENDRIVE_PATH":
-                # Demo mode size extraction
-                if device_name:
-                    import re
-                    size_match = re.search(r'\((\d+(?:\.\d+)?)\s*GB\)', device_name)
-                    if size_match:
-                        gb_size = float(size_match.group(1))
-                        estimated_bytes = int(gb_size * 1024 * 1024 * 1024)
-                        logger.info(f"Demo mode: Using estimated size from device name: {estimated_bytes} bytes ({gb_size} GB)")
-                        return estimated_bytes
-                # Demo fallback
-                logger.info("Demo mode: Using fallback size for pendrive: 16GB")
-                return 16 * 1024 * 1024 * 1024
+            if win32file is None or simdevice.is_sim_path(device_path):
+                # Simulated devices, and on POSIX block devices / image files (seek to end)
+                return simdevice.device_size(device_path)
             
             handle = win32file.CreateFile(
                 device_path,
@@ -117,35 +149,38 @@ class PendriveWiper:
             logger.error(f"Error getting device size: {e}")
             return None
     
-    def generate_bomb_pattern(self):
-        """Generate random pattern for overwriting"""
-        patterns = [
-            b'\x00' * self.bomb_size,  # Zeros
-            b'\xFF' * self.bomb_size,  # Ones
-            bytes(random.randint(0, 255) for _ in range(self.bomb_size))  # Random
-        ]
-        return random.choice(patterns)
+    def compile_plan(self, scheme=None, custom=None):
+        """Per-job pass plan; jobs never share or change each other's passes"""
+        # Sized for the largest write, a merged pass-major run, so every write is a view of one buffer
+        return pass_plan.compile_plan(scheme or self.default_scheme, custom, max(self.bomb_size, self.pass_block))
+    
+    def place_bomb(self, device_path, offset, bomb_id, plan, control=None, length=None):
+        """Place a bomb at specific offset and execute the plan's overwrite passes"""
+        length = length or self.bomb_size
+        if control and control.cancelled():
+            # Cancel skips bombs that were already queued; pause is handled before submitting
+            raise JobCancelled()
+        if control:
+            # Bandwidth/IOPS limits for all of the bomb's passes, before taking station-wide bytes:
+            # a throttled job must not sleep on budget other devices are waiting for
+            control.throttle(length * plan.pass_count, plan.pass_count)
+        # Station-wide in-flight byte budget, shared fairly between devices
+        with io_scheduler.inflight(device_path, length):
+            self._place_bomb(device_path, offset, bomb_id, plan, length)
     
-    def place_bomb(self, device_path, offset, bomb_id):
-        """Place a bomb at specific offset and execute overwrite passes"""
+    def _place_bomb(self, device_path, offset, bomb_id, plan, length=None):
         try:
-            logger.info(f"Placing bomb {bomb_id} at offset {offset}")
+            # Per-bomb lines are sampled debug output; throughput and latency go to /metrics
+            log_this = metrics.sample_debug(logger)
+            if log_this:
+                logger.debug(f"Placing bomb {bomb_id} at offset {offset}")
             
-            if self.demo_mode:
-                # Demo mode: simulate bomb placement without actual device writes
-                logger.info(f"DEMO MODE: Simulating pendrive bomb {bomb_id} placement")
-                
-                for pass_num in range(self.overwrite_passes):
-                    # Simulate work time
-                    time.sleep(0.05 + random.uniform(0.02, 0.08))
-                    logger.info(f"DEMO: Pendrive bomb {bomb_id} - Pass {pass_num + 1} simulated")
-                
-                logger.info(f"DEMO: Bomb {bomb_id} detonated successfully on pendrive (simulated)!")
+            if win32file is None or simdevice.is_sim_path(device_path):
+                self._place_bomb_positional(device_path, offset, plan, length)
+                if log_this:
+                    logger.debug(f"Bomb {bomb_id} detonated successfully on pendrive!")
                 return
             
-            # Real mode: actual device operations
-            logger.warning(f"REAL MODE: Actually placing pendrive bomb {bomb_id} - THIS WILL DESTROY DATA!")
-            
             # Open device handle
             handle = win32file.CreateFile(
                 device_path,
@@ -161,26 +196,111 @@ class PendriveWiper:
             win32file.SetFilePointer(handle, offset, win32con.FILE_BEGIN)
             
             # Execute multiple overwrite passes
-            for pass_num in range(self.overwrite_passes):
-                pattern = self.generate_bomb_pattern()
+            for pass_num in range(plan.pass_count):
+                pattern = plan.buffer(pass_num, length)
                 
                 # Reset file pointer
                 win32file.SetFilePointer(handle, offset, win32con.FILE_BEGIN)
                 
                 # Write the pattern
-                win32file.WriteFile(handle, pattern)
-                win32file.FlushFileBuffers(handle)
+                with metrics.timed('pendrive', 'write', len(pattern)):
+                    win32file.WriteFile(handle, pattern)
+                with metrics.timed('pendrive', 'fsync'):
+                    win32file.FlushFileBuffers(handle)
                 
-                logger.info(f"Bomb {bomb_id} - Pass {pass_num + 1} completed")
                 time.sleep(0.05)  # Smaller delay for pendrives
             
             win32file.CloseHandle(handle)
-            logger.info(f"Bomb {bomb_id} detonated successfully on pendrive!")
+            if log_this:
+                logger.debug(f"Bomb {bomb_id} detonated successfully on pendrive!")
             
         except Exception as e:
+            metrics.errors_total.inc(engine='pendrive')
             logger.error(f"Error placing bomb {bomb_id}: {e}")
             raise
     
+    def _place_bomb_positional(self, device_path, offset, plan, length=None):
+        """Overwrite passes on a simulated device, or a POSIX block device / image file: positional writes, fsync per pass"""
+        with simdevice.open_device(device_path, writable=True) as dev:
+            for pass_num in range(plan.pass_count):
+                pattern = plan.buffer(pass_num, length)
+                with metrics.timed('pendrive', 'write', len(pattern)):
+                    dev.pwrite(pattern, offset)
+                with metrics.timed('pendrive', 'fsync'):
+                    dev.fsync()
+    
+    def _write_pass(self, device_path, runs, pass_num, plan, control, on_run):
+        """One pass of a pass-major wipe: every run in order with large writes, then a single flush"""
+        if win32file is None or simdevice.is_sim_path(device_path):
+            with simdevice.open_device(device_path, writable=True) as dev:
+                return self._pass_runs(device_path, runs, pass_num, plan, control, on_run, dev.pwrite, dev.fsync)
+        
+        # No write-through: the FlushFileBuffers at the end of the pass is its only barrier
+        handle = win32file.CreateFile(
+            device_path,
+            win32con.GENERIC_WRITE,
+            0,
+            None,
+            win32con.OPEN_EXISTING,
+            win32con.FILE_FLAG_NO_BUFFERING,
+            None
+        )
+        
+        def write(data, offset):
+            win32file.SetFilePointer(handle, offset, win32con.FILE_BEGIN)
+            win32file.WriteFile(handle, data)
+        
+        try:
+            return self._pass_runs(device_path, runs, pass_num, plan, control, on_run, write,
+                                   lambda: win32file.FlushFileBuffers(handle))
+        finally:
+            win32file.CloseHandle(handle)
+    
+    def _pass_runs(self, device_path, runs, pass_num, plan, control, on_run, write, flush):
+        """Write pass `pass_num` over `runs`, calling on_run(pass_num, run) after each, then flush once"""
+        started = time.monotonic()
+        written = 0
+        try:
+            for run in runs:
+                offset, length = run[0], run[1]
+                control.checkpoint()
+                data = plan.buffer(pass_num, length)
+                control.throttle(length)
+                with io_scheduler.inflight(device_path, length):
+                    with metrics.timed('pendrive', 'write', length):
+                        write(data, offset)
+                written += length
+                on_run(pass_num, run)
+        finally:
+            # Also when cancelled: what this pass wrote is made durable
+            flush_started = time.monotonic()
+            with metrics.timed('pendrive', 'fsync'):
+                flush()
+        seconds = time.monotonic() - started
+        return {
+            'pass': pass_num + 1,
+            'pattern': plan.passes[pass_num].name,
+            'bytes': written,
+            'seconds': round(seconds, 3),
+            'fsync_seconds': round(time.monotonic() - flush_started, 3),
+            'throughput_mb_s': round(written / (1024**2) / seconds, 2) if seconds > 0 else None
+        }
+    
+    def coalesce_bombs(self, bombs):
+        """Merge consecutive bombs that continue each other on the device (same phase) into runs of up to pass_block.
+        
+        Returns [offset, length, bomb_count, phase] runs in the bombs' order.
+        """
+        runs = []
+        for offset, length, _, phase in bombs:
+            last = runs[-1] if runs else None
+            if last and last[3] == phase and last[0] + last[1] == offset and last[1] + length <= self.pass_block:
+                last[1] += length
+                last[2] += 1
+            else:
+                runs.append([offset, length, 1, phase])
+        return runs
+    
     def calculate_bomb_positions(self, device_size):
         """Calculate optimal bomb positions to cover entire pendrive"""
         if device_size is None or device_size <= 0:
@@ -204,26 +324,273 @@ class PendriveWiper:
                 
         return positions
     
-    def execute_pendrive_wipe(self, device_name, wipe_id):
+    def extent_bombs(self, extents, phase=None, first_id=1):
+        """Split (offset, length) extents into bombs of at most bomb_size: (offset, length, bomb_id, phase)"""
+        bombs = []
+        for offset, length in extents:
+            end = offset + length
+            while offset < end:
+                bombs.append((offset, min(self.bomb_size, end - offset), first_id + len(bombs), phase))
+                offset += self.bomb_size
+        return bombs
+    
+    def submit_wipe(self, device_name, wipe_id, runner=None, method='pendrive_boom_wipe'):
+        """Queue a wipe behind any job already using the same physical device.
+        
+        Returns the queue position (0 = started immediately).
+        """
+        device_key = self.get_device_path(device_name) or device_name
+        self.active_wipes[wipe_id] = {
+            'status': 'queued',
+            'device': device_name,
+            'progress': 0,
+            'type': 'pendrive',
+            'method': method
+        }
+        self.controls[wipe_id] = JobControl(self.active_wipes[wipe_id], job_id=wipe_id)
+        runner = runner or (lambda: self.execute_pendrive_wipe(device_name, wipe_id))
+        
+        def run():
+            entry = self.active_wipes[wipe_id]
+            entry['started_at'] = time.time()
+            try:
+                runner()
+            finally:
+                entry['finished_at'] = time.time()
+                record_job(wipe_id, 'pendrive', entry)
+                throttles.release(wipe_id)
+                io_scheduler.release_device(device_key, wipe_id)
+        
+        position = io_scheduler.run_exclusive(device_key, wipe_id, lambda: io_scheduler.submit_job(run))
+        if position:
+            self.active_wipes[wipe_id]['queue_position'] = position
+        return position
+    
+    def plan_bombs(self, device_path, device_size, order='priority', sweep=True):
+        """Bombs for a wipe: (offset, length, bomb_id, phase), in the order they should be placed.
+        
+        'priority' maps the device read-only (extent_map.priority_plan) so partition tables and
+        filesystem metadata go first and user data follows by descending size; 'sequential'
+        covers the device by offset. Without `sweep` only the allocated regions are planned.
+        Returns (bombs, allocation map or None).
+        """
+        if order == 'priority' or not sweep:
+            try:
+                allocation = extent_map.allocation_map(device_path)
+            except (OSError, ValueError) as e:
+                if not sweep:
+                    raise
+                logger.warning(f"Could not map {device_path} ({e}); wiping in offset order")
+            else:
+                plan = extent_map.priority_plan(allocation, sweep)
+                if order != 'priority':
+                    plan.sort(key=lambda step: step[1][0])
+                bombs = []
+                for phase, extent in plan:
+                    bombs += self.extent_bombs([extent], phase, len(bombs) + 1)
+                return bombs, allocation
+        return [(offset, self.bomb_size, bomb_id, None)
+                for offset, bomb_id in self.calculate_bomb_positions(device_size)], None
+    
+    def _run_bombs(self, wipe_id, device_path, device_size, bombs, control, plan, pass_order='region'):
+        """Place (offset, length, bomb_id, phase) bombs in order; False if the wipe was cancelled.
+        
+        Progress is bytes done over bytes planned; planned bytes (every pass of every bomb) over
+        the rate so far give eta_seconds. Bombs with a phase also count towards
+        entry['phases'][phase], and all but 'free' towards entry['allocated'], so partial
+        wipes report allocated vs. total bytes. Once every 'metadata' bomb is done the
+        time since the job started is recorded as time_to_unrecoverable_s.
+        
+        pass_order 'region' runs every pass on a bomb before the next (_run_regions); 'pass'
+        writes pass 1 over all bombs, then pass 2, ... (_run_passes).
+        """
+        entry = self.active_wipes[wipe_id]
+        total_bombs = len(bombs)
+        planned = sum(length for _, length, _, _ in bombs)
+        phases = {}
+        for _, length, _, phase in bombs:
+            if phase is not None:
+                phases.setdefault(phase, {'bytes': 0, 'processed_bytes': 0, 'progress': 0})['bytes'] += length
+        entry.update({
+            'status': 'placing_bombs',
+            'pass_order': pass_order,
+            'total_bombs': total_bombs,
+            'completed_bombs': 0,
+            'planned_bytes': plan.planned_bytes(planned),
+            'written_bytes': 0,
+            'eta_seconds': None
+        })
+        allocated = {'bytes': sum(c['bytes'] for name, c in phases.items() if name != 'free'),
+                     'processed_bytes': 0, 'progress': 0}
+        if phases:
+            entry['phases'] = phases
+            entry['allocated'] = allocated
+        started = entry.get('started_at') or time.time()
+        run_started = time.monotonic()
+        
+        def report_written(written, **fields):
+            rate = written / max(time.monotonic() - run_started, 1e-6)
+            entry.update(fields, progress=written * 100 / entry['planned_bytes'], written_bytes=written,
+                         eta_seconds=round((entry['planned_bytes'] - written) / rate, 1))
+        
+        def count_phase(length, phase):
+            if phase is None:
+                return
+            for name, counts in ((phase, phases[phase]), ('allocated', allocated)):
+                if name == 'allocated' and phase == 'free':
+                    continue
+                counts['processed_bytes'] += length
+                counts['progress'] = round(counts['processed_bytes'] / counts['bytes'] * 100, 2)
+            if phase == 'metadata' and phases[phase]['processed_bytes'] == phases[phase]['bytes']:
+                # Partition tables, FATs and directories are gone: the milestone of a cut-short wipe
+                elapsed = time.time() - started
+                entry['time_to_unrecoverable_s'] = round(elapsed, 3)
+                metrics.time_to_unrecoverable.observe(elapsed, engine='pendrive')
+        
+        run = self._run_passes if pass_order == 'pass' else self._run_regions
+        processed, completed_bombs = run(entry, device_path, device_size, bombs, control, plan,
+                                         report_written, count_phase)
+        
+        # Final report of exactly which byte ranges received every pass
+        processed_ranges = merge_ranges(processed)
+        entry.update({
+            'processed_ranges': processed_ranges,
+            'processed_bytes': sum(r['length'] for r in processed_ranges)
+        })
+        if simdevice.is_sim_path(device_path):
+            # Modelled device time and throughput, reproducible for the same model and seed
+            entry['simulated_device'] = simdevice.sim_devices.ensure(device_path).stats()
+        
+        if control.cancelled():
+            entry['status'] = 'cancelled'
+            logger.info(f"Stopped after {completed_bombs}/{total_bombs} bombs")
+            return False
+        return True
+    
+    def _run_regions(self, entry, device_path, device_size, bombs, control, plan, report_written, count_phase):
+        """Region-major: each bomb gets every pass (fsync per pass) on the shared I/O pool.
+        
+        Returns the (start, end) ranges that received every pass and the number of bombs done.
+        """
+        total_bombs = len(bombs)
+        
+        # Execute bombs on the shared I/O pool, keeping a small window in flight per job
+        # so concurrent wipes interleave instead of queueing behind each other
+        processed = []
+        pending = iter(bombs)
+        in_flight = {}
+        
+        def submit_next():
+            # Pause blocks this job thread, not a shared I/O worker: a paused job holds none
+            try:
+                control.checkpoint()
+            except JobCancelled:
+                return
+            for bomb in pending:
+                offset, length, bomb_id, _ = bomb
+                future = io_scheduler.submit_io(self.place_bomb, device_path, offset, bomb_id, plan, control, length)
+                in_flight[future] = bomb
+                return
+        
+        for _ in range(min(self.bombs_in_flight, total_bombs)):
+            submit_next()
+        
+        completed_bombs = 0
+        done_bytes = 0
+        
+        # Process completed bombs
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                offset, length, bomb_id, phase = in_flight.pop(future)
+                
+                try:
+                    future.result()  # This will raise exception if bomb failed
+                    completed_bombs += 1
+                    done_bytes += length
+                    processed.append((offset, min(offset + length, device_size)))
+                    
+                    # Update progress
+                    report_written(plan.planned_bytes(done_bytes), completed_bombs=completed_bombs)
+                    count_phase(length, phase)
+                    
+                    if metrics.sample_debug(logger):
+                        logger.debug(f"Pendrive Progress: {completed_bombs}/{total_bombs} bombs ({entry['progress']:.1f}%)")
+                    
+                except JobCancelled:
+                    pass
+                except Exception as e:
+                    logger.error(f"Pendrive bomb {bomb_id} failed: {e}")
+                    # Continue with other bombs even if one fails
+                
+                # Stop feeding new bombs once cancelled; running ones finish their passes
+                if not control.cancelled():
+                    submit_next()
+        
+        return processed, completed_bombs
+    
+    def _run_passes(self, entry, device_path, device_size, bombs, control, plan, report_written, count_phase):
+        """Pass-major: pass 1 over every bomb, one flush, then pass 2, ... in large sequential runs.
+        
+        Overwriting a region again right away mostly lands in the flash controller's cache;
+        a whole pass in between avoids that. Each pass is recorded in entry['pass_stats'].
+        Ranges count as processed once the last pass has written them.
+        """
+        runs = self.coalesce_bombs(bombs)
+        last_pass = plan.pass_count - 1
+        processed = []
+        written = 0
+        completed_bombs = 0
+        entry.update({'pass_stats': [], 'coalesced_runs': len(runs)})
+        
+        def on_run(pass_num, run):
+            nonlocal written, completed_bombs
+            offset, length, bomb_count, phase = run
+            written += length
+            if pass_num == 0:
+                count_phase(length, phase)
+            if pass_num == last_pass:
+                completed_bombs += bomb_count
+                processed.append((offset, min(offset + length, device_size)))
+            report_written(written, completed_bombs=completed_bombs)
+        
+        try:
+            for pass_num in range(plan.pass_count):
+                entry['current_pass'] = pass_num + 1
+                stats = self._write_pass(device_path, runs, pass_num, plan, control, on_run)
+                entry['pass_stats'] = entry['pass_stats'] + [stats]
+                logger.info(f"Pass {pass_num + 1}/{plan.pass_count} ({stats['pattern']}): "
+                            f"{stats['bytes']} bytes at {stats['throughput_mb_s']} MB/s")
+        except JobCancelled:
+            pass
+        except Exception:
+            metrics.errors_total.inc(engine='pendrive')
+            raise
+        return processed, completed_bombs
+    
+    def execute_pendrive_wipe(self, device_name, wipe_id, order=None, plan=None, pass_order=None):
         """Execute the boom wipe process on pendrive"""
+        plan = plan or self.compile_plan()
+        pass_order = pass_order or self.pass_order
         try:
             logger.info(f"Starting Pendrive Boom Wipe on {device_name}")
-            self.active_wipes[wipe_id] = {
+            # Entry may already exist (queued by submit_wipe); keep the same dict for the JobControl
+            self.active_wipes.setdefault(wipe_id, {}).update({
                 'status': 'initializing',
                 'device': device_name,
                 'progress': 0,
-                'type': 'pendrive'
-            }
+                'type': 'pendrive',
+                'passes': plan.pass_count,
+                'pass_plan': plan.describe()
+            })
+            control = self.controls.get(wipe_id)
+            if control is None:
+                control = self.controls[wipe_id] = JobControl(self.active_wipes[wipe_id], job_id=wipe_id)
             
             # Get device path
             device_path = self.get_device_path(device_name)
             if not device_path:
-                if self.demo_mode:
-                    # In demo mode, use a dummy path
-                    device_path = "DEMO_PENDRIVE_PATH"
-                    logger.info(f"Demo mode: Using dummy device path for {device_name}")
-                else:
-                    raise Exception(f"Pendrive '{device_name}' not found")
+                raise Exception(f"Pendrive '{device_name}' not found")
             
             logger.info(f"Pendrive path resolved: {device_path}")
             
@@ -236,51 +603,23 @@ class PendriveWiper:
             size_gb = device_size / (1024**3)
             logger.info(f"Pendrive size: {device_size} bytes ({size_gb:.2f} GB / {size_mb:.1f} MB)")
             
-            # Calculate bomb positions
-            bomb_positions = self.calculate_bomb_positions(device_size)
-            total_bombs = len(bomb_positions)
-            
-            logger.info(f"Calculated {total_bombs} bomb positions for pendrive")
-            
-            self.active_wipes[wipe_id].update({
-                'status': 'placing_bombs',
-                'total_bombs': total_bombs,
-                'completed_bombs': 0,
-                'device_size_mb': size_mb
-            })
+            # Calculate bomb positions (metadata first unless the job asked for offset order);
+            # pass-major wipes default to offset order so every pass is one sequential sweep
+            order = order or ('sequential' if pass_order == 'pass' else self.order)
+            bombs, allocation = self.plan_bombs(device_path, device_size, order)
+            total_bombs = len(bombs)
             
-            # Execute bombs in parallel (fewer threads for pendrives)
-            max_threads = min(8, total_bombs)  # Limit concurrent threads for pendrives
+            logger.info(f"Calculated {total_bombs} bomb positions for pendrive ({order} order)")
+            if not simdevice.is_sim_path(device_path):
+                logger.warning(f"REAL MODE: placing {total_bombs} bombs on {device_path} - THIS WILL DESTROY DATA!")
             
-            with ThreadPoolExecutor(max_workers=max_threads) as executor:
-                # Submit all bomb placement tasks
-                future_to_bomb = {
-                    executor.submit(self.place_bomb, device_path, offset, bomb_id): (offset, bomb_id)
-                    for offset, bomb_id in bomb_positions
-                }
-                
-                completed_bombs = 0
-                
-                # Process completed bombs
-                for future in as_completed(future_to_bomb):
-                    offset, bomb_id = future_to_bomb[future]
-                    
-                    try:
-                        future.result()  # This will raise exception if bomb failed
-                        completed_bombs += 1
-                        
-                        # Update progress
-                        progress = (completed_bombs / total_bombs) * 100
-                        self.active_wipes[wipe_id].update({
-                            'completed_bombs': completed_bombs,
-                            'progress': progress
-                        })
-                        
-                        logger.info(f"Pendrive Progress: {completed_bombs}/{total_bombs} bombs ({progress:.1f}%)")
-                        
-                    except Exception as e:
-                        logger.error(f"Pendrive bomb {bomb_id} failed: {e}")
-                        # Continue with other bombs even if one fails
+            self.active_wipes[wipe_id].update({'device_size_mb': size_mb, 'order': order})
+            if allocation is not None:
+                self.active_wipes[wipe_id]['allocation'] = {
+                    key: allocation[key] for key in ('source', 'allocated_bytes', 'allocated_ratio', 'partitions')}
+            if not self._run_bombs(wipe_id, device_path, device_size, bombs, control, plan, pass_order):
+                logger.warning(f"Pendrive Boom Wipe cancelled on {device_name}")
+                return
             
             # Mark as completed
             self.active_wipes[wipe_id].update({
@@ -297,10 +636,85 @@ class PendriveWiper:
                 'error': str(e)
             })
 
+    def execute_allocated_wipe(self, device_name, wipe_id, sweep=False, plan=None, pass_order=None):
+        """Overwrite only the allocated regions (FAT/exFAT clusters, partition tables, image data), then optionally the rest"""
+        plan = plan or self.compile_plan()
+        pass_order = pass_order or self.pass_order
+        entry = self.active_wipes.setdefault(wipe_id, {})
+        try:
+            logger.info(f"Starting Allocation-Aware Wipe on {device_name} (sweep={sweep})")
+            entry.update({'status': 'mapping', 'device': device_name, 'progress': 0, 'type': 'pendrive',
+                          'passes': plan.pass_count, 'pass_plan': plan.describe(), 'sweep': sweep})
+            control = self.controls.get(wipe_id)
+            if control is None:
+                control = self.controls[wipe_id] = JobControl(entry, job_id=wipe_id)
+            device_path = self.get_device_path(device_name)
+            if not device_path:
+                raise Exception(f"Pendrive '{device_name}' not found")
+            
+            # Read-only pass over the partition table / filesystem structures; the free space follows with sweep
+            device_size = simdevice.device_size(device_path)
+            order = 'sequential' if pass_order == 'pass' else self.order
+            bombs, allocation = self.plan_bombs(device_path, device_size, order, sweep)
+            entry.update({
+                'device_size_mb': device_size / (1024**2),
+                'allocation': {key: allocation[key] for key in ('source', 'allocated_bytes', 'allocated_ratio', 'partitions')}
+            })
+            logger.info(f"Allocation map of {device_path} ({allocation['source']}): "
+                        f"{allocation['allocated_bytes']} of {device_size} bytes allocated")
+            
+            if not self._run_bombs(wipe_id, device_path, device_size, bombs, control, plan, pass_order):
+                logger.warning(f"Allocation-Aware Wipe cancelled on {device_name}")
+                return
+            entry.update({'status': 'completed', 'progress': 100})
+            logger.info(f"Allocation-Aware Wipe completed on {device_name}")
+        except Exception as e:
+            logger.error(f"Allocation-Aware Wipe failed: {e}")
+            entry.update({'status': 'failed', 'error': str(e)})
+
+    def execute_fast_erase(self, device_name, wipe_id, mode='auto'):
+        """Erase the whole pendrive with discard / zero-out, falling back to one overwrite pass"""
+        entry = self.active_wipes.setdefault(wipe_id, {})
+        try:
+            logger.info(f"Starting Fast Erase ({mode}) on {device_name}")
+            entry.update({'status': 'erasing', 'device': device_name, 'progress': 0, 'type': 'pendrive'})
+            control = self.controls.get(wipe_id)
+            if control is None:
+                control = self.controls[wipe_id] = JobControl(entry, job_id=wipe_id)
+            device_path = self.get_erase_target(device_name)
+            if not device_path:
+                raise Exception(f"'{device_name}' is not a block device, sim:// device or allowed image file")
+            result = fast_erase.erase_device(device_path, mode, control=control)
+            entry.update({
+                'status': 'completed',
+                'progress': 100,
+                'erase_path': result['path'],
+                'processed_bytes': result['bytes'],
+                'fast_erase': result
+            })
+            logger.info(f"Fast Erase completed on {device_name} via {result['path']}")
+        except JobCancelled:
+            entry['status'] = 'cancelled'
+            logger.warning(f"Fast Erase cancelled on {device_name}")
+        except Exception as e:
+            logger.error(f"Fast Erase failed: {e}")
+            entry.update({'status': 'failed', 'error': str(e)})
+
 # Initialize the pendrive wiper
 pendrive_wiper = PendriveWiper()
 
-@app.route('/wipe-pendrive', methods=['POST'])
+def _request_plan(data, default_scheme=None):
+    """Pass plan from "scheme" (and "passes" for scheme "custom"); ValueError if invalid"""
+    return pendrive_wiper.compile_plan(data.get('scheme') or default_scheme, data.get('passes'))
+
+def _request_pass_order(data):
+    """"pass_order" of a request ('region' or 'pass'); ValueError if invalid"""
+    pass_order = data.get('pass_order') or pendrive_wiper.pass_order
+    if pass_order not in ('region', 'pass'):
+        raise ValueError("pass_order must be 'region' or 'pass'")
+    return pass_order
+
+@pendrive_bp.route('/wipe-pendrive', methods=['POST'])
 def wipe_pendrive():
     """Main pendrive wipe endpoint"""
     try:
@@ -321,21 +735,31 @@ def wipe_pendrive():
                 'message': 'Device name cannot be empty'
             }), 400
         
+        order = data.get('order')
+        if order not in (None, 'priority', 'sequential'):
+            return jsonify({
+                'status': 'error',
+                'message': "order must be 'priority' or 'sequential'"
+            }), 400
+        try:
+            plan = _request_plan(data)
+            pass_order = _request_pass_order(data)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        
         # Generate unique wipe ID
         wipe_id = f"pendrive_wipe_{int(time.time())}_{random.randint(1000, 9999)}"
         
-        # Start pendrive wipe in background thread
-        wipe_thread = threading.Thread(
-            target=pendrive_wiper.execute_pendrive_wipe,
-            args=(device_name, wipe_id),
-            daemon=True
-        )
-        wipe_thread.start()
+        # Hand the wipe to the I/O scheduler (one job per device, shared I/O pool)
+        queue_position = pendrive_wiper.submit_wipe(
+            device_name, wipe_id, lambda: pendrive_wiper.execute_pendrive_wipe(device_name, wipe_id, order, plan, pass_order))
         
         return jsonify({
             'status': 'success',
-            'message': f'Pendrive Boom Wipe initiated successfully on {device_name}.',
+            'message': f'Pendrive Boom Wipe initiated successfully on {device_name}.' if not queue_position
+                       else f'Pendrive Boom Wipe queued for {device_name} (position {queue_position}).',
             'wipe_id': wipe_id,
+            'queue_position': queue_position,
             'type': 'pendrive'
         }), 200
         
@@ -346,14 +770,20 @@ def wipe_pendrive():
             'message': f'Internal server error: {str(e)}'
         }), 500
 
-@app.route('/wipe-status/<wipe_id>', methods=['GET'])
+@pendrive_bp.route('/wipe-status/<wipe_id>', methods=['GET'])
 def get_wipe_status(wipe_id):
     """Get status of a specific wipe operation"""
     try:
         if wipe_id in pendrive_wiper.active_wipes:
+            wipe_status = pendrive_wiper.active_wipes[wipe_id]
+            if wipe_status.get('status') == 'queued':
+                wipe_status['queue_position'] = io_scheduler.queue_position(wipe_id)
+            control = pendrive_wiper.controls.get(wipe_id)
+            if control and wipe_status.get('status') not in ('completed', 'failed', 'cancelled'):
+                wipe_status['throttle'] = control.throttle.status()
             return jsonify({
                 'status': 'success',
-                'wipe_status': pendrive_wiper.active_wipes[wipe_id]
+                'wipe_status': wipe_status
             }), 200
         else:
             return jsonify({
@@ -367,13 +797,13 @@ def get_wipe_status(wipe_id):
             'message': f'Error retrieving status: {str(e)}'
         }), 500
 
-@app.route('/active-wipes', methods=['GET'])
+@pendrive_bp.route('/active-wipes', methods=['GET'])
 def get_active_wipes():
     """Get all active wipe operations"""
     try:
         return jsonify({
             'status': 'success',
-            'active_wipes': pendrive_wiper.active_wipes
+            'active_wipes': dict(pendrive_wiper.active_wipes)
         }), 200
         
     except Exception as e:
@@ -382,7 +812,64 @@ def get_active_wipes():
             'message': f'Error retrieving active wipes: {str(e)}'
         }), 500
 
-@app.route('/pendrives', methods=['GET'])
+def _control_wipe(action):
+    """Apply cancel / pause / resume to a running wipe"""
+    try:
+        data = request.get_json(silent=True) or {}
+        wipe_id = data.get('wipe_id')
+        if not wipe_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing wipe_id parameter in request body'
+            }), 400
+        
+        control = pendrive_wiper.controls.get(wipe_id)
+        if control is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Wipe ID not found'
+            }), 404
+        
+        if pendrive_wiper.active_wipes.get(wipe_id, {}).get('status') in ('completed', 'failed', 'cancelled'):
+            return jsonify({
+                'status': 'error',
+                'message': 'Wipe already finished'
+            }), 409
+        
+        getattr(control, action)()
+        if action == 'cancel' and io_scheduler.cancel_queued(wipe_id):
+            # Never started: nothing was written
+            entry = pendrive_wiper.active_wipes[wipe_id]
+            entry.update({'status': 'cancelled', 'processed_ranges': [], 'finished_at': time.time()})
+            record_job(wipe_id, 'pendrive', entry)
+            throttles.release(wipe_id)
+        return jsonify({
+            'status': 'success',
+            'message': f'{action.capitalize()} requested for {wipe_id}'
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Error controlling wipe: {str(e)}'
+        }), 500
+
+@pendrive_bp.route('/wipe-cancel', methods=['POST'])
+def wipe_cancel():
+    """Cancel a wipe at the next bomb boundary"""
+    return _control_wipe('cancel')
+
+@pendrive_bp.route('/wipe-pause', methods=['POST'])
+def wipe_pause():
+    """Pause a wipe at the next bomb boundary"""
+    return _control_wipe('pause')
+
+@pendrive_bp.route('/wipe-resume', methods=['POST'])
+def wipe_resume():
+    """Resume a paused wipe"""
+    return _control_wipe('resume')
+
+@pendrive_bp.route('/pendrives', methods=['GET'])
 def list_pendrives():
     """List available removable storage devices (pendrives)"""
     try:
@@ -400,17 +887,19 @@ def list_pendrives():
             'message': f'Error listing pendrives: {str(e)}'
         }), 500
 
-@app.route('/health', methods=['GET'])
+@pendrive_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'success',
         'message': 'Pendrive Boom Wipe service is running',
         'active_wipes': len(pendrive_wiper.active_wipes),
-        'service_type': 'pendrive_wiper'
+        'service_type': 'pendrive_wiper',
+        'io_scheduler': io_scheduler.status(),
+        'throttle': throttles.status()
     }), 200
 
-@app.route('/get_wipe_method', methods=['POST'])
+@pendrive_bp.route('/get_wipe_method', methods=['POST'])
 def get_wipe_method():
     """Determine the appropriate wipe method for a device"""
     try:
@@ -464,12 +953,23 @@ def get_wipe_method():
             # For non-removable devices, default to DoD standard  
             recommended_method = 'dod'
         
+        # Flash media with discard support can be fast-erased (POST /fast-erase) when the client allows it
+        device_path = pendrive_wiper.get_erase_target(device_name)
+        fast = fast_erase.recommended(device_path)
+        if fast and data.get('allow_fast_erase'):
+            recommended_method = 'fast-erase'
+        
         logger.info(f"Recommended method: {recommended_method} (is_removable: {is_removable})")
         
         return jsonify({
             'method': recommended_method,
             'device_type': 'removable' if is_removable else 'fixed',
             'reason': f'Recommended {recommended_method} method for {"removable" if is_removable else "fixed"} storage device',
+            'fast_erase': {
+                'recommended': fast,
+                'device_path': device_path,
+                'capabilities': fast_erase.capabilities(device_path) if device_path else None
+            },
             'debug_info': {
                 'input_device': device_name,
                 'removable_devices_found': len(removable_devices),
@@ -483,8 +983,17 @@ def get_wipe_method():
             'error': f'Internal server error: {str(e)}'
         }), 500
 
+@pendrive_bp.route('/wipe-schemes', methods=['GET'])
+def wipe_schemes():
+    """Named overwrite schemes; "custom" takes a "passes" list of zero / ones / random / hex patterns"""
+    return jsonify({
+        'status': 'success',
+        'default': pendrive_wiper.default_scheme,
+        'schemes': pass_plan.list_schemes()
+    }), 200
+
 # Additional endpoint for quick format (less intensive)
-@app.route('/quick-wipe', methods=['POST'])
+@pendrive_bp.route('/quick-wipe', methods=['POST'])
 def quick_wipe():
     """Quick wipe for pendrives (single pass)"""
     try:
@@ -504,31 +1013,27 @@ def quick_wipe():
                 'message': 'Device name cannot be empty'
             }), 400
         
-        # Temporarily reduce overwrite passes for quick wipe
-        original_passes = pendrive_wiper.overwrite_passes
-        pendrive_wiper.overwrite_passes = 1
+        # Single pass by default; the plan belongs to this job only
+        try:
+            plan = _request_plan(data, 'random')
+            pass_order = _request_pass_order(data)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
         
         # Generate unique wipe ID
         wipe_id = f"quick_wipe_{int(time.time())}_{random.randint(1000, 9999)}"
         
-        # Start quick wipe in background thread
-        def execute_quick_wipe():
-            try:
-                pendrive_wiper.execute_pendrive_wipe(device_name, wipe_id)
-            finally:
-                # Restore original passes
-                pendrive_wiper.overwrite_passes = original_passes
-        
-        wipe_thread = threading.Thread(
-            target=execute_quick_wipe,
-            daemon=True
-        )
-        wipe_thread.start()
+        # Run quick wipe through the I/O scheduler
+        queue_position = pendrive_wiper.submit_wipe(
+            device_name, wipe_id, lambda: pendrive_wiper.execute_pendrive_wipe(device_name, wipe_id, plan=plan, pass_order=pass_order),
+            method='quick_wipe')
         
         return jsonify({
             'status': 'success',
-            'message': f'Quick Wipe initiated successfully on {device_name}.',
+            'message': f'Quick Wipe initiated successfully on {device_name}.' if not queue_position
+                       else f'Quick Wipe queued for {device_name} (position {queue_position}).',
             'wipe_id': wipe_id,
+            'queue_position': queue_position,
             'type': 'quick_wipe'
         }), 200
         
@@ -539,6 +1044,96 @@ def quick_wipe():
             'message': f'Internal server error: {str(e)}'
         }), 500
 
+@pendrive_bp.route('/fast-erase', methods=['POST'])
+def fast_erase_pendrive():
+    """Fast erase for flash pendrives: BLKSECDISCARD / BLKDISCARD / BLKZEROOUT, else one overwrite pass"""
+    try:
+        data = request.get_json(silent=True) or {}
+        device_name = (data.get('device') or '').strip()
+        if not device_name:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing device parameter in request body'
+            }), 400
+        
+        mode = data.get('mode') or 'auto'
+        if mode not in fast_erase.MODES:
+            return jsonify({
+                'status': 'error',
+                'message': f"mode must be one of: {', '.join(fast_erase.MODES)}"
+            }), 400
+        
+        if not pendrive_wiper.get_erase_target(device_name):
+            return jsonify({
+                'status': 'error',
+                'message': f"'{device_name}' is not a block device, sim:// device or image file under SECUREWIPE_IMAGE_DIRS"
+            }), 400
+        
+        wipe_id = f"fast_erase_{int(time.time())}_{random.randint(1000, 9999)}"
+        queue_position = pendrive_wiper.submit_wipe(
+            device_name, wipe_id, lambda: pendrive_wiper.execute_fast_erase(device_name, wipe_id, mode),
+            method='fast_erase')
+        
+        return jsonify({
+            'status': 'success',
+            'message': f'Fast Erase initiated successfully on {device_name}.' if not queue_position
+                       else f'Fast Erase queued for {device_name} (position {queue_position}).',
+            'wipe_id': wipe_id,
+            'queue_position': queue_position,
+            'type': 'fast_erase'
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error in fast_erase endpoint: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Internal server error: {str(e)}'
+        }), 500
+
+@pendrive_bp.route('/allocated-wipe', methods=['POST'])
+def allocated_wipe():
+    """Wipe only allocated extents first; with "sweep": true the unallocated rest follows"""
+    try:
+        data = request.get_json(silent=True) or {}
+        device_name = (data.get('device') or '').strip()
+        if not device_name:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing device parameter in request body'
+            }), 400
+        
+        sweep = bool(data.get('sweep', False))
+        try:
+            plan = _request_plan(data)
+            pass_order = _request_pass_order(data)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        wipe_id = f"allocated_wipe_{int(time.time())}_{random.randint(1000, 9999)}"
+        queue_position = pendrive_wiper.submit_wipe(
+            device_name, wipe_id, lambda: pendrive_wiper.execute_allocated_wipe(device_name, wipe_id, sweep, plan, pass_order),
+            method='allocated_wipe')
+        
+        return jsonify({
+            'status': 'success',
+            'message': f'Allocation-Aware Wipe initiated successfully on {device_name}.' if not queue_position
+                       else f'Allocation-Aware Wipe queued for {device_name} (position {queue_position}).',
+            'wipe_id': wipe_id,
+            'queue_position': queue_position,
+            'type': 'allocated_wipe'
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error in allocated_wipe endpoint: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Internal server error: {str(e)}'
+        }), 500
+
+# Standalone service; the gateway in server.py mounts pendrive_bp instead
+app = Flask(__name__)
+app.register_blueprint(pendrive_bp)
+
 if __name__ == '__main__':
     logger.info("Starting Pendrive Boom Wipe Flask application on port 8744")
+    job_store.open()
     app.run(host='0.0.0.0', port=8744, debug=False)
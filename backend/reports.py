@@ -0,0 +1,373 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Blueprint, Response, jsonify, request
+from flask_cors import CORS
+
+logger = logging.getLogger(__name__)
+
+DB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DB_PATH = os.environ.get("SECUREWIPE_REPORTS_DB", os.path.join(DB_DIR, "reports.db"))
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+CACHE_SIZE = 256  # rendered reports kept in memory (reports never change once written)
+
+METHOD_LABELS = {
+    "pendrive_boom_wipe": "Pendrive Boom Wipe",
+    "quick_wipe": "Quick Wipe",
+    "allocated_wipe": "Allocation-Aware Wipe",
+    "fast_erase": "Fast Erase (discard / zero-out)",
+    "crypto_erase": "Crypto Erase (AES-256-CTR, key destroyed)",
+    "boom_wipe": "Boom Wipe (file overwrite)",
+    "free_space_wipe": "Free-Space Wipe",
+    "encrypt_and_wipe": "Encrypt Backup and Wipe",
+    "decrypt_and_restore": "Decrypt and Restore",
+    "verify_backup": "Backup Verification",
+}
+
+STATUS_LABELS = {"completed": "Completed", "failed": "Failed", "cancelled": "Cancelled"}
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def _job_bytes(entry: Dict[str, Any]) -> Optional[int]:
+    """Bytes covered by a job, from whichever field its engine reports."""
+    if entry.get("processed_bytes") is not None:
+        return int(entry["processed_bytes"])
+    result = entry.get("result")
+    if isinstance(result, dict) and result.get("bytes") is not None:
+        return int(result["bytes"])
+    details = entry.get("details") or {}
+    if details.get("bytes") is not None:
+        return int(details["bytes"])
+    ranges = entry.get("processed_ranges") or details.get("processed_ranges")
+    if ranges:
+        return sum(r["length"] for r in ranges)
+    return None
+
+
+def _job_verification(entry: Dict[str, Any]) -> Dict[str, Any]:
+    result = entry.get("result")
+    if isinstance(result, dict) and "verified" in result:
+        return {
+            "outcome": "passed" if not result.get("failed") else "failed",
+            "files_verified": result.get("verified", 0),
+            "files_failed": result.get("failed", 0),
+        }
+    if isinstance(result, dict) and isinstance(result.get("verification"), dict):
+        return dict(result["verification"])
+    if entry.get("verification"):
+        return dict(entry["verification"])
+    return {"outcome": "not_verified", "files_verified": 0, "files_failed": 0}
+
+
+def _files_processed(entry: Dict[str, Any]) -> int:
+    details = entry.get("details") or {}
+    for value in (entry.get("deleted_count"), details.get("files_processed"), details.get("files_encrypted"),
+                  details.get("files_restored")):
+        if value is not None:
+            return int(value)
+    return len(entry.get("processed_files") or [])
+
+
+def _processed_file_list(entry: Dict[str, Any]) -> List[str]:
+    details = entry.get("details") or {}
+    return list(entry.get("processed_files") or details.get("processed_files") or [])
+
+
+def _render_certificate(doc: Dict[str, Any]) -> str:
+    lines = [
+        "SECUREWIPE ERASURE REPORT",
+        "=" * 40,
+        f"Report ID:        {doc['reportId']}",
+        f"Short ID:         {doc['shortId']}",
+        f"Job ID:           {doc['jobId']}",
+        "",
+        f"Device:           {doc['deviceName']}",
+        f"Serial number:    {doc['deviceSerial']}",
+        f"Device type:      {doc['deviceType']}",
+        "",
+        f"Method:           {doc['wipeMethod']}",
+        f"Passes:           {doc['passes'] if doc['passes'] is not None else 'n/a'}",
+        f"Status:           {doc['wipeStatus']}",
+        f"Start time:       {doc['startTime']}",
+        f"End time:         {doc['endTime']}",
+        f"Duration:         {doc['durationSeconds']} s",
+        f"Bytes processed:  {doc['bytes'] if doc['bytes'] is not None else 'n/a'}",
+        f"Throughput:       {doc['throughputMBps'] if doc['throughputMBps'] is not None else 'n/a'} MB/s",
+        f"Files processed:  {doc['filesProcessed']}",
+        "",
+        f"Verification:     {doc['verification']['outcome']}",
+        f"Files verified:   {doc['filesVerified']}",
+    ]
+    if doc.get("message"):
+        lines += ["", f"Message: {doc['message']}"]
+    lines += ["", f"SHA-256: {doc['verificationHashes'][0]}", ""]
+    return "\n".join(lines)
+
+
+class ReportStore:
+    """Indexed SQLite table of job reports; each report is rendered once when recorded."""
+
+    def __init__(self, path: str = DB_PATH, cache_size: int = CACHE_SIZE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._cache: "OrderedDict[str, Tuple[Dict[str, Any], str]]" = OrderedDict()
+        self.cache_size = cache_size
+
+    def _db(self) -> sqlite3.Connection:
+        # Caller holds self._lock
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS reports (
+                        report_id TEXT PRIMARY KEY,
+                        short_id TEXT NOT NULL UNIQUE,
+                        job_id TEXT UNIQUE,
+                        kind TEXT NOT NULL,
+                        method TEXT,
+                        device TEXT,
+                        status TEXT,
+                        passes INTEGER,
+                        bytes INTEGER,
+                        started_at REAL,
+                        finished_at REAL NOT NULL,
+                        duration REAL,
+                        throughput_mb_s REAL,
+                        verification TEXT,
+                        files_verified INTEGER,
+                        document TEXT NOT NULL,
+                        certificate TEXT NOT NULL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_finished ON reports(finished_at, report_id)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_device ON reports(device)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_status ON reports(status)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_kind ON reports(kind)")
+            self._conn = conn
+        return self._conn
+
+    def record_job(self, job_id: str, kind: str, entry: Dict[str, Any], method: Optional[str] = None,
+                   device_info: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Build, render and store the report for a finished job; returns the short ID."""
+        method = method or entry.get("method") or kind
+        finished_at = entry.get("finished_at") or time.time()
+        started_at = entry.get("started_at")
+        duration = round(finished_at - started_at, 3) if started_at else None
+        nbytes = _job_bytes(entry)
+        throughput = round(nbytes / duration / (1024 * 1024), 2) if nbytes and duration else None
+        verification = _job_verification(entry)
+        passes = entry.get("passes")
+        device_info = device_info or {}
+        status = entry.get("status")
+        message = entry.get("message") or entry.get("error") or ""
+        if status not in STATUS_LABELS:
+            # A job that ended without a final status never finished its work: never certify it as completed
+            message = message or f"Job ended with status '{status or 'unknown'}'"
+            status = "failed"
+        report_id = uuid.uuid4().hex
+        short_id = "SW-" + report_id[:8].upper()
+        label = METHOD_LABELS.get(method, method)
+        doc = {
+            "reportId": report_id,
+            "shortId": short_id,
+            "jobId": job_id,
+            "kind": kind,
+            "deviceName": entry.get("device") or "",
+            "deviceSerial": device_info.get("serial") or "N/A",
+            "deviceType": device_info.get("type") or entry.get("type") or kind,
+            "wipeMethod": f"{label} ({passes}-pass)" if passes else label,
+            "passes": passes,
+            "wipeStatus": STATUS_LABELS.get(status, status),
+            "startTime": _iso(started_at),
+            "endTime": _iso(finished_at),
+            "durationSeconds": duration,
+            "bytes": nbytes,
+            "throughputMBps": throughput,
+            "filesProcessed": _files_processed(entry),
+            "processedFiles": _processed_file_list(entry),
+            "filesVerified": verification.get("files_verified", 0),
+            "verification": verification,
+            "message": message,
+        }
+        body = json.dumps(doc, sort_keys=True, default=str)
+        doc["verificationHashes"] = [hashlib.sha256(body.encode("utf-8")).hexdigest()]
+        certificate = _render_certificate(doc)
+        with self._lock:
+            conn = self._db()
+            try:
+                with conn:
+                    conn.execute(
+                        """
+                        INSERT INTO reports (report_id, short_id, job_id, kind, method, device, status, passes, bytes,
+                                             started_at, finished_at, duration, throughput_mb_s, verification,
+                                             files_verified, document, certificate)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (report_id, short_id, job_id, kind, method, doc["deviceName"], status, passes, nbytes,
+                         started_at, finished_at, duration, throughput, verification["outcome"],
+                         doc["filesVerified"], json.dumps(doc, default=str), certificate),
+                    )
+            except sqlite3.IntegrityError:
+                # Already recorded for this job
+                return None
+        return short_id
+
+    def get(self, report_id: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """(document, certificate) by report ID or short ID."""
+        key = report_id.upper() if report_id.upper().startswith("SW-") else report_id
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+            row = self._db().execute(
+                "SELECT report_id, short_id, document, certificate FROM reports WHERE report_id = ? OR short_id = ?",
+                (key, key),
+            ).fetchone()
+            if row is None:
+                return None
+            entry = (json.loads(row[2]), row[3])
+            for k in (row[0], row[1]):
+                self._cache[k] = entry
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return entry
+
+    def page(self, limit: int = PAGE_SIZE, cursor: Optional[str] = None, device: Optional[str] = None,
+             status: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Newest-first report documents; pass the returned cursor to get the next page."""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        where, params = [], []
+        if device:
+            where.append("device = ?")
+            params.append(device)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if cursor:
+            finished, _, report_id = cursor.partition("|")
+            where.append("(finished_at < ? OR (finished_at = ? AND report_id < ?))")
+            params.extend([float(finished), float(finished), report_id])
+        sql = "SELECT report_id, finished_at, document FROM reports"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY finished_at DESC, report_id DESC LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._db().execute(sql, params).fetchall()
+        docs = [json.loads(doc) for _, _, doc in rows[:limit]]
+        next_cursor = f"{rows[limit - 1][1]!r}|{rows[limit - 1][0]}" if len(rows) > limit else None
+        return docs, next_cursor
+
+
+report_store = ReportStore()
+
+
+def record_job(job_id: str, kind: str, entry: Dict[str, Any], method: Optional[str] = None) -> Optional[str]:
+    """Best-effort hook for engines: a failing report must never fail the job itself."""
+    try:
+        return report_store.record_job(job_id, kind, dict(entry), method)
+    except Exception:
+        logger.exception(f"Could not record report for job {job_id}")
+        return None
+
+
+# Reports API (frontend fetches /api/reports on :5000 and /api/history on :9758)
+reports_bp = Blueprint("reports_api", __name__)
+CORS(reports_bp, resources={r"/api/*": {"origins": "*"}})
+
+
+def _page_args() -> Tuple[int, Optional[str], Optional[str], Optional[str]]:
+    status = request.args.get("status")
+    # Accept either the stored status or its display label
+    status = status.lower() if status else None
+    return (int(request.args.get("limit", PAGE_SIZE)), request.args.get("cursor"),
+            request.args.get("device"), status)
+
+
+def _paged(items: List[Dict[str, Any]], next_cursor: Optional[str]) -> Response:
+    # The frontend expects a bare JSON array; the next page cursor goes in a header
+    resp = jsonify(items)
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    return resp
+
+
+@reports_bp.get("/api/reports")
+def get_reports():
+    try:
+        docs, next_cursor = report_store.page(*_page_args())
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid 'limit' or 'cursor'"}), 400
+    items = [{
+        "shortId": d["shortId"],
+        "reportId": d["reportId"],
+        "deviceName": d["deviceName"],
+        "wipeMethod": d["wipeMethod"],
+        "wipeStatus": d["wipeStatus"],
+        "createdAt": d["endTime"],
+        "filesVerified": d["filesVerified"],
+        "bytes": d["bytes"],
+        "throughputMBps": d["throughputMBps"],
+        "receiverEmail": "",
+        "emailSent": False,
+    } for d in docs]
+    return _paged(items, next_cursor)
+
+
+@reports_bp.get("/api/history")
+def get_history():
+    try:
+        docs, next_cursor = report_store.page(*_page_args())
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid 'limit' or 'cursor'"}), 400
+    items = [{
+        "id": d["shortId"],
+        "device": d["deviceName"],
+        "deviceSerial": d["deviceSerial"],
+        "method": d["wipeMethod"],
+        "status": d["wipeStatus"],
+        "date": d["endTime"],
+    } for d in docs]
+    return _paged(items, next_cursor)
+
+
+@reports_bp.get("/api/reports/<report_id>")
+def get_report(report_id):
+    found = report_store.get(report_id)
+    if found is None:
+        return jsonify({"status": "error", "message": "Report not found"}), 404
+    return jsonify(found[0]), 200
+
+
+@reports_bp.get("/api/reports/<report_id>/download")
+def download_report(report_id):
+    found = report_store.get(report_id)
+    if found is None:
+        return jsonify({"status": "error", "message": "Report not found"}), 404
+    doc, certificate = found
+    return Response(certificate, mimetype="text/plain", headers={
+        "Content-Disposition": f"attachment; filename=securewipe-report-{doc['shortId']}.txt",
+    })
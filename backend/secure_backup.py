@@ -3,16 +3,31 @@ import re
 import json
 import time
 import uuid
-from typing import List, Tuple, Optional
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional, Iterator, Dict, Any, Callable
 
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
 
+from jobs import JobControl, JobCancelled
+import metrics
 # Reuse helpers from the wipe module
 from secure_encrypt_wipe import _resolve_mounts_cross_platform, _is_system_volume, CHUNK_SIZE
 
 BACKUP_ROOT = os.path.join(os.path.dirname(__file__), "backups")
 
+# GCM2: segmented AEAD format (GCM1 single-stream files remain readable)
+GCM2_MAGIC = b"GCM2"
+GCM2_SEGMENT_SIZE = CHUNK_SIZE
+GCM2_NONCE_PREFIX_LEN = 7
+GCM2_HEADER_LEN = 4 + 4 + GCM2_NONCE_PREFIX_LEN
+GCM_TAG_LEN = 16
+DECRYPT_WORKERS = min(8, os.cpu_count() or 1)
+VERIFY_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
 
 def _ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
@@ -47,57 +62,170 @@ def _write_key_file(backup_dir: str, key: bytes) -> str:
     return path
 
 
-def _encrypt_file_to_backup(src_path: str, dst_path: str, key: bytes) -> None:
-    nonce = os.urandom(12)  # 96-bit nonce for GCM
-    cipher = Cipher(algorithms.AES(key), modes.GCM(nonce), backend=default_backend())
-    encryptor = cipher.encryptor()
+def _gcm2_nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    # STREAM construction: prefix(7) || segment counter(4, BE) || last-segment flag(1)
+    return prefix + struct.pack(">IB", index, 1 if last else 0)
+
+
+def _encrypt_file_to_backup(src_path: str, dst_path: str, key: bytes,
+                            throttle: Optional[Callable[..., Any]] = None) -> None:
+    """Encrypt a file into the segmented GCM2 format.
+
+    Layout: header(magic(4) + segment_size(4) + nonce_prefix(7)) followed by
+    segments of ciphertext || tag(16). Every segment is sealed independently with
+    the header as associated data, so segments can be verified and decrypted in
+    any order; the last-segment flag in the nonce detects truncation.
+    """
+    prefix = os.urandom(GCM2_NONCE_PREFIX_LEN)
+    header = GCM2_MAGIC + struct.pack(">I", GCM2_SEGMENT_SIZE) + prefix
+    aead = AESGCM(key)
 
     _ensure_dir(os.path.dirname(dst_path))
-    with open(src_path, "rb", buffering=0) as fin, open(dst_path, "wb", buffering=0) as fout:
-        # Write header: magic(4) + nonce(12) + tag(16 placeholder)
-        fout.write(b"GCM1")
-        fout.write(nonce)
-        fout.write(b"\x00" * 16)
-        total = 0
+    def _read() -> bytes:
+        start = time.perf_counter()
+        data = fin.read(GCM2_SEGMENT_SIZE)
+        metrics.record("backup", "read", start, len(data))
+        return data
+
+    with open(src_path, "rb") as fin, open(dst_path, "wb") as fout:
+        fout.write(header)
+        index = 0
+        chunk = _read()
         while True:
-            chunk = fin.read(CHUNK_SIZE)
-            if not chunk:
+            nxt = _read() if len(chunk) == GCM2_SEGMENT_SIZE else b""
+            last = not nxt
+            if throttle:
+                # Source read + backup write of one segment
+                throttle(2 * len(chunk), 2)
+            with metrics.timed("backup", "encrypt", len(chunk)):
+                sealed = aead.encrypt(_gcm2_nonce(prefix, index, last), chunk, header)
+            with metrics.timed("backup", "write", len(sealed)):
+                fout.write(sealed)
+            if last:
                 break
-            ct = encryptor.update(chunk)
-            if ct:
-                fout.write(ct)
-                total += len(ct)
-        encryptor.finalize()
-        # Seek back and write tag
-        fout.seek(4 + 12)
-        fout.write(encryptor.tag)
-
-
-def _decrypt_backup_file_to(dst_plain: str, enc_path: str, key: bytes) -> None:
-    with open(enc_path, "rb", buffering=0) as fin:
+            chunk = nxt
+            index += 1
+
+
+def _read_gcm2_header(fin) -> Tuple[bytes, int, bytes]:
+    header = fin.read(GCM2_HEADER_LEN)
+    if len(header) != GCM2_HEADER_LEN or header[:4] != GCM2_MAGIC:
+        raise ValueError("Unsupported backup format")
+    (segment_size,) = struct.unpack(">I", header[4:8])
+    if segment_size <= 0:
+        raise ValueError("Corrupt GCM2 header")
+    return header, segment_size, header[8:]
+
+
+def _gcm2_segment_count(enc_size: int, segment_size: int) -> int:
+    body = enc_size - GCM2_HEADER_LEN
+    if body < GCM_TAG_LEN:
+        raise ValueError("Truncated GCM2 backup file")
+    stride = segment_size + GCM_TAG_LEN
+    return max(1, -(-body // stride))
+
+
+def iter_backup_segments(enc_path: str, key: bytes, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+    """Yield (segment_index, plaintext) for a GCM2 file, verifying each segment.
+
+    Decryption starts at `start` without touching earlier segments, which allows
+    partial restores and progressive verification of large files.
+    """
+    aead = AESGCM(key)
+    with open(enc_path, "rb") as fin:
+        header, segment_size, prefix = _read_gcm2_header(fin)
+        count = _gcm2_segment_count(os.fstat(fin.fileno()).st_size, segment_size)
+        stop = count if stop is None else min(stop, count)
+        stride = segment_size + GCM_TAG_LEN
+        fin.seek(GCM2_HEADER_LEN + start * stride)
+        for index in range(start, stop):
+            blob = fin.read(stride)
+            yield index, aead.decrypt(_gcm2_nonce(prefix, index, index == count - 1), blob, header)
+
+
+def read_backup_segment(enc_path: str, key: bytes, index: int) -> bytes:
+    """Random-access read of a single GCM2 segment."""
+    for _, pt in iter_backup_segments(enc_path, key, index, index + 1):
+        return pt
+    raise IndexError(f"Segment {index} out of range")
+
+
+def _decrypt_gcm1_to(fout, fin, key: bytes, throttle: Optional[Callable[..., Any]] = None) -> None:
+    nonce = fin.read(12)
+    tag = fin.read(16)
+    cipher = Cipher(algorithms.AES(key), modes.GCM(nonce, tag), backend=default_backend())
+    decryptor = cipher.decryptor()
+    while True:
+        chunk = fin.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if throttle:
+            throttle(2 * len(chunk), 2)
+        pt = decryptor.update(chunk)
+        if pt:
+            fout.write(pt)
+    # Verify tag before exposing plaintext
+    decryptor.finalize()
+
+
+def _decrypt_gcm2_to(fout, fin, key: bytes, workers: int,
+                     throttle: Optional[Callable[..., Any]] = None) -> None:
+    header, segment_size, prefix = _read_gcm2_header(fin)
+    count = _gcm2_segment_count(os.fstat(fin.fileno()).st_size, segment_size)
+    stride = segment_size + GCM_TAG_LEN
+    aead = AESGCM(key)
+
+    def _open(index: int, blob: bytes) -> bytes:
+        with metrics.timed("restore", "decrypt", len(blob)):
+            return aead.decrypt(_gcm2_nonce(prefix, index, index == count - 1), blob, header)
+
+    def _read() -> bytes:
+        start = time.perf_counter()
+        blob = fin.read(stride)
+        metrics.record("restore", "read", start, len(blob))
+        if throttle:
+            throttle(2 * len(blob), 2)
+        return blob
+
+    def _write(plain: bytes) -> None:
+        with metrics.timed("restore", "write", len(plain)):
+            fout.write(plain)
+
+    if workers <= 1 or count == 1:
+        for index in range(count):
+            _write(_open(index, _read()))
+        return
+
+    # Keep a bounded window of segments in flight and write results in order
+    window = workers * 2
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for index in range(count):
+            pending.append(executor.submit(_open, index, _read()))
+            if len(pending) >= window:
+                _write(pending.popleft().result())
+        while pending:
+            _write(pending.popleft().result())
+
+
+def _decrypt_backup_file_to(dst_plain: str, enc_path: str, key: bytes, workers: int = DECRYPT_WORKERS,
+                            throttle: Optional[Callable[..., Any]] = None) -> None:
+    with open(enc_path, "rb") as fin:
         magic = fin.read(4)
-        if magic != b"GCM1":
+        if magic not in (b"GCM1", GCM2_MAGIC):
             raise ValueError("Unsupported backup format")
-        nonce = fin.read(12)
-        tag = fin.read(16)
-        cipher = Cipher(algorithms.AES(key), modes.GCM(nonce, tag), backend=default_backend())
-        decryptor = cipher.decryptor()
 
         # Decrypt to a temporary file first; only move into place if tag verifies
         out_dir = os.path.dirname(dst_plain)
         _ensure_dir(out_dir)
         tmp_path = dst_plain + ".tmpdec-" + uuid.uuid4().hex
         try:
-            with open(tmp_path, "wb", buffering=0) as fout:
-                while True:
-                    chunk = fin.read(CHUNK_SIZE)
-                    if not chunk:
-                        break
-                    pt = decryptor.update(chunk)
-                    if pt:
-                        fout.write(pt)
-                # Verify tag before exposing plaintext
-                decryptor.finalize()
+            with open(tmp_path, "wb") as fout:
+                if magic == GCM2_MAGIC:
+                    fin.seek(0)
+                    _decrypt_gcm2_to(fout, fin, key, workers, throttle)
+                else:
+                    _decrypt_gcm1_to(fout, fin, key, throttle)
             # Atomic replace into final location
             os.replace(tmp_path, dst_plain)
         except Exception:
@@ -110,7 +238,7 @@ def _decrypt_backup_file_to(dst_plain: str, enc_path: str, key: bytes) -> None:
             raise
 
 
-def encrypt_backup_and_wipe(device_name: str) -> Tuple[bool, str]:
+def encrypt_backup_and_wipe(device_name: str, control: Optional[JobControl] = None) -> Tuple[bool, str]:
     mounts = _resolve_mounts_cross_platform(device_name)
     if not mounts:
         return False, f"No accessible volumes found for device '{device_name}'."
@@ -126,6 +254,8 @@ def encrypt_backup_and_wipe(device_name: str) -> Tuple[bool, str]:
     deleted_count = 0
 
     try:
+        # Collect work first so progress can be reported as a percentage
+        work: List[Tuple[str, str]] = []
         for root in mounts:
             if _is_system_volume(root):
                 return False, f"Refusing to operate on system volume: {root}"
@@ -145,21 +275,36 @@ def encrypt_backup_and_wipe(device_name: str) -> Tuple[bool, str]:
                     rel = os.path.relpath(src, start=root)
                     # Normalize Windows separators to os.sep for backup tree
                     rel_norm = rel.replace("/", os.sep).replace("\\", os.sep)
-                    dst = os.path.join(backup_dir, mid, rel_norm) + ".enc"
-                    try:
-                        _encrypt_file_to_backup(src, dst, key)
-                        encrypted_count += 1
-                        # Delete original only after encryption succeeds
-                        try:
-                            os.remove(src)
-                            deleted_count += 1
-                        except Exception:
-                            pass
-                    except Exception:
-                        continue
+                    work.append((src, os.path.join(backup_dir, mid, rel_norm) + ".enc"))
+
+        bytes_encrypted = 0
+        for i, (src, dst) in enumerate(work):
+            if control:
+                control.checkpoint()
+            try:
+                size = os.path.getsize(src)
+                _encrypt_file_to_backup(src, dst, key, control.throttle if control else None)
+                encrypted_count += 1
+                bytes_encrypted += size
+                # Delete original only after encryption succeeds
+                try:
+                    os.remove(src)
+                    deleted_count += 1
+                except Exception:
+                    pass
+            except Exception:
+                metrics.errors_total.inc(engine="backup")
+                continue
+            finally:
+                if control:
+                    control.report((i + 1) * 100.0 / len(work), files_total=len(work),
+                                   files_encrypted=encrypted_count, files_deleted=deleted_count,
+                                   bytes=bytes_encrypted)
         if encrypted_count == 0:
             return False, "No files were encrypted."
         return True, f"Encrypted {encrypted_count} files, deleted {deleted_count}. Key saved to: {key_path}"
+    except JobCancelled:
+        raise
     except Exception as e:
         return False, str(e)
 
@@ -181,7 +326,8 @@ def _find_latest_backup_dir(device_name: str) -> Optional[str]:
     return candidates[0][1]
 
 
-def decrypt_and_restore(device_name: str, key_hex: str) -> Tuple[bool, str]:
+def decrypt_and_restore(device_name: str, key_hex: str, control: Optional[JobControl] = None,
+                        workers: int = DECRYPT_WORKERS) -> Tuple[bool, str]:
     backup_dir = _find_latest_backup_dir(device_name)
     if not backup_dir:
         return False, f"No backup found for '{device_name}'."
@@ -207,26 +353,30 @@ def decrypt_and_restore(device_name: str, key_hex: str) -> Tuple[bool, str]:
 
     restored = 0
     errors = 0
-
-    for dirpath, _, filenames in os.walk(backup_dir):
-        for name in filenames:
-            if not name.lower().endswith(".enc"):
-                continue
-            enc_path = os.path.join(dirpath, name)
-            # Reconstruct relative path under backup_dir (strip mount id folder and .enc)
-            rel = os.path.relpath(enc_path, start=backup_dir)
-            parts = rel.split(os.sep)
-            if len(parts) < 2:
-                continue
-            rel_under_mount = os.path.join(*parts[1:])
-            plain_rel = re.sub(r"\.enc$", "", rel_under_mount)
-            dst_plain = os.path.join(target_root, plain_rel)
-            try:
-                _decrypt_backup_file_to(dst_plain, enc_path, key)
-                restored += 1
-            except Exception:
-                errors += 1
-                continue
+    bytes_restored = 0
+
+    enc_files = _list_enc_files(backup_dir)
+    for i, enc_path in enumerate(enc_files):
+        if control:
+            control.checkpoint()
+        # Reconstruct relative path under backup_dir (strip mount id folder and .enc)
+        rel = os.path.relpath(enc_path, start=backup_dir)
+        parts = rel.split(os.sep)
+        if len(parts) < 2:
+            continue
+        rel_under_mount = os.path.join(*parts[1:])
+        plain_rel = re.sub(r"\.enc$", "", rel_under_mount)
+        dst_plain = os.path.join(target_root, plain_rel)
+        try:
+            _decrypt_backup_file_to(dst_plain, enc_path, key, workers, control.throttle if control else None)
+            restored += 1
+            bytes_restored += os.path.getsize(dst_plain)
+        except Exception:
+            metrics.errors_total.inc(engine="restore")
+            errors += 1
+        if control:
+            control.report((i + 1) * 100.0 / len(enc_files), files_total=len(enc_files),
+                           files_restored=restored, files_failed=errors, bytes=bytes_restored)
 
     if restored == 0:
         return False, "No files restored from backup."
@@ -235,3 +385,137 @@ def decrypt_and_restore(device_name: str, key_hex: str) -> Tuple[bool, str]:
         msg += f", {errors} failed"
     return True, msg
 
+
+
+def _read_key_file(backup_dir: str) -> Optional[bytes]:
+    path = os.path.join(backup_dir, "decryption_key.txt")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return bytes.fromhex(f.read().strip())
+    except Exception:
+        return None
+
+
+def _list_enc_files(backup_dir: str) -> List[str]:
+    enc_files: List[str] = []
+    for dirpath, _, filenames in os.walk(backup_dir):
+        for name in filenames:
+            if name.lower().endswith(".enc"):
+                enc_files.append(os.path.join(dirpath, name))
+    return enc_files
+
+
+def _verify_backup_file(enc_path: str, key: bytes) -> int:
+    """Authenticate every byte of an encrypted backup file, discarding plaintext.
+
+    Returns the number of plaintext bytes verified; raises on tag mismatch.
+    """
+    with open(enc_path, "rb") as fin:
+        magic = fin.read(4)
+    if magic == GCM2_MAGIC:
+        total = 0
+        for _, pt in iter_backup_segments(enc_path, key):
+            total += len(pt)
+        return total
+    if magic != b"GCM1":
+        raise ValueError("Unsupported backup format")
+
+    class _Counter:
+        total = 0
+
+        def write(self, data: bytes) -> None:
+            self.total += len(data)
+
+    sink = _Counter()
+    with open(enc_path, "rb") as fin:
+        fin.seek(4)
+        _decrypt_gcm1_to(sink, fin, key)
+    return sink.total
+
+
+def verify_backup(backup_dir: str, key: Optional[bytes] = None, workers: int = VERIFY_WORKERS,
+                  control: Optional[JobControl] = None) -> Dict[str, Any]:
+    """Verify all .enc files under a backup directory without restoring them.
+
+    Uses the key stored alongside the backup when `key` is not given.
+    """
+    if not os.path.isdir(backup_dir):
+        raise ValueError(f"Backup directory not found: {backup_dir}")
+    if key is None:
+        key = _read_key_file(backup_dir)
+        if key is None:
+            raise ValueError("No decryption key given and none stored with the backup.")
+    if len(key) != 32:
+        raise ValueError("Invalid key length; expected 256-bit (32 bytes) key.")
+
+    enc_files = _list_enc_files(backup_dir)
+
+    started = time.monotonic()
+    verified = 0
+    total_bytes = 0
+    bad: List[Dict[str, str]] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(_verify_backup_file, p, key): p for p in enc_files}
+        for i, (future, path) in enumerate(futures.items()):
+            if control and control.cancelled():
+                for f in futures:
+                    f.cancel()
+                control.checkpoint()
+            try:
+                total_bytes += future.result()
+                verified += 1
+            except Exception as e:
+                bad.append({
+                    "path": os.path.relpath(path, start=backup_dir),
+                    "error": str(e) or type(e).__name__,
+                })
+            if control:
+                control.report((i + 1) * 100.0 / len(enc_files), files_verified=verified,
+                               files_failed=len(bad), bytes=total_bytes)
+    elapsed = time.monotonic() - started
+
+    return {
+        "backup": os.path.basename(os.path.normpath(backup_dir)),
+        "files": len(enc_files),
+        "verified": verified,
+        "failed": len(bad),
+        "bad_files": bad,
+        "bytes": total_bytes,
+        "seconds": round(elapsed, 3),
+        "throughput_mb_s": round(total_bytes / (1024 ** 2) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def resolve_backup_dir(device_name: Optional[str] = None, backup_name: Optional[str] = None) -> Optional[str]:
+    """Pick a backup directory by explicit name (under BACKUP_ROOT) or latest for a device."""
+    if backup_name:
+        path = os.path.join(BACKUP_ROOT, os.path.basename(backup_name))
+        return path if os.path.isdir(path) else None
+    if device_name:
+        return _find_latest_backup_dir(device_name)
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Secure backup utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_verify = sub.add_parser("verify", help="Verify backup integrity without restoring")
+    p_verify.add_argument("backup", help="Backup directory path, or a backup name under backups/")
+    p_verify.add_argument("--key", help="Decryption key (hex); defaults to the stored key file")
+    p_verify.add_argument("--workers", type=int, default=VERIFY_WORKERS)
+    args = parser.parse_args(argv)
+
+    backup_dir = args.backup if os.path.isdir(args.backup) else resolve_backup_dir(backup_name=args.backup)
+    if not backup_dir:
+        print(f"Backup not found: {args.backup}")
+        return 2
+    key = bytes.fromhex(args.key.strip()) if args.key else None
+    report = verify_backup(backup_dir, key, workers=args.workers)
+    print(json.dumps(report, indent=2))
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,16 +4,24 @@ import json
 import uuid
 import time
 import mmap
+import random
 import shutil
 import subprocess
 import re
-from typing import List, Tuple, Optional, Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 
+from jobs import JobControl, JobCancelled
+import fast_erase
+import metrics
+import simdevice
+
 
 CHUNK_SIZE = 1024 * 1024  # 1 MiB chunks
+# Job details keep the file count plus only the most recent paths
+REPORTED_FILES = 100
 
 
 def _sanitize_device_name(name: str) -> str:
@@ -176,10 +184,25 @@ def _windows_resolve_mounts(device_name: str) -> List[str]:
 
 
 def _resolve_mounts_cross_platform(device_name: str) -> List[str]:
+    if simdevice.is_sim_path(device_name):
+        return [simdevice.volume_dir(device_name)]
     if sys.platform.startswith("win"):
         return _windows_resolve_mounts(device_name)
-    # TODO: Implement for Linux/macOS (e.g., by mapping from /dev/disk/by-id to mountpoints)
-    return []
+    # POSIX: a directory (mountpoint) is used as-is; a block device maps to the
+    # mountpoints of it and its partitions from /proc/mounts
+    if os.path.isdir(device_name):
+        return [device_name]
+    dev = device_name if device_name.startswith("/dev/") else "/dev/" + device_name
+    mounts: List[str] = []
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0].startswith(dev):
+                    mounts.append(fields[1].replace("\\040", " "))
+    except OSError:
+        pass
+    return mounts
 
 
 def _is_system_volume(path: str) -> bool:
@@ -227,7 +250,8 @@ def _secure_zero(buf: bytearray) -> None:
         pass
 
 
-def _encrypt_overwrite_file(path: str, key_bytes: bytes) -> Tuple[bool, str]:
+def _encrypt_overwrite_file(path: str, key_bytes: bytes,
+                            throttle: Optional[Callable[..., Any]] = None) -> Tuple[bool, str]:
     try:
         # Generate a fresh random nonce per file
         nonce = _random_nonce()
@@ -236,13 +260,20 @@ def _encrypt_overwrite_file(path: str, key_bytes: bytes) -> Tuple[bool, str]:
 
         with open(path, 'rb+', buffering=0) as f:
             while True:
+                start = time.perf_counter()
                 chunk = f.read(CHUNK_SIZE)
                 if not chunk:
                     break
-                ct = encryptor.update(chunk)
+                metrics.record('encrypt_wipe', 'read', start, len(chunk))
+                if throttle:
+                    # Read + write of the same chunk
+                    throttle(2 * len(chunk), 2)
+                with metrics.timed('encrypt_wipe', 'encrypt', len(chunk)):
+                    ct = encryptor.update(chunk)
                 # Move back by len(ct) to overwrite the chunk we just read
                 f.seek(-len(ct), os.SEEK_CUR)
-                f.write(ct)
+                with metrics.timed('encrypt_wipe', 'write', len(ct)):
+                    f.write(ct)
         # Finalize (not strictly necessary for CTR, but keep API consistent)
         encryptor.finalize()
 
@@ -278,42 +309,52 @@ def _windows_resolve_physical_drive(device_name: str) -> Tuple[str, int]:
     return f"\\\\.\\PhysicalDrive{dn}", size
 
 
-def _encrypt_overwrite_physical_device(dev_path: str, total_size: int, key_bytes: bytes) -> Tuple[bool, str]:
+def _encrypt_overwrite_physical_device(dev_path: str, total_size: int, key_bytes: bytes,
+                                       control: Optional[JobControl] = None) -> Tuple[bool, str]:
     """Encrypt and overwrite the entire physical device in-place.
 
-    Requires Administrator privileges on Windows.
+    Requires Administrator privileges on Windows. With a `control`, pause/cancel are
+    honoured between chunks and the processed byte range is reported.
     """
     try:
         nonce = _random_nonce()
         cipher = Cipher(algorithms.AES(key_bytes), modes.CTR(nonce), backend=default_backend())
         encryptor = cipher.encryptor()
 
-        # Try raw open on device
-        fd = os.open(dev_path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
-        try:
+        # Try raw open on device (or a sim:// device)
+        with simdevice.open_device(dev_path, writable=True) as dev:
             offset = 0
             while offset < total_size:
+                if control:
+                    control.report(offset * 100.0 / total_size,
+                                   processed_ranges=[{"offset": 0, "length": offset}])
+                    control.checkpoint()
                 to_read = min(CHUNK_SIZE, total_size - offset)
-                # Move file pointer
-                os.lseek(fd, offset, os.SEEK_SET)
-                chunk = os.read(fd, to_read)
+                start = time.perf_counter()
+                chunk = dev.pread(to_read, offset)
                 if not chunk:
                     break
-                ct = encryptor.update(chunk)
-                os.lseek(fd, offset, os.SEEK_SET)
-                os.write(fd, ct)
+                metrics.record('encrypt_wipe', 'read', start, len(chunk))
+                if control:
+                    control.throttle(2 * len(chunk), 2)
+                with metrics.timed('encrypt_wipe', 'encrypt', len(chunk)):
+                    ct = encryptor.update(chunk)
+                with metrics.timed('encrypt_wipe', 'write', len(ct)):
+                    dev.pwrite(ct, offset)
                 offset += len(chunk)
             encryptor.finalize()
-        finally:
-            os.close(fd)
+            if control:
+                control.report(100.0, processed_ranges=[{"offset": 0, "length": offset}])
         return True, "ok"
+    except JobCancelled:
+        raise
     except PermissionError:
         return False, "Access denied opening raw device. Please run the backend as Administrator."
     except Exception as e:
         return False, str(e)
 
 
-def encrypt_and_wipe(device_name: str) -> Tuple[bool, str]:
+def encrypt_and_wipe(device_name: str, control: Optional[JobControl] = None) -> Tuple[bool, str]:
     """Encrypts and overwrites data on the target device.
 
     Strategy:
@@ -323,6 +364,10 @@ def encrypt_and_wipe(device_name: str) -> Tuple[bool, str]:
     Safety measures:
     - Refuses to operate on the system volume (e.g., C:\\ on Windows or / on POSIX) when doing file-level pass.
     - Raw device encryption requires Administrator privileges and targets the matched disk.
+
+    Pause/cancel via `control` take effect between files (file-level) or chunks (raw device);
+    the files or byte ranges already processed are reported in the job details (while running,
+    only the last REPORTED_FILES files; every file once the job ends).
     """
     mounts = _resolve_mounts_cross_platform(device_name)
 
@@ -331,31 +376,55 @@ def encrypt_and_wipe(device_name: str) -> Tuple[bool, str]:
     try:
         key_bytes = bytes(key)
 
+        if simdevice.is_sim_path(device_name):
+            # A simulated device is encrypted in place as a whole, like the raw-device fallback
+            ok, msg = _encrypt_overwrite_physical_device(device_name, simdevice.device_size(device_name),
+                                                         key_bytes, control)
+            return (True, "Secure Encrypt-and-Wipe completed on simulated device.") if ok else (False, msg)
+
         did_any = False
-        # Pass 1: file-level on volumes
-        for root in mounts:
-            # Avoid C:\ or its Volume GUID counterpart
-            if _is_system_volume(root):
-                return False, f"Refusing to operate on system volume: {root}"
-
-            # Only attempt file walk if it's a directory-like path
-            if os.path.isdir(root):
-                did_any = True
-                for dirpath, dirnames, filenames in os.walk(root, topdown=True, followlinks=False):
-                    base = os.path.basename(dirpath).lower()
-                    if base in {"system volume information", "$recycle.bin", "$recycler"}:
-                        dirnames[:] = []
-                        continue
-
-                    for name in filenames:
-                        file_path = os.path.join(dirpath, name)
-                        try:
-                            if not os.path.isfile(file_path):
-                                continue
-                            _encrypt_overwrite_file(file_path, key_bytes)
-                        except Exception:
+        processed_files: List[str] = []
+        processed_bytes = 0
+        try:
+            # Pass 1: file-level on volumes
+            for root in mounts:
+                # Avoid C:\ or its Volume GUID counterpart
+                if _is_system_volume(root):
+                    return False, f"Refusing to operate on system volume: {root}"
+
+                # Only attempt file walk if it's a directory-like path
+                if os.path.isdir(root):
+                    did_any = True
+                    for dirpath, dirnames, filenames in os.walk(root, topdown=True, followlinks=False):
+                        base = os.path.basename(dirpath).lower()
+                        if base in {"system volume information", "$recycle.bin", "$recycler"}:
+                            dirnames[:] = []
                             continue
 
+                        for name in filenames:
+                            if control:
+                                control.checkpoint()
+                            file_path = os.path.join(dirpath, name)
+                            try:
+                                if not os.path.isfile(file_path):
+                                    continue
+                                size = os.path.getsize(file_path)
+                                ok, _ = _encrypt_overwrite_file(file_path, key_bytes,
+                                                        control.throttle if control else None)
+                                if ok:
+                                    processed_files.append(os.path.relpath(file_path, start=root))
+                                    processed_bytes += size
+                                    if control:
+                                        control.report(files_processed=len(processed_files),
+                                                       processed_files=processed_files[-REPORTED_FILES:],
+                                                       bytes=processed_bytes)
+                            except Exception:
+                                continue
+        finally:
+            if control and processed_files:
+                # Progress only carried the last REPORTED_FILES; the finished job keeps the full list
+                control.report(processed_files=processed_files)
+
         if did_any:
             return True, "Secure Encrypt-and-Wipe completed on accessible volumes."
 
@@ -364,7 +433,7 @@ def encrypt_and_wipe(device_name: str) -> Tuple[bool, str]:
             dev_path, size = _windows_resolve_physical_drive(device_name)
             if not dev_path or size <= 0:
                 return False, f"No mounted or raw device found for '{device_name}'.";
-            ok, msg = _encrypt_overwrite_physical_device(dev_path, size, key_bytes)
+            ok, msg = _encrypt_overwrite_physical_device(dev_path, size, key_bytes, control)
             if ok:
                 return True, "Secure Encrypt-and-Wipe completed on raw device."
             else:
@@ -375,3 +444,114 @@ def encrypt_and_wipe(device_name: str) -> Tuple[bool, str]:
         _secure_zero(key)
         del key
 
+
+
+# -- crypto-erase ---------------------------------------------------------------
+
+CRYPTO_ERASE_CHUNK = 4 * 1024 * 1024
+CRYPTO_ERASE_SAMPLES = 256
+CRYPTO_ERASE_SAMPLE_SIZE = 4096
+
+
+def _keystream_cipher(key: bytearray, nonce: bytes, offset: int):
+    """CTR encryptor positioned at byte `offset` (a multiple of 16) of the keystream."""
+    counter = (int.from_bytes(nonce, "big") + offset // 16) % (1 << 128)
+    return Cipher(algorithms.AES(key), modes.CTR(counter.to_bytes(16, "big")),
+                  backend=default_backend()).encryptor()
+
+
+def _verify_keystream_samples(dev, key: bytearray, nonce: bytes, size: int, samples: int,
+                              sample_size: int = CRYPTO_ERASE_SAMPLE_SIZE) -> Dict[str, Any]:
+    """Read back `samples` stratified random blocks and compare them with the regenerated keystream.
+
+    Must run after fsync and before the key is destroyed. Each block is evicted from
+    the page cache first, so the read reaches the medium rather than the pages just
+    written. A match proves the block was written by this erase; anything else (old
+    data, zeros from a skipped range) is a mismatch.
+    """
+    total_blocks = size // sample_size
+    samples = max(0, min(samples, total_blocks))
+    mismatched: List[int] = []
+    cache_dropped = True
+    started = time.perf_counter()
+    if samples:
+        rng = random.SystemRandom()
+        stratum = total_blocks / samples
+        for i in range(samples):
+            offset = (int(i * stratum) + rng.randrange(max(1, int(stratum)))) * sample_size
+            cache_dropped = dev.drop_cache(offset, sample_size) and cache_dropped
+            start = time.perf_counter()
+            data = dev.pread(sample_size, offset)
+            metrics.record("crypto_erase", "verify_read", start, len(data))
+            expected = _keystream_cipher(key, nonce, offset).update(bytes(len(data)))
+            if data != expected:
+                mismatched.append(offset)
+    return {
+        "outcome": "passed" if samples and not mismatched else ("failed" if mismatched else "not_verified"),
+        "method": "keystream_sample",
+        "samples": samples,
+        "sample_size": sample_size,
+        "mismatched": len(mismatched),
+        "mismatched_offsets": mismatched[:100],
+        # False: the OS could not evict the samples, so they may have been read from cache
+        "cache_dropped": cache_dropped,
+        "seconds": round(time.perf_counter() - started, 3),
+        "files_verified": 0,
+        "files_failed": 0,
+    }
+
+
+def crypto_erase_device(dev_path: str, samples: int = CRYPTO_ERASE_SAMPLES,
+                        control: Optional[JobControl] = None) -> Dict[str, Any]:
+    """Crypto-erase: overwrite the whole device once with AES-256-CTR keystream, then destroy the key.
+
+    Unlike encrypt-and-wipe nothing is read or preserved, so it is one sequential
+    write pass (half the I/O of read-encrypt-write) and needs no follow-up overwrite.
+    A sample of blocks is checked against the keystream before the key is zeroed.
+    """
+    size = simdevice.device_size(dev_path)
+    if size <= 0:
+        raise ValueError(f"Device {dev_path} is empty")
+    key = _random_aes256_key()
+    nonce = _random_nonce()
+    try:
+        # The key is only ever passed as this bytearray, so _secure_zero clears the one copy Python holds
+        encryptor = _keystream_cipher(key, nonce, 0)
+        zeros = bytes(CRYPTO_ERASE_CHUNK)
+        out = bytearray(CRYPTO_ERASE_CHUNK + 15)
+        view = memoryview(out)
+        started = time.perf_counter()
+        # O_EXCL on a block device: refuse to write keystream over a mounted filesystem
+        with simdevice.open_device(dev_path, writable=True, exclusive=fast_erase.is_block_device(dev_path)) as dev:
+            offset = 0
+            while offset < size:
+                if control:
+                    control.report(offset * 100.0 / size, processed_ranges=[{"offset": 0, "length": offset}])
+                    control.checkpoint()
+                n = min(CRYPTO_ERASE_CHUNK, size - offset)
+                with metrics.timed("crypto_erase", "keystream", n):
+                    encryptor.update_into(zeros[:n], out)
+                if control:
+                    control.throttle(n)
+                with metrics.timed("crypto_erase", "write", n):
+                    dev.pwrite(view[:n], offset)
+                offset += n
+            with metrics.timed("crypto_erase", "fsync"):
+                dev.fsync()
+            write_seconds = time.perf_counter() - started
+            verification = _verify_keystream_samples(dev, key, nonce, size, samples)
+        _secure_zero(out)
+        if control:
+            control.report(100.0, processed_ranges=[{"offset": 0, "length": size}])
+        if verification["outcome"] == "failed":
+            metrics.errors_total.inc(engine="crypto_erase")
+        return {
+            "bytes": size,
+            "seconds": round(write_seconds, 3),
+            "throughput_mb_s": round(size / (1024 ** 2) / write_seconds, 2) if write_seconds > 0 else None,
+            "verification": verification,
+            "key_destroyed": True,
+        }
+    finally:
+        _secure_zero(key)
+        del key
@@ -0,0 +1,115 @@
+import argparse
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+from flask import Blueprint, Flask
+
+from app import devices_bp, wipe_bp, decrypt_bp, jobs_bp, wipe_method_bp, login_bp
+from pendrive_wipe_app import pendrive_bp
+from boom_wipe_app import boom_bp
+from cart import cart_bp
+from job_store import job_store
+from reports import reports_bp
+from metrics import metrics_bp
+from simdevice import sim_bp
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+GATEWAY_PORT = 9758
+GATEWAY_THREADS = 16
+# The frontend loads reports from localhost:5000, so the gateway also listens there
+GATEWAY_ALIAS_PORTS = [5000]
+
+# (blueprint, url_prefix) on the single gateway listener. The pendrive and boom
+# services share route names (/wipe-status, /get_wipe_method, /devices) with other
+# APIs, so they are mounted under a prefix.
+GATEWAY_MOUNTS: List[Tuple[Blueprint, Optional[str]]] = [
+    (devices_bp, None),
+    (wipe_bp, None),
+    (decrypt_bp, None),
+    (jobs_bp, None),
+    (wipe_method_bp, None),
+    (login_bp, None),
+    (cart_bp, None),
+    (reports_bp, None),
+    (metrics_bp, None),
+    (sim_bp, None),
+    (pendrive_bp, "/pendrive"),
+    (boom_bp, "/boom"),
+]
+
+# Historical one-service-per-port layout, kept for clients with hard-coded ports
+LEGACY_PORTS: List[Tuple[str, str, int, List[Blueprint]]] = [
+    ("devices_api", "0.0.0.0", 9758, [devices_bp, reports_bp, metrics_bp, sim_bp]),
+    ("wipe_api", "0.0.0.0", 6539, [wipe_bp, jobs_bp]),
+    ("decrypt_api", "0.0.0.0", 9579, [decrypt_bp, jobs_bp]),
+    ("wipe_method_api", "127.0.0.1", 8743, [wipe_method_bp]),
+    ("login_storage_api", "127.0.0.1", 9574, [login_bp]),
+    ("pendrive_wipe", "0.0.0.0", 8744, [pendrive_bp]),
+    ("boom_wipe", "0.0.0.0", 5695, [boom_bp]),
+    ("cart", "0.0.0.0", 9684, [cart_bp]),
+    ("reports_api", "0.0.0.0", 5000, [reports_bp]),
+]
+
+
+def create_app() -> Flask:
+    """Single WSGI app with every API mounted as a blueprint."""
+    app = Flask("securewipe_gateway")
+    for bp, prefix in GATEWAY_MOUNTS:
+        app.register_blueprint(bp, url_prefix=prefix)
+    return app
+
+
+def create_legacy_app(name: str, blueprints: List[Blueprint]) -> Flask:
+    app = Flask(name)
+    for bp in blueprints:
+        app.register_blueprint(bp)
+    return app
+
+
+def _serve(app: Flask, host: str, port: int, threads: int, alias_ports: Optional[List[int]] = None) -> None:
+    ports = [port] + [p for p in alias_ports or [] if p != port]
+    try:
+        from waitress import serve
+    except ImportError:
+        logger.warning("waitress is not installed; falling back to the Flask development server")
+        for extra in ports[1:]:
+            threading.Thread(target=app.run, kwargs={"host": host, "port": extra, "threaded": True,
+                                                     "use_reloader": False}, daemon=True).start()
+        app.run(host=host, port=port, threaded=True, use_reloader=False)
+        return
+    serve(app, listen=" ".join(f"{host}:{p}" for p in ports), threads=threads, ident="securewipe")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="SecureWiping API gateway")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=GATEWAY_PORT)
+    parser.add_argument("--threads", type=int, default=GATEWAY_THREADS, help="WSGI worker threads per listener")
+    parser.add_argument("--alias-port", type=int, action="append", dest="alias_ports",
+                        help="Extra port for the gateway (default: 5000, used by the frontend for reports)")
+    parser.add_argument("--legacy-ports", action="store_true",
+                        help="Serve each API on its historical port instead of one gateway listener")
+    args = parser.parse_args(argv)
+    job_store.open()
+
+    if not args.legacy_ports:
+        alias_ports = GATEWAY_ALIAS_PORTS if args.alias_ports is None else args.alias_ports
+        logger.info(f"Starting SecureWiping gateway on {args.host}:{args.port} (also on {alias_ports})")
+        _serve(create_app(), args.host, args.port, args.threads, alias_ports)
+        return
+
+    # Compatibility mode: one process and shared state, but the old port layout
+    listeners = [(create_legacy_app(name, bps), host, port) for name, host, port, bps in LEGACY_PORTS]
+    for app, host, port in listeners[1:]:
+        logger.info(f"Starting {app.name} on {host}:{port}")
+        threading.Thread(target=_serve, args=(app, host, port, args.threads), daemon=True).start()
+    app, host, port = listeners[0]
+    logger.info(f"Starting {app.name} on {host}:{port}")
+    _serve(app, host, port, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,497 @@
+import ctypes
+import errno
+import mmap
+import os
+import random
+import re
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from flask import Blueprint, jsonify, request
+
+# Simulated devices are addressed as sim://<name> wherever a device path is accepted
+SIM_PREFIX = "sim://"
+SIM_DIR = os.environ.get("SECUREWIPE_SIM_DIR",
+                         os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sim"))
+BACKENDS = ("sparse", "mmap", "memory")
+
+# Defaults model a typical USB pendrive; every value can be overridden per device
+DEFAULT_BACKEND = os.environ.get("SECUREWIPE_SIM_BACKEND", "sparse")
+DEFAULT_SIZE_MB = int(os.environ.get("SECUREWIPE_SIM_SIZE_MB", "256"))
+DEFAULT_LATENCY_MS = float(os.environ.get("SECUREWIPE_SIM_LATENCY_MS", "0.5"))
+DEFAULT_WRITE_MBPS = float(os.environ.get("SECUREWIPE_SIM_WRITE_MBPS", "25"))
+DEFAULT_READ_MBPS = float(os.environ.get("SECUREWIPE_SIM_READ_MBPS", "80"))
+DEFAULT_FLUSH_MS = float(os.environ.get("SECUREWIPE_SIM_FLUSH_MS", "5"))
+DEFAULT_JITTER = float(os.environ.get("SECUREWIPE_SIM_JITTER", "0.1"))
+DEFAULT_SEED = int(os.environ.get("SECUREWIPE_SIM_SEED", "0"))
+# In-memory devices live in the service's address space: this bounds all of them together
+MAX_MEMORY_MB = int(os.environ.get("SECUREWIPE_SIM_MAX_MEMORY_MB", "1024"))
+
+MB = 1024 * 1024
+# fallocate(2) flags for deallocating a range of the sparse image (Linux)
+_FALLOC_FL_KEEP_SIZE = 0x01
+_FALLOC_FL_PUNCH_HOLE = 0x02
+_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+class SimDeviceBusy(Exception):
+    """The simulated device is in use by a job and cannot be removed."""
+
+
+# Callables returning the job that currently uses a sim:// path, or None (see register_busy_check)
+_busy_checks: List[Callable[[str], Optional[str]]] = []
+
+
+def register_busy_check(check: Callable[[str], Optional[str]]) -> None:
+    """Let the I/O scheduler veto removal of a device one of its jobs owns, without an import cycle."""
+    _busy_checks.append(check)
+
+
+def is_sim_path(path: Any) -> bool:
+    return isinstance(path, str) and path.startswith(SIM_PREFIX)
+
+
+def sim_name(device_name: str) -> str:
+    """Device name usable for a simulated device, e.g. 'HP v220w (14.9GB)' -> 'hp-v220w-14.9gb'."""
+    if is_sim_path(device_name):
+        device_name = device_name[len(SIM_PREFIX):]
+    name = re.sub(r"[^a-z0-9_.]+", "-", (device_name or "").lower()).strip("-.")
+    return name[:64] or "demo"
+
+
+class DeviceModel:
+    """Service-time model: each request costs latency + bytes / bandwidth, a flush costs flush_ms.
+
+    Requests are served one at a time like a single-queue USB device, so
+    concurrent writers queue behind each other instead of overlapping. Jitter
+    comes from a seeded RNG, so a workload always accrues the same simulated time.
+    A bandwidth of 0 means unlimited.
+    """
+
+    def __init__(self, latency_ms: float = DEFAULT_LATENCY_MS, write_mb_s: float = DEFAULT_WRITE_MBPS,
+                 read_mb_s: float = DEFAULT_READ_MBPS, flush_ms: float = DEFAULT_FLUSH_MS,
+                 jitter: float = DEFAULT_JITTER, seed: int = DEFAULT_SEED):
+        for label, value in (("latency_ms", latency_ms), ("write_mb_s", write_mb_s), ("read_mb_s", read_mb_s),
+                             ("flush_ms", flush_ms), ("jitter", jitter)):
+            if value < 0:
+                raise ValueError(f"{label} must be >= 0")
+        self.latency_ms = float(latency_ms)
+        self.write_mb_s = float(write_mb_s)
+        self.read_mb_s = float(read_mb_s)
+        self.flush_ms = float(flush_ms)
+        self.jitter = min(float(jitter), 1.0)
+        self.seed = int(seed)
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._busy_until = 0.0
+        self.simulated_seconds = 0.0
+
+    def cost(self, op: str, nbytes: int) -> float:
+        if op == "flush":
+            return self.flush_ms / 1000
+        if op == "discard":
+            # Unmapping is a metadata update on the device, independent of the range size
+            return (self.latency_ms + self.flush_ms) / 1000
+        rate = self.write_mb_s if op == "write" else self.read_mb_s
+        return self.latency_ms / 1000 + (nbytes / (rate * MB) if rate > 0 else 0.0)
+
+    def wait(self, op: str, nbytes: int = 0) -> None:
+        """Block the caller until the simulated device has served this request."""
+        with self._lock:
+            cost = self.cost(op, nbytes)
+            if self.jitter:
+                cost *= 1 + self.jitter * (2 * self._rng.random() - 1)
+            now = time.monotonic()
+            self._busy_until = max(now, self._busy_until) + cost
+            self.simulated_seconds += cost
+            done = self._busy_until
+        delay = done - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"latency_ms": self.latency_ms, "write_mb_s": self.write_mb_s, "read_mb_s": self.read_mb_s,
+                "flush_ms": self.flush_ms, "jitter": self.jitter, "seed": self.seed}
+
+
+class SimulatedDevice:
+    """Block device backed by a sparse file, an mmap'd sparse file or process memory.
+
+    Offers the positional I/O interface engines use for raw devices
+    (pread/readinto/pwrite/fsync) with every request timed by a DeviceModel. A
+    directory next to the image serves as the device's volume for file-level engines.
+    """
+
+    def __init__(self, name: str, size: int, backend: str = DEFAULT_BACKEND,
+                 model: Optional[DeviceModel] = None, directory: str = SIM_DIR):
+        if not _NAME_RE.match(name or ""):
+            raise ValueError(f"Invalid simulated device name: {name!r}")
+        if backend not in BACKENDS:
+            raise ValueError(f"backend must be one of: {', '.join(BACKENDS)}")
+        if size <= 0:
+            raise ValueError("size must be positive")
+        if backend == "memory" and size > MAX_MEMORY_MB * MB:
+            raise ValueError(f"In-memory devices are limited to {MAX_MEMORY_MB} MiB")
+        self.name = name
+        self.size = int(size)
+        self.backend = backend
+        self.model = model or DeviceModel()
+        self.image_path = None if backend == "memory" else os.path.join(directory, name + ".img")
+        self.volume_path = os.path.join(directory, name + ".vol")
+        self.created_at = time.time()
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.ops = 0
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._buf: Optional[Union[bytearray, mmap.mmap]] = None
+        os.makedirs(directory, exist_ok=True)
+        if backend == "memory":
+            self._buf = bytearray(self.size)
+        else:
+            self._fd = os.open(self.image_path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o600)
+            # Extending with ftruncate allocates nothing: unwritten ranges read back as zeros
+            os.ftruncate(self._fd, self.size)
+            if backend == "mmap":
+                self._buf = mmap.mmap(self._fd, self.size)
+
+    @property
+    def path(self) -> str:
+        return SIM_PREFIX + self.name
+
+    def _clamp(self, offset: int, length: int) -> int:
+        if offset < 0:
+            raise ValueError("negative offset")
+        return max(0, min(length, self.size - offset))
+
+    def _count(self, read: int = 0, written: int = 0) -> None:
+        with self._lock:
+            self.bytes_read += read
+            self.bytes_written += written
+            self.ops += 1
+
+    def pread(self, length: int, offset: int) -> bytes:
+        length = self._clamp(offset, length)
+        self.model.wait("read", length)
+        if self._buf is not None:
+            data = bytes(self._buf[offset:offset + length])
+        else:
+            data = os.pread(self._fd, length, offset)
+        self._count(read=len(data))
+        return data
+
+    def readinto(self, view: memoryview, offset: int) -> int:
+        length = self._clamp(offset, len(view))
+        self.model.wait("read", length)
+        if self._buf is not None:
+            view[:length] = self._buf[offset:offset + length]
+        else:
+            length = os.preadv(self._fd, [view[:length]], offset)
+        self._count(read=length)
+        return length
+
+    def pwrite(self, data: bytes, offset: int) -> int:
+        if offset < 0 or offset + len(data) > self.size:
+            raise OSError(errno.ENOSPC, f"Write beyond the end of simulated device {self.name}")
+        self.model.wait("write", len(data))
+        if self._buf is not None:
+            self._buf[offset:offset + len(data)] = data
+        else:
+            os.pwrite(self._fd, data, offset)
+        self._count(written=len(data))
+        return len(data)
+
+    def discard(self, offset: int, length: int) -> None:
+        """Unmap a range (like BLKDISCARD + BLKZEROOUT): it reads back as zeros afterwards."""
+        length = self._clamp(offset, length)
+        self.model.wait("discard", length)
+        if self._buf is not None:
+            for start in range(offset, offset + length, 4 * MB):
+                n = min(4 * MB, offset + length - start)
+                self._buf[start:start + n] = bytes(n)
+        elif not _punch_hole(self._fd, offset, length):
+            zeros = bytes(4 * MB)
+            for start in range(offset, offset + length, 4 * MB):
+                os.pwrite(self._fd, zeros[:min(4 * MB, offset + length - start)], start)
+        self._count()
+
+    def fsync(self) -> None:
+        self.model.wait("flush")
+        # The model accounts for the flush; mmap/sparse backends are not forced to disk so
+        # simulated figures do not depend on the host's storage
+        self._count()
+
+    def drop_cache(self, offset: int, length: int) -> bool:
+        # Reads come from the backing store, which is the simulated medium itself
+        return True
+
+    def volume(self) -> str:
+        """Directory used as this device's mounted volume by file-level engines."""
+        os.makedirs(self.volume_path, exist_ok=True)
+        return self.volume_path
+
+    def close(self, remove: bool = False) -> None:
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._buf = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if remove:
+            if self.image_path and os.path.exists(self.image_path):
+                os.remove(self.image_path)
+            shutil.rmtree(self.volume_path, ignore_errors=True)
+
+    # Engines use `with open_device(path) as dev:`; the registry owns the device's lifetime
+    def __enter__(self) -> "SimulatedDevice":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        simulated = self.model.simulated_seconds
+        moved = self.bytes_read + self.bytes_written
+        allocated = None
+        if self.image_path and os.path.exists(self.image_path) and hasattr(os, "stat"):
+            st = os.stat(self.image_path)
+            allocated = st.st_blocks * 512 if hasattr(st, "st_blocks") else None
+        return {
+            "name": self.name,
+            "path": self.path,
+            "backend": self.backend,
+            "size_bytes": self.size,
+            "allocated_bytes": allocated,
+            "image_path": self.image_path,
+            "volume_path": self.volume_path,
+            "model": self.model.to_dict(),
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "ops": self.ops,
+            "simulated_seconds": round(simulated, 4),
+            "simulated_mb_s": round(moved / MB / simulated, 2) if simulated > 0 else None,
+            "created_at": self.created_at,
+        }
+
+
+def _punch_hole(fd: int, offset: int, length: int) -> bool:
+    """Deallocate a range of a sparse file; False where fallocate hole punching is unavailable."""
+    try:
+        fallocate = ctypes.CDLL(None, use_errno=True).fallocate
+    except (OSError, AttributeError, TypeError):
+        return False
+    fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong]
+    return fallocate(fd, _FALLOC_FL_KEEP_SIZE | _FALLOC_FL_PUNCH_HOLE, offset, length) == 0
+
+
+class FileDevice:
+    """The same positional interface over a real block device or image file.
+
+    With exclusive=True a block device is opened with O_EXCL, which fails (EBUSY)
+    while it is mounted or otherwise claimed; use it for block devices only.
+    """
+
+    def __init__(self, path: str, writable: bool = False, exclusive: bool = False):
+        self.path = path
+        flags = (os.O_RDWR if writable else os.O_RDONLY) | getattr(os, "O_BINARY", 0)
+        if exclusive:
+            flags |= os.O_EXCL
+        self._fd = os.open(path, flags)
+        self.size = os.lseek(self._fd, 0, os.SEEK_END)
+        # Without pread/pwrite (Windows) seek+read/write must not interleave across threads
+        self._lock = threading.Lock()
+
+    def pread(self, length: int, offset: int) -> bytes:
+        if hasattr(os, "pread"):
+            return os.pread(self._fd, length, offset)
+        with self._lock:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            return os.read(self._fd, length)
+
+    def readinto(self, view: memoryview, offset: int) -> int:
+        if hasattr(os, "preadv"):
+            return os.preadv(self._fd, [view], offset)
+        data = self.pread(len(view), offset)
+        view[:len(data)] = data
+        return len(data)
+
+    def pwrite(self, data: bytes, offset: int) -> int:
+        if hasattr(os, "pwrite"):
+            return os.pwrite(self._fd, data, offset)
+        with self._lock:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            return os.write(self._fd, data)
+
+    def fsync(self) -> None:
+        os.fsync(self._fd)
+
+    def drop_cache(self, offset: int, length: int) -> bool:
+        """Evict [offset, offset + length) from the host page cache so the next read hits the medium.
+
+        Only clean pages are dropped, so fsync first. False where the OS cannot do it.
+        """
+        if not hasattr(os, "posix_fadvise"):
+            return False
+        os.posix_fadvise(self._fd, offset, length, os.POSIX_FADV_DONTNEED)
+        return True
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "FileDevice":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def _key(path_or_name: str) -> str:
+    name = path_or_name[len(SIM_PREFIX):] if is_sim_path(path_or_name) else path_or_name
+    return name if _NAME_RE.match(name) else sim_name(name)
+
+
+class SimDeviceRegistry:
+    """Simulated devices of this process by name; sim://<name> paths resolve here."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._devices: Dict[str, SimulatedDevice] = {}
+
+    def create(self, name: str, size: Optional[int] = None, backend: Optional[str] = None,
+               directory: str = SIM_DIR, **model: Any) -> SimulatedDevice:
+        with self._lock:
+            if name in self._devices:
+                raise ValueError(f"Simulated device '{name}' already exists")
+            self._check_memory(size or DEFAULT_SIZE_MB * MB, backend or DEFAULT_BACKEND)
+            device = SimulatedDevice(name, size or DEFAULT_SIZE_MB * MB, backend or DEFAULT_BACKEND,
+                                     DeviceModel(**model), directory)
+            self._devices[name] = device
+            return device
+
+    def _check_memory(self, size: int, backend: str) -> None:
+        # Caller holds self._lock
+        if backend != "memory":
+            return
+        used = sum(d.size for d in self._devices.values() if d.backend == "memory")
+        if used + size > MAX_MEMORY_MB * MB:
+            raise ValueError(f"In-memory devices are limited to {MAX_MEMORY_MB} MiB in total "
+                             f"({used // MB} MiB in use)")
+
+    def get(self, path_or_name: str) -> Optional[SimulatedDevice]:
+        with self._lock:
+            return self._devices.get(_key(path_or_name))
+
+    def ensure(self, path_or_name: str) -> SimulatedDevice:
+        """Existing device, or a new one with the default size, backend and model."""
+        name = _key(path_or_name)
+        with self._lock:
+            device = self._devices.get(name)
+            if device is None:
+                self._check_memory(DEFAULT_SIZE_MB * MB, DEFAULT_BACKEND)
+                device = self._devices[name] = SimulatedDevice(
+                    name, DEFAULT_SIZE_MB * MB, DEFAULT_BACKEND, DeviceModel())
+            return device
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            """Close and delete a device; raises SimDeviceBusy while a job owns it."""
+        key = _key(name)
+        for check in _busy_checks:
+            owner = check(SIM_PREFIX + key)
+            if owner:
+                raise SimDeviceBusy(f"{SIM_PREFIX}{key} is in use by job {owner}")
+        with self._lock:
+            device = self._devices.pop(key, None)
+        if device is None:
+            return False
+        device.close(remove=True)
+        return True
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            devices = list(self._devices.values())
+        return [d.stats() for d in devices]
+
+    def by_volume(self, path: str) -> Optional[SimulatedDevice]:
+        """The device whose volume directory is, or contains, `path`."""
+        real = os.path.realpath(path)
+        with self._lock:
+            devices = list(self._devices.values())
+        for device in devices:
+            volume = os.path.realpath(device.volume_path)
+            if real == volume or real.startswith(volume + os.sep):
+                return device
+        return None
+
+
+sim_devices = SimDeviceRegistry()
+
+
+def open_device(path: str, writable: bool = False, exclusive: bool = False) -> Union[SimulatedDevice, FileDevice]:
+    """Positional I/O handle for a sim:// path, block device or image file; use as a context manager."""
+    if is_sim_path(path):
+        return sim_devices.ensure(path)
+    return FileDevice(path, writable, exclusive)
+
+
+def device_size(path: str) -> int:
+    with open_device(path) as dev:
+        return dev.size
+
+
+def volume_dir(path: str) -> str:
+    return sim_devices.ensure(path).volume()
+
+
+def sim_path(path_or_name: str) -> str:
+    """Canonical sim://<name> for a simulated device path or name."""
+    return SIM_PREFIX + _key(path_or_name)
+
+
+def volume_device(path: str) -> Optional[str]:
+    """sim://<name> of the simulated device whose volume holds `path`, or None."""
+    device = sim_devices.by_volume(path)
+    return device.path if device else None
+
+
+sim_bp = Blueprint("sim_devices", __name__)
+
+
+@sim_bp.get("/api/sim-devices")
+def list_sim_devices():
+    return jsonify({"status": "success", "devices": sim_devices.list()}), 200
+
+
+@sim_bp.post("/api/sim-devices")
+def create_sim_device():
+    data = request.get_json(silent=True) or {}
+    name = _key(str(data.get("name") or "demo"))
+    if sim_devices.get(name) is not None:
+        return jsonify({"status": "error", "message": f"Simulated device '{name}' already exists"}), 409
+    try:
+        size_mb = float(data.get("size_mb", DEFAULT_SIZE_MB))
+        model = {key: float(data[key]) for key in ("latency_ms", "write_mb_s", "read_mb_s", "flush_ms", "jitter")
+                 if data.get(key) is not None}
+        if data.get("seed") is not None:
+            model["seed"] = int(data["seed"])
+        device = sim_devices.create(name, int(size_mb * MB), data.get("backend"), **model)
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except OSError as e:
+        return jsonify({"status": "error", "message": f"Could not create device: {e}"}), 500
+    return jsonify({"status": "success", "device": device.stats()}), 201
+
+
+@sim_bp.delete("/api/sim-devices/<name>")
+def delete_sim_device(name):
+    try:
+        removed = sim_devices.remove(name)
+    except SimDeviceBusy as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+    if not removed:
+        return jsonify({"status": "error", "message": "Simulated device not found"}), 404
+    return jsonify({"status": "success", "message": f"Removed {SIM_PREFIX}{_key(name)}"}), 200
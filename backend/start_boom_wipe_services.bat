@@ -1,18 +1,13 @@
 @echo off
-echo Starting Boom Wipe Services...
+echo Starting SecureWiping API gateway (compatibility ports)...
 
 echo.
-echo Starting Main Boom Wipe Service (Port 5695)...
-start "Boom Wipe Service" python boom_wipe_app.py
-
-echo.
-echo Starting Pendrive Boom Wipe Service (Port 8743)...
-start "Pendrive Wipe Service" python pendrive_wipe_app.py
-
-echo.
-echo Both services are starting...
+echo All APIs run in one process, including:
 echo Main Boom Wipe Service: http://localhost:5695
-echo Pendrive Wipe Service: http://localhost:8743
+echo Pendrive Wipe Service: http://localhost:8744
+echo Wipe method selector:  http://localhost:8743
+start "SecureWiping Gateway" python server.py --legacy-ports
+
 echo.
 echo Press any key to continue...
 pause >nul
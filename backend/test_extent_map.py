@@ -0,0 +1,229 @@
+import struct
+
+import pytest
+
+from extent_map import allocation_map, priority_plan
+
+SECTOR = 512
+MB = 1024 * 1024
+HEAD = 2 * MB  # the builders only write the start of an image; the rest stays sparse
+FILE_SIZES = {"BIG": 6 * SECTOR - 100, "INNER": 1000, "SMALL": 100}
+PARTITIONS = ((2048, 16384), (18432, 4096))  # (first LBA, sectors): a FAT16 volume, then an unknown one
+DISK_SECTORS = 24576
+
+
+def _write_image(tmp_path, buf, size):
+    path = tmp_path / "disk.img"
+    with open(path, "wb") as f:
+        f.write(buf)
+        f.truncate(size)
+    return str(path)
+
+
+def _dir_entry(buf, pos, name, attr, cluster, size=0):
+    buf[pos:pos + 11] = name.ljust(11).encode()
+    buf[pos + 11] = attr
+    struct.pack_into("<H", buf, pos + 20, cluster >> 16)
+    struct.pack_into("<HI", buf, pos + 26, cluster & 0xFFFF, size)
+
+
+def _fat_volume(buf, base, total_sectors, fat32=False):
+    """FAT16/FAT32 volume with one-sector clusters at `base`; returns the byte offset of cluster 2.
+
+    Root: BIG (clusters 10-13, 20-21), SMALL (5), a deleted entry and DIR (30) holding INNER
+    (31-32). Cluster 40 is allocated but belongs to no file; FAT32 keeps its root in cluster 2.
+    """
+    reserved, root_entries, width = (32, 0, 4) if fat32 else (1, 512, 2)
+    fat_sectors = (total_sectors * width + SECTOR - 1) // SECTOR
+    buf[base] = 0xEB
+    struct.pack_into("<HBHBHHBH", buf, base + 11, SECTOR, 1, reserved, 2, root_entries, 0, 0xF8,
+                     0 if fat32 else fat_sectors)
+    struct.pack_into("<II", buf, base + 32, total_sectors, fat_sectors if fat32 else 0)
+    buf[base + 510:base + 512] = b"\x55\xaa"
+    fat = base + reserved * SECTOR
+    root = fat + 2 * fat_sectors * SECTOR
+    data = root + root_entries * 32
+    eoc = 0x0FFFFFFF if fat32 else 0xFFFF
+
+    def chain(*clusters):
+        for c, following in zip(clusters, clusters[1:] + (eoc,)):
+            struct.pack_into("<I" if fat32 else "<H", buf, fat + c * width, following)
+        return clusters[0]
+
+    if fat32:
+        struct.pack_into("<I", buf, base + 44, chain(2))
+        root = data
+    _dir_entry(buf, root, "BIG", 0x20, chain(10, 11, 12, 13, 20, 21), FILE_SIZES["BIG"])
+    _dir_entry(buf, root + 32, "SMALL", 0x20, chain(5), FILE_SIZES["SMALL"])
+    _dir_entry(buf, root + 64, "GONE", 0x20, 50, 4096)
+    buf[root + 64] = 0xE5
+    _dir_entry(buf, root + 96, "DIR", 0x10, chain(30))
+    _dir_entry(buf, data + 28 * SECTOR, ".", 0x10, 30)
+    _dir_entry(buf, data + 28 * SECTOR + 32, "INNER", 0x20, chain(31, 32), FILE_SIZES["INNER"])
+    chain(40)
+    return data
+
+
+def _clusters(data, first, count=1, cluster_size=SECTOR):
+    return data + (first - 2) * cluster_size, count * cluster_size
+
+
+def _expected_files(data):
+    return sorted([(FILE_SIZES["BIG"], [_clusters(data, 10, 4), _clusters(data, 20, 2)]),
+                   (FILE_SIZES["SMALL"], [_clusters(data, 5)]),
+                   (FILE_SIZES["INNER"], [_clusters(data, 31, 2)])])
+
+
+def _expected_data(data):
+    return [_clusters(data, 5), _clusters(data, 10, 4), _clusters(data, 20, 2), _clusters(data, 31, 2),
+            _clusters(data, 40)]
+
+
+def _fat_image(tmp_path, fat32=False):
+    total_sectors = 70000 if fat32 else 16384  # 68874 / 16223 clusters
+    buf = bytearray(HEAD)
+    data = _fat_volume(buf, 0, total_sectors, fat32)
+    return _write_image(tmp_path, buf, total_sectors * SECTOR), data
+
+
+def _exfat_image(tmp_path):
+    """4 MiB exFAT with 4 KiB clusters: bitmap in cluster 2, root in 4, clusters 6-8 and 20 in use."""
+    cs, heap = 4096, 64 * SECTOR
+    buf = bytearray(HEAD)
+    buf[3:11] = b"EXFAT   "
+    struct.pack_into("<IIIII", buf, 80, 24, 8, 64, 1016, 4)
+    buf[108], buf[109] = 9, 3
+    buf[510:512] = b"\x55\xaa"
+    for c in (2, 4):
+        struct.pack_into("<I", buf, 24 * SECTOR + c * 4, 0xFFFFFFFF)
+    root = heap + 2 * cs
+    buf[root] = 0x81
+    struct.pack_into("<IQ", buf, root + 20, 2, 127)
+    for c in (2, 4, 6, 7, 8, 20):
+        buf[heap + (c - 2) // 8] |= 1 << (c - 2) % 8
+    return _write_image(tmp_path, buf, 4 * MB)
+
+
+def _gpt_image(tmp_path):
+    buf = bytearray(HEAD)
+    buf[446 + 4] = 0xEE
+    buf[510:512] = b"\x55\xaa"
+    buf[512:520] = b"EFI PART"
+    struct.pack_into("<QQ", buf, 512 + 40, 34, DISK_SECTORS - 34)
+    struct.pack_into("<QII", buf, 512 + 72, 2, 128, 128)
+    for i, (first, count) in enumerate(PARTITIONS):
+        entry = 2 * SECTOR + i * 128
+        buf[entry:entry + 16] = bytes(range(1, 17))
+        struct.pack_into("<QQ", buf, entry + 32, first, first + count - 1)
+    data = _fat_volume(buf, PARTITIONS[0][0] * SECTOR, PARTITIONS[0][1])
+    return _write_image(tmp_path, buf, DISK_SECTORS * SECTOR), data
+
+
+def _mbr_image(tmp_path):
+    buf = bytearray(HEAD)
+    for i, ((first, count), ptype) in enumerate(zip(PARTITIONS, (0x06, 0x83))):
+        buf[446 + i * 16 + 4] = ptype
+        struct.pack_into("<II", buf, 446 + i * 16 + 8, first, count)
+    buf[510:512] = b"\x55\xaa"
+    data = _fat_volume(buf, PARTITIONS[0][0] * SECTOR, PARTITIONS[0][1])
+    return _write_image(tmp_path, buf, DISK_SECTORS * SECTOR), data
+
+
+IMAGES = {
+    "fat16": lambda tmp_path: _fat_image(tmp_path)[0],
+    "fat32": lambda tmp_path: _fat_image(tmp_path, fat32=True)[0],
+    "exfat": _exfat_image,
+    "gpt": lambda tmp_path: _gpt_image(tmp_path)[0],
+    "mbr": lambda tmp_path: _mbr_image(tmp_path)[0],
+}
+
+
+def test_fat16_allocation(tmp_path):
+    path, data = _fat_image(tmp_path)
+    allocation = allocation_map(path)
+    assert allocation["source"] == "fat16"
+    assert allocation["metadata"] == [(0, data), _clusters(data, 30)]
+    assert allocation["data"] == _expected_data(data)
+    assert sorted(allocation["files"]) == _expected_files(data)
+    assert allocation["tables"] == [] and allocation["partitions"] == []
+    assert allocation["allocated_bytes"] == data + 11 * SECTOR
+
+
+def test_fat32_allocation(tmp_path):
+    path, data = _fat_image(tmp_path, fat32=True)
+    allocation = allocation_map(path)
+    assert allocation["source"] == "fat32"
+    assert allocation["metadata"] == [(0, data + SECTOR), _clusters(data, 30)]
+    assert allocation["data"] == _expected_data(data)
+    assert sorted(allocation["files"]) == _expected_files(data)
+
+
+def test_exfat_allocation(tmp_path):
+    allocation = allocation_map(_exfat_image(tmp_path))
+    heap, cs = 64 * SECTOR, 4096
+    assert allocation["source"] == "exfat"
+    assert allocation["metadata"] == [(0, heap + cs), _clusters(heap, 4, cluster_size=cs)]
+    assert allocation["data"] == [_clusters(heap, 6, 3, cs), _clusters(heap, 20, cluster_size=cs)]
+    assert allocation["files"] == []
+
+
+def test_gpt_partitions(tmp_path):
+    path, data = _gpt_image(tmp_path)
+    allocation = allocation_map(path)
+    size = DISK_SECTORS * SECTOR
+    unknown = (PARTITIONS[1][0] * SECTOR, PARTITIONS[1][1] * SECTOR)
+    assert allocation["source"] == "gpt"
+    assert allocation["tables"] == [(0, 34 * SECTOR), (size - 33 * SECTOR, 33 * SECTOR)]
+    assert allocation["partitions"] == [
+        {"offset": PARTITIONS[0][0] * SECTOR, "length": PARTITIONS[0][1] * SECTOR, "source": "fat16"},
+        {"offset": unknown[0], "length": unknown[1], "source": "unknown"},
+    ]
+    assert allocation["metadata"] == allocation["tables"][:1] + [(MB, data - MB), _clusters(data, 30)] \
+        + allocation["tables"][1:]
+    assert allocation["data"] == _expected_data(data) + [unknown]
+    assert sorted(allocation["files"]) == _expected_files(data)
+
+
+def test_mbr_partitions(tmp_path):
+    path, data = _mbr_image(tmp_path)
+    allocation = allocation_map(path)
+    assert allocation["source"] == "mbr"
+    assert allocation["tables"] == [(0, MB)]
+    assert [p["source"] for p in allocation["partitions"]] == ["fat16", "unknown"]
+    assert allocation["metadata"] == [(0, data), _clusters(data, 30)]
+    assert allocation["data"] == _expected_data(data) + [(PARTITIONS[1][0] * SECTOR, PARTITIONS[1][1] * SECTOR)]
+
+
+def _assert_disjoint(extents):
+    extents = sorted(extents)
+    for (offset, length), (following, _) in zip(extents, extents[1:]):
+        assert length > 0 and offset + length <= following
+
+
+@pytest.mark.parametrize("kind", sorted(IMAGES))
+def test_priority_plan_covers_every_byte_once(tmp_path, kind):
+    allocation = allocation_map(IMAGES[kind](tmp_path))
+    plan = priority_plan(allocation)
+    extents = sorted(extent for _, extent in plan)
+    assert extents[0][0] == 0
+    for (offset, length), (following, _) in zip(extents, extents[1:]):
+        assert length > 0 and offset + length == following
+    assert sum(length for _, length in extents) == allocation["size"]
+
+    mapped = [extent for _, extent in priority_plan(allocation, sweep=False)]
+    _assert_disjoint(mapped)
+    assert sum(length for _, length in mapped) == allocation["allocated_bytes"]
+
+
+def test_priority_plan_order(tmp_path):
+    path, data = _gpt_image(tmp_path)
+    allocation = allocation_map(path)
+    plan = priority_plan(allocation)
+    phases = [phase for phase, _ in plan]
+    assert phases == sorted(phases, key=["metadata", "data", "free"].index)
+    assert [extent for _, extent in plan[:2]] == allocation["tables"]
+    data_extents = [extent for phase, extent in plan if phase == "data"]
+    # Files by descending size, then the remaining data by descending length
+    assert data_extents == [_clusters(data, 10, 4), _clusters(data, 20, 2), _clusters(data, 31, 2),
+                            _clusters(data, 5), (PARTITIONS[1][0] * SECTOR, PARTITIONS[1][1] * SECTOR),
+                            _clusters(data, 40)]
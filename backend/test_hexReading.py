@@ -0,0 +1,43 @@
+from hexReading import BlockChecker, verify_device
+
+MB = 1024 * 1024
+PATTERN = b"\x92\x49\x24"  # gutmann_lite pass; 3 does not divide any block size
+
+
+def _pattern_image(tmp_path, size):
+    path = tmp_path / "pattern.img"
+    path.write_bytes((PATTERN * (size // len(PATTERN) + 1))[:size])
+    return path
+
+
+def test_pattern_not_dividing_block_size(tmp_path):
+    path = _pattern_image(tmp_path, 3 * MB)
+    for queue_depth in (1, 4):
+        report = verify_device(str(path), pattern=PATTERN, block_size=MB, queue_depth=queue_depth,
+                               stripe_size=MB)
+        assert report["passed"], report
+        assert report["bytes_scanned"] == 3 * MB
+
+
+def test_pattern_unaligned_start(tmp_path):
+    path = _pattern_image(tmp_path, 3 * MB)
+    report = verify_device(str(path), pattern=PATTERN, block_size=MB, start=512 * 1001, length=MB)
+    assert report["passed"], report
+
+
+def test_pattern_mismatch_is_located(tmp_path):
+    path = _pattern_image(tmp_path, 3 * MB)
+    with open(path, "r+b") as f:
+        f.seek(2 * MB + 4096)
+        f.write(b"\x00")
+    report = verify_device(str(path), pattern=PATTERN, block_size=MB)
+    assert not report["passed"]
+    assert report["bad_bytes"] == 512
+    assert report["regions"] == [{"offset": 2 * MB + 4096, "length": 512}]
+
+
+def test_check_uses_offset_phase():
+    checker = BlockChecker(pattern=PATTERN, block_size=4096)
+    block = memoryview((PATTERN * 2000)[1:4097])
+    assert checker.check(block, 1) == (0, None)
+    assert checker.check(block, 0)[0] == 4096
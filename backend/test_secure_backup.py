@@ -0,0 +1,94 @@
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+import secure_backup
+from secure_backup import (GCM2_HEADER_LEN, GCM_TAG_LEN, _decrypt_backup_file_to, _encrypt_file_to_backup,
+                           _verify_backup_file, iter_backup_segments, read_backup_segment)
+
+SEGMENT = 4096
+STRIDE = SEGMENT + GCM_TAG_LEN
+KEY = bytes(range(32))
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(secure_backup, "GCM2_SEGMENT_SIZE", SEGMENT)
+
+
+def _backup(tmp_path, size, name="file"):
+    plain = os.urandom(size)
+    src = tmp_path / f"{name}.bin"
+    src.write_bytes(plain)
+    enc = tmp_path / f"{name}.enc"
+    _encrypt_file_to_backup(str(src), str(enc), KEY)
+    return plain, enc
+
+
+def _restore(tmp_path, enc, workers=1):
+    dst = tmp_path / "restored" / "file.bin"
+    _decrypt_backup_file_to(str(dst), str(enc), KEY, workers)
+    return dst.read_bytes()
+
+
+def _assert_rejected(tmp_path, enc):
+    with pytest.raises((InvalidTag, ValueError)):
+        _restore(tmp_path, enc)
+    with pytest.raises((InvalidTag, ValueError)):
+        _verify_backup_file(str(enc), KEY)
+    # Nothing, not even a partial temporary file, is left behind
+    assert not (tmp_path / "restored").exists() or os.listdir(tmp_path / "restored") == []
+
+
+@pytest.mark.parametrize("size", [0, 1, SEGMENT, 3 * SEGMENT + 5])
+def test_round_trip(tmp_path, size):
+    plain, enc = _backup(tmp_path, size)
+    assert os.path.getsize(enc) == GCM2_HEADER_LEN + max(1, -(-size // SEGMENT)) * GCM_TAG_LEN + size
+    for workers in (1, 4):
+        assert _restore(tmp_path, enc, workers) == plain
+    assert _verify_backup_file(str(enc), KEY) == size
+
+
+def test_missing_last_segment_is_detected(tmp_path):
+    _, enc = _backup(tmp_path, 3 * SEGMENT + 5)
+    data = enc.read_bytes()
+    # Cut exactly at a segment boundary: every remaining segment still authenticates on its own
+    enc.write_bytes(data[:GCM2_HEADER_LEN + 3 * STRIDE])
+    _assert_rejected(tmp_path, enc)
+
+
+def test_swapped_segments_are_detected(tmp_path):
+    _, enc = _backup(tmp_path, 3 * SEGMENT + 5)
+    data = enc.read_bytes()
+    first, second = (data[GCM2_HEADER_LEN + i * STRIDE:GCM2_HEADER_LEN + (i + 1) * STRIDE] for i in (0, 1))
+    enc.write_bytes(data[:GCM2_HEADER_LEN] + second + first + data[GCM2_HEADER_LEN + 2 * STRIDE:])
+    _assert_rejected(tmp_path, enc)
+
+
+def test_segment_from_another_backup_is_detected(tmp_path):
+    _, enc = _backup(tmp_path, 2 * SEGMENT, "a")
+    _, other = _backup(tmp_path, 2 * SEGMENT, "b")
+    data, foreign = enc.read_bytes(), other.read_bytes()
+    enc.write_bytes(data[:GCM2_HEADER_LEN] + foreign[GCM2_HEADER_LEN:GCM2_HEADER_LEN + STRIDE]
+                    + data[GCM2_HEADER_LEN + STRIDE:])
+    _assert_rejected(tmp_path, enc)
+
+
+@pytest.mark.parametrize("position", [0, 7, GCM2_HEADER_LEN - 1])
+def test_header_tampering_is_detected(tmp_path, position):
+    _, enc = _backup(tmp_path, 2 * SEGMENT)
+    data = bytearray(enc.read_bytes())
+    data[position] ^= 0x01  # magic, segment size, nonce prefix: all authenticated as associated data
+    enc.write_bytes(bytes(data))
+    _assert_rejected(tmp_path, enc)
+
+
+def test_random_access_reads(tmp_path):
+    plain, enc = _backup(tmp_path, 3 * SEGMENT + 5)
+    assert read_backup_segment(str(enc), KEY, 3) == plain[3 * SEGMENT:]
+    assert read_backup_segment(str(enc), KEY, 1) == plain[SEGMENT:2 * SEGMENT]
+    assert [i for i, _ in iter_backup_segments(str(enc), KEY, start=2)] == [2, 3]
+    assert b"".join(pt for _, pt in iter_backup_segments(str(enc), KEY, 1, 3)) == plain[SEGMENT:3 * SEGMENT]
+    with pytest.raises(IndexError):
+        read_backup_segment(str(enc), KEY, 4)
@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Defaults (0 = unlimited); adjustable at runtime through the /api/throttle endpoint
+GLOBAL_MB_PER_S = float(os.environ.get("SECUREWIPE_MAX_MBPS", "0"))
+GLOBAL_OPS_PER_S = float(os.environ.get("SECUREWIPE_MAX_IOPS", "0"))
+JOB_MB_PER_S = float(os.environ.get("SECUREWIPE_JOB_MBPS", "0"))
+JOB_OPS_PER_S = float(os.environ.get("SECUREWIPE_JOB_IOPS", "0"))
+
+MB = 1024 * 1024
+
+
+class TokenBucket:
+    """Token bucket that lets a caller go into debt and then sleeps it off.
+
+    Debt keeps large requests (bigger than the burst) exact over time without
+    having to split them; a rate of 0 disables the bucket.
+    """
+
+    def __init__(self, rate: float = 0.0, burst_seconds: float = 0.25):
+        self._lock = threading.Lock()
+        self.burst_seconds = burst_seconds
+        self.rate = 0.0
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+        self.waited_seconds = 0.0
+        self.throttled = 0
+        self.set_rate(rate)
+        self._tokens = self.rate * self.burst_seconds
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self.rate = max(0.0, float(rate or 0))
+            self._tokens = min(self._tokens, self.rate * self.burst_seconds)
+            self._stamp = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        cap = self.rate * self.burst_seconds
+        self._tokens = min(cap, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def consume(self, amount: float) -> float:
+        """Take `amount` tokens, sleeping as needed; returns seconds waited."""
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            if delay:
+                self.waited_seconds += delay
+                self.throttled += 1
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "waited_seconds": round(self.waited_seconds, 3),
+                "throttled": self.throttled,
+            }
+
+
+class RateLimiter:
+    """Bandwidth (MB/s) and IOPS limits as a pair of token buckets."""
+
+    def __init__(self, mb_per_s: float = 0.0, ops_per_s: float = 0.0):
+        self.bytes = TokenBucket(mb_per_s * MB)
+        self.ops = TokenBucket(ops_per_s)
+
+    def configure(self, mb_per_s: Optional[float] = None, ops_per_s: Optional[float] = None) -> None:
+        if mb_per_s is not None:
+            self.bytes.set_rate(float(mb_per_s) * MB)
+        if ops_per_s is not None:
+            self.ops.set_rate(float(ops_per_s))
+
+    def throttle(self, nbytes: int, ops: int = 1) -> float:
+        return self.ops.consume(ops) + self.bytes.consume(nbytes)
+
+    def status(self) -> Dict[str, Any]:
+        b = self.bytes.status()
+        o = self.ops.status()
+        return {
+            "mb_per_s": round(b["rate"] / MB, 3),
+            "ops_per_s": o["rate"],
+            "limited": bool(b["rate"] or o["rate"]),
+            "waited_seconds": round(b["waited_seconds"] + o["waited_seconds"], 3),
+            "throttled_requests": b["throttled"] + o["throttled"],
+        }
+
+
+class JobThrottle:
+    """What engines call per I/O: applies the job's own limit, then the global one."""
+
+    def __init__(self, job: Optional[RateLimiter], global_limiter: RateLimiter):
+        self.job = job
+        self.global_limiter = global_limiter
+
+    def __call__(self, nbytes: int, ops: int = 1) -> None:
+        if self.job is not None:
+            self.job.throttle(nbytes, ops)
+        self.global_limiter.throttle(nbytes, ops)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "job": self.job.status() if self.job is not None else None,
+            "global": self.global_limiter.status(),
+        }
+
+
+class ThrottleRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.global_limiter = RateLimiter(GLOBAL_MB_PER_S, GLOBAL_OPS_PER_S)
+        self.job_defaults = {"mb_per_s": JOB_MB_PER_S, "ops_per_s": JOB_OPS_PER_S}
+        self._jobs: Dict[str, RateLimiter] = {}
+
+    def for_job(self, job_id: Optional[str]) -> JobThrottle:
+        if not job_id:
+            return JobThrottle(None, self.global_limiter)
+        with self._lock:
+            limiter = self._jobs.get(job_id)
+            if limiter is None:
+                limiter = self._jobs[job_id] = RateLimiter(**self.job_defaults)
+        return JobThrottle(limiter, self.global_limiter)
+
+    def release(self, job_id: Optional[str]) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def configure(self, job_id: Optional[str] = None, mb_per_s: Optional[float] = None,
+                  ops_per_s: Optional[float] = None, defaults: bool = False) -> bool:
+        """Change limits at runtime: global (no job_id), one job, or the default for new jobs."""
+        if defaults:
+            with self._lock:
+                if mb_per_s is not None:
+                    self.job_defaults["mb_per_s"] = float(mb_per_s)
+                if ops_per_s is not None:
+                    self.job_defaults["ops_per_s"] = float(ops_per_s)
+            return True
+        if job_id is None:
+            self.global_limiter.configure(mb_per_s, ops_per_s)
+            return True
+        with self._lock:
+            limiter = self._jobs.get(job_id)
+        if limiter is None:
+            return False
+        limiter.configure(mb_per_s, ops_per_s)
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs = dict(self._jobs)
+            defaults = dict(self.job_defaults)
+        return {
+            "global": self.global_limiter.status(),
+            "job_defaults": defaults,
+            "jobs": {job_id: limiter.status() for job_id, limiter in jobs.items()},
+        }
+
+
+throttles = ThrottleRegistry()
@@ -1,37 +1,140 @@
 import os
 import sqlite3
+import threading
 import time
-from typing import Dict
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 
-DB_DIR = os.path.join(os.path.dirname(__file__), "data")
-DB_PATH = os.path.join(DB_DIR, "storage.db")
+from db import DATA_DIR, Database
+
+DB_DIR = DATA_DIR
+DB_PATH = os.environ.get("SECUREWIPE_STORAGE_DB", os.path.join(DB_DIR, "storage.db"))
+
+# Latest profile per username, kept in memory for the dashboard's repeated lookups
+PROFILE_CACHE_SIZE = int(os.environ.get("SECUREWIPE_PROFILE_CACHE_SIZE", "1024"))
+PROFILE_CACHE_TTL = float(os.environ.get("SECUREWIPE_PROFILE_CACHE_TTL_S", "300"))
+
+PROFILE_FIELDS = ("companyName", "position", "address", "personalInfo")
+
+_INSERT_USER = """
+    INSERT INTO users (username, companyName, position, address, personalInfo, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+_UPSERT_PROFILE = """
+    INSERT INTO latest_profiles (username, companyName, position, address, personalInfo, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(username) DO UPDATE SET
+        companyName = excluded.companyName, position = excluded.position, address = excluded.address,
+        personalInfo = excluded.personalInfo, updated_at = excluded.updated_at
+"""
+_SELECT_PROFILE = "SELECT companyName, position, address, personalInfo FROM latest_profiles WHERE username = ?"
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            companyName TEXT,
+            position TEXT,
+            address TEXT,
+            personalInfo TEXT,
+            created_at INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)
+        """
+    )
+    # `users` keeps every login; this table holds only the newest profile per username
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS latest_profiles (
+            username TEXT PRIMARY KEY,
+            companyName TEXT,
+            position TEXT,
+            address TEXT,
+            personalInfo TEXT,
+            updated_at INTEGER NOT NULL
+        )
+        """
+    )
+    if conn.execute("SELECT 1 FROM latest_profiles LIMIT 1").fetchone() is None:
+        # Backfill from the login history of databases created before the table existed
+        conn.execute(
+            """
+            INSERT INTO latest_profiles (username, companyName, position, address, personalInfo, updated_at)
+            SELECT u.username, u.companyName, u.position, u.address, u.personalInfo, u.created_at
+            FROM users u JOIN (SELECT MAX(id) AS id FROM users GROUP BY username) m ON u.id = m.id
+            """
+        )
+
+
+class ProfileCache:
+    """LRU of username -> profile (or None for unknown users) with a time-to-live.
+
+    Writes invalidate their username. A lookup that raced with a write does not
+    store its (possibly older) result, so a cached profile is never older than
+    the last write made through this process.
+    """
+
+    def __init__(self, max_size: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Tuple[bool, Optional[Dict[str, Any]], int]:
+        """(found, profile, generation); pass the generation back to put()."""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return True, entry[1], self._generation
+            if entry is not None:
+                del self._entries[username]
+            self.misses += 1
+            return False, None, self._generation
+
+    def put(self, username: str, profile: Optional[Dict[str, Any]], generation: int) -> None:
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[username] = (time.monotonic() + self.ttl, profile)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: Optional[str] = None) -> None:
+        with self._lock:
+            self._generation += 1
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "max_size": self.max_size, "ttl_seconds": self.ttl,
+                    "hits": self.hits, "misses": self.misses}
+
+
+db = Database(DB_PATH, _create_schema)
+profile_cache = ProfileCache()
 
 
 def init_db() -> None:
-    os.makedirs(DB_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        with conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT NOT NULL,
-                    companyName TEXT,
-                    position TEXT,
-                    address TEXT,
-                    personalInfo TEXT,
-                    created_at INTEGER NOT NULL
-                )
-                """
-            )
-            conn.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)
-                """
-            )
-    finally:
-        conn.close()
+    # Opening the first connection creates the schema
+    db.connection()
 
 
 essential_fields = ["username"]
@@ -48,41 +151,21 @@ def insert_user(payload: Dict) -> int:
     personalInfo = (payload.get("personalInfo") or "").strip()
     ts = int(time.time())
 
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        with conn:
-            cur = conn.execute(
-                """
-                INSERT INTO users (username, companyName, position, address, personalInfo, created_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (username, companyName, position, address, personalInfo, ts),
-            )
-            return int(cur.lastrowid)
-    finally:
-        conn.close()
+    with db.transaction() as conn:
+        cur = conn.execute(_INSERT_USER, (username, companyName, position, address, personalInfo, ts))
+        conn.execute(_UPSERT_PROFILE, (username, companyName, position, address, personalInfo, ts))
+    profile_cache.invalidate(username)
+    return int(cur.lastrowid)
 
 
 def get_user_by_username(username: str):
     uname = (username or "").strip()
     if not uname:
         raise ValueError("'username' is required")
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        conn.row_factory = sqlite3.Row
-        cur = conn.execute(
-            "SELECT companyName, position, address, personalInfo FROM users WHERE username = ? ORDER BY id DESC LIMIT 1",
-            (uname,),
-        )
-        row = cur.fetchone()
-        if not row:
-            return None
-        return {
-            "companyName": row["companyName"],
-            "position": row["position"],
-            "address": row["address"],
-            "personalInfo": row["personalInfo"],
-        }
-    finally:
-        conn.close()
-
+    found, profile, generation = profile_cache.get(uname)
+    if not found:
+        row = db.query_one(_SELECT_PROFILE, (uname,))
+        profile = {field: row[field] for field in PROFILE_FIELDS} if row else None
+        profile_cache.put(uname, profile, generation)
+    # Callers get their own copy; the cached dict must not change under other requests
+    return dict(profile) if profile else None